@@ -0,0 +1,317 @@
+"""
+batch_score.py
+
+Offline batch scoring of metrics files with compute_offo_risk_score.
+
+Reads CSV or JSONL rows (one business per row, the five normalized metrics
+plus an optional ID column) and writes scored rows in the same order:
+    - CSV output: business_id, overall_score, category and the three
+      component scores as columns
+    - JSONL output: the same shape as the API (components nested)
+
+Rows are read in chunks and scored across a process pool. At most
+2 x workers chunks are in flight and results are written in submission
+order, so memory stays constant however large the file is and the output
+order matches the input. Invalid rows (missing or non-numeric metrics,
+values outside [0, 1]) are skipped and reported with their line number,
+to stderr or to --errors as JSONL.
+
+Usage (from backend/):
+    python batch_score.py metrics.csv scores.csv
+    python batch_score.py metrics.jsonl scores.jsonl --workers 8 --errors errors.jsonl
+    cat metrics.csv | python batch_score.py - - --input-format csv --output-format jsonl
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import fields
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from scoring_algorithm import BusinessMetrics, compute_offo_risk_score
+from serialization import dumps
+
+
+METRIC_FIELDS = tuple(field.name for field in fields(BusinessMetrics))
+FORMATS = ("csv", "jsonl")
+DEFAULT_CHUNK_SIZE = 20_000
+DEFAULT_ID_COLUMN = "business_id"
+CSV_OUTPUT_COLUMNS = (
+    "business_id", "overall_score", "category",
+    "task_adherence_score", "training_score", "documentation_score",
+)
+
+# (first line number, rows); CSV rows are lists of cells, JSONL rows raw lines
+Chunk = Tuple[int, List[Any]]
+
+
+def validate_metrics(values: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Convert and range-check the five metrics of one row.
+
+    Raises:
+        ValueError: Naming the first missing, non-numeric or out-of-range metric
+    """
+    metrics = {}
+    for name in METRIC_FIELDS:
+        value = values.get(name)
+        if value is None or value == "":
+            raise ValueError(f"missing {name}")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} is not a number: {value!r}")
+        if math.isnan(number) or not 0.0 <= number <= 1.0:
+            raise ValueError(f"{name} must be between 0 and 1, got {value!r}")
+        metrics[name] = number
+    return metrics
+
+
+def format_csv_rows(rows: List[Tuple[str, Dict[str, Any]]]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for business_id, score in rows:
+        components = score["components"]
+        writer.writerow((
+            business_id, score["overall_score"], score["category"],
+            components["task_adherence_score"], components["training_score"], components["documentation_score"],
+        ))
+    return buffer.getvalue()
+
+
+def format_jsonl_rows(rows: List[Tuple[str, Dict[str, Any]]]) -> str:
+    return "".join(
+        dumps({
+            "business_id": business_id,
+            "overall_score": score["overall_score"],
+            "category": score["category"],
+            "components": score["components"],
+        }).decode() + "\n"
+        for business_id, score in rows
+    )
+
+
+def score_chunk(
+    chunk: Chunk,
+    input_format: str,
+    output_format: str,
+    header: Optional[Sequence[str]],
+    id_column: str
+) -> Tuple[str, int, List[Dict[str, Any]]]:
+    """
+    Score one chunk (runs in a worker process).
+
+    Args:
+        chunk: (line number of the first row, rows)
+        input_format: "csv" (rows are cell lists) or "jsonl" (rows are raw lines)
+        output_format: "csv" or "jsonl"
+        header: CSV column names
+        id_column: Column holding the business ID (line number used if absent)
+
+    Returns:
+        Tuple of (formatted output text, rows scored, error records); blank
+        rows are skipped
+    """
+    first_line, rows = chunk
+    scored: List[Tuple[str, Dict[str, Any]]] = []
+    errors: List[Dict[str, Any]] = []
+
+    for offset, row in enumerate(rows):
+        if not row or (input_format == "jsonl" and not row.strip()):
+            continue
+        line = first_line + offset
+        try:
+            if input_format == "csv":
+                if len(row) != len(header):
+                    raise ValueError(f"expected {len(header)} columns, got {len(row)}")
+                values = dict(zip(header, row))
+            else:
+                values = json.loads(row)
+                if not isinstance(values, dict):
+                    raise ValueError("row is not a JSON object")
+            business_id = str(values.get(id_column) or f"line_{line}")
+            scored.append((business_id, compute_offo_risk_score(validate_metrics(values))))
+        except ValueError as e:
+            errors.append({"line": line, "error": str(e)})
+
+    formatter = format_csv_rows if output_format == "csv" else format_jsonl_rows
+    return formatter(scored), len(scored), errors
+
+
+def read_chunks(source: TextIO, input_format: str, chunk_size: int) -> Tuple[Optional[List[str]], Iterator[Chunk]]:
+    """
+    Split input into chunks of rows without reading it all.
+
+    Returns:
+        Tuple of (CSV header or None, iterator of chunks)
+    """
+    if input_format == "csv":
+        reader = csv.reader(source)
+        header = next(reader, None)
+        rows: Iterator[Any] = reader
+        first_line = 2
+    else:
+        header = None
+        rows = (line for line in source)
+        first_line = 1
+
+    def chunks() -> Iterator[Chunk]:
+        line = first_line
+        batch: List[Any] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield line, batch
+                line += len(batch)
+                batch = []
+        if batch:
+            yield line, batch
+
+    return header, chunks()
+
+
+class _InlineExecutor(Executor):
+    """Runs submissions immediately (used for --workers 0)."""
+
+    def submit(self, fn, *args, **kwargs):
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def score_file(
+    source: TextIO,
+    destination: TextIO,
+    input_format: str,
+    output_format: str,
+    workers: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    id_column: str = DEFAULT_ID_COLUMN,
+    errors: Optional[TextIO] = None
+) -> Dict[str, Any]:
+    """
+    Score every row of `source` into `destination`, preserving order.
+
+    Args:
+        source: Input text stream
+        destination: Output text stream
+        input_format: "csv" or "jsonl"
+        output_format: "csv" or "jsonl"
+        workers: Worker processes (0 scores in this process)
+        chunk_size: Rows per chunk sent to a worker
+        id_column: Input column holding the business ID
+        errors: Stream receiving one JSON line per invalid row (optional)
+
+    Returns:
+        Summary with rows scored, invalid rows, elapsed seconds and rows/sec
+    """
+    header, chunks = read_chunks(source, input_format, chunk_size)
+    if input_format == "csv":
+        if header is None:
+            raise ValueError("CSV input is empty")
+        missing = [name for name in METRIC_FIELDS if name not in header]
+        if missing:
+            raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+    if output_format == "csv":
+        destination.write(",".join(CSV_OUTPUT_COLUMNS) + "\n")
+
+    start = time.perf_counter()
+    scored = invalid = 0
+    executor = ProcessPoolExecutor(workers) if workers > 0 else _InlineExecutor()
+    pending: Deque[Future] = deque()
+    max_pending = max(1, workers) * 2
+
+    def drain_one():
+        nonlocal scored, invalid
+        text, chunk_scored, chunk_errors = pending.popleft().result()
+        destination.write(text)
+        scored += chunk_scored
+        invalid += len(chunk_errors)
+        for error in chunk_errors:
+            if errors is not None:
+                errors.write(json.dumps(error) + "\n")
+
+    with executor:
+        for chunk in chunks:
+            pending.append(executor.submit(score_chunk, chunk, input_format, output_format, header, id_column))
+            if len(pending) >= max_pending:
+                drain_one()
+        while pending:
+            drain_one()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": scored,
+        "invalid_rows": invalid,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(scored / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def detect_format(path: str, explicit: Optional[str]) -> str:
+    if explicit:
+        return explicit
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of '{path}'; pass --input-format/--output-format")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Score a CSV or JSONL file of business metrics")
+    parser.add_argument("input", help="input file ('-' for stdin)")
+    parser.add_argument("output", help="output file ('-' for stdout)")
+    parser.add_argument("--input-format", choices=FORMATS)
+    parser.add_argument("--output-format", choices=FORMATS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (0 = score in this process)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--id-column", default=DEFAULT_ID_COLUMN, help="input column with the business ID")
+    parser.add_argument("--errors", help="write invalid rows as JSONL here (default: stderr)")
+    args = parser.parse_args(argv)
+
+    try:
+        input_format = detect_format(args.input, args.input_format)
+        output_format = detect_format(args.output, args.output_format)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    source = sys.stdin if args.input == "-" else open(args.input, newline="")
+    destination = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    errors = open(args.errors, "w") if args.errors else sys.stderr
+    try:
+        summary = score_file(
+            source, destination, input_format, output_format,
+            args.workers, args.chunk_size, args.id_column, errors
+        )
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        for stream in (source, destination, errors):
+            if stream not in (sys.stdin, sys.stdout, sys.stderr):
+                stream.close()
+
+    print(
+        f"Scored {summary['rows']:,} rows ({summary['invalid_rows']:,} invalid) in {summary['seconds']}s "
+        f"- {summary['rows_per_sec']:,.0f} rows/s",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
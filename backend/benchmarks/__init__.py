@@ -0,0 +1 @@
+"""Performance benchmarks for the OFFO Risk Score backend."""
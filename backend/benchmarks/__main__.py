@@ -0,0 +1,123 @@
+"""
+Run the microbenchmark suite.
+
+Usage (from backend/):
+    python -m benchmarks                       # run all, compare with baseline
+    python -m benchmarks --only verify_token   # run a subset
+    python -m benchmarks --save-baseline       # record a new baseline
+    python -m benchmarks --list
+
+Results are written as JSON (--output). When a baseline exists, any
+benchmark whose per-call p50 is more than --tolerance slower than the
+baseline is reported as a regression and the exit status is 1.
+
+Full runs (no --only) also measure cold start (benchmarks.startup): the
+time to the first GET / response must stay within --startup-budget, and
+the PDF/chart subsystems must not be imported before it.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.suite import (  # noqa: E402
+    BENCHMARKS, DEFAULT_SECONDS, DEFAULT_TOLERANCE, SEED, compare_to_baseline, run_suite
+)
+from benchmarks.startup import STARTUP_BUDGET_SECONDS, check_budget, measure_startup, print_report  # noqa: E402
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "results.json")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="benchmarks to run (default: all)")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS, help="time budget per benchmark")
+    parser.add_argument("--seed", type=int, default=SEED, help="seed for synthetic inputs")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write results JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed p50 slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_SECONDS,
+                        help="maximum seconds from process start to the first GET / response")
+    parser.add_argument("--skip-startup", action="store_true", help="do not measure cold start")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    return parser.parse_args(argv)
+
+
+def print_results(results):
+    print(f"{'benchmark':<30} {'ops/s':>12} {'p50 us':>12} {'p90 us':>12} {'p99 us':>12}")
+    for name, result in results["benchmarks"].items():
+        print(
+            f"{name:<30} {result['ops_per_sec']:>12.1f} {result['p50_us']:>12.1f} "
+            f"{result['p90_us']:>12.1f} {result['p99_us']:>12.1f}"
+        )
+
+
+def print_comparison(rows, tolerance):
+    print(f"\nBaseline comparison (p50, tolerance {tolerance:.0%}):")
+    for row in rows:
+        status = "REGRESSION" if row["regression"] else "ok"
+        print(
+            f"  {row['name']:<30} {row['baseline_p50_us']:>12.1f} -> {row['current_p50_us']:>12.1f} us "
+            f"({row['ratio']:.2f}x) {status}"
+        )
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    try:
+        results = run_suite(args.only, args.seconds, args.seed)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    print_results(results)
+    startup_problems = []
+    if not args.only and not args.skip_startup:
+        results["startup"] = measure_startup()
+        print()
+        print_report(results["startup"], args.startup_budget)
+        startup_problems = check_budget(results["startup"], args.startup_budget)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if startup_problems:
+        print(f"\nFAILED: start-up budget: {'; '.join(startup_problems)}", file=sys.stderr)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 1 if startup_problems else 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 1 if startup_problems else 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = compare_to_baseline(results, baseline, args.tolerance)
+    print_comparison(rows, args.tolerance)
+
+    regressions = [row["name"] for row in rows if row["regression"]]
+    if regressions:
+        print(f"\nFAILED: {len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 1 if startup_problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+bench_cache_hits.py
+
+Cache-hit throughput for GET /risk-score/{business_id}.
+
+Compares the old hit path (return the cached dict and let FastAPI run
+jsonable_encoder + json.dumps) with the new one (return the pre-encoded bytes
+in a raw Response), both at the render level and end-to-end through the ASGI
+app.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cache_hits
+"""
+
+import asyncio
+import os
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, Response  # noqa: E402
+
+import main  # noqa: E402
+from security import create_access_token  # noqa: E402
+from serialization import JSON_ENCODER  # noqa: E402
+
+
+BUSINESS_ID = "biz_mixed"
+
+
+def measure(fn: Callable[[], object], seconds: float = 1.0) -> float:
+    """Run fn repeatedly for roughly `seconds` and return calls per second."""
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            fn()
+        calls += 100
+    return calls / (time.perf_counter() - start)
+
+
+def bench_render(seconds: float) -> dict:
+    """Time only the cache-hit response rendering."""
+    data = main.build_risk_score_data(BUSINESS_ID)
+    main.set_cached_score(BUSINESS_ID, data)
+    body = main._encoded_cache[BUSINESS_ID]
+
+    before = measure(lambda: JSONResponse(content=jsonable_encoder(data)), seconds)
+    after = measure(lambda: Response(content=body, media_type="application/json"), seconds)
+    return {"before_ops": before, "after_ops": after, "speedup": after / before}
+
+
+def asgi_request(path: str, token: str, query_string: bytes = b""):
+    """
+    Build a coroutine function that sends one GET straight into the ASGI app.
+
+    Bypasses the HTTP server and test client so only routing, middleware,
+    auth and the endpoint are measured.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query_string,
+        "root_path": "",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def request():
+        await main.app(dict(scope), receive, send)
+
+    return request
+
+
+async def _drive_app(requests: int) -> float:
+    """Send cache-hit requests straight into the ASGI app, return requests/sec."""
+    token = create_access_token(data={"sub": "bench", "scopes": ["read:scores"]})
+    request = asgi_request(f"/risk-score/{BUSINESS_ID}", token)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await request()
+    return requests / (time.perf_counter() - start)
+
+
+def dict_score_response(request, key: str):
+    """The old hit path: return the cached dict for FastAPI to encode."""
+    return main.get_cached_score(key)
+
+
+def bench_end_to_end(requests: int) -> dict:
+    """Time full cache-hit requests through routing, auth and rendering, old and new path."""
+    main.clear_score_cache()
+    after = asyncio.run(_drive_app(requests))
+
+    pre_encoded = main.cached_score_response
+    main.cached_score_response = dict_score_response
+    try:
+        before = asyncio.run(_drive_app(requests))
+    finally:
+        main.cached_score_response = pre_encoded
+    return {"before_rps": before, "after_rps": after, "speedup": after / before}
+
+
+def main_cli():
+    print(f"JSON encoder: {JSON_ENCODER}")
+    render = bench_render(seconds=1.0)
+    print(f"render  before (dict + jsonable_encoder): {render['before_ops']:>10.0f} ops/s")
+    print(f"render  after  (pre-encoded bytes):       {render['after_ops']:>10.0f} ops/s")
+    print(f"render  speedup:                          {render['speedup']:>10.1f}x")
+    end_to_end = bench_end_to_end(2000)
+    print(f"ASGI    before (dict + jsonable_encoder): {end_to_end['before_rps']:>10.0f} req/s")
+    print(f"ASGI    after  (pre-encoded bytes):       {end_to_end['after_rps']:>10.0f} req/s")
+    print(f"ASGI    speedup:                          {end_to_end['speedup']:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,415 @@
+"""
+loadtest.py
+
+End-to-end load generator for the API.
+
+Starts the app under uvicorn (or targets --url) and drives it with an async
+httpx client using a weighted mix of endpoints:
+    token       POST /auth/token
+    score       GET  /risk-score/{id}
+    businesses  GET  /businesses
+    pdf         GET  /risk-score/{id}/pdf
+
+Two load models:
+    --concurrency N   closed loop: N clients each send the next request as
+                      soon as the previous one finishes (capacity)
+    --rps R           open loop: requests start on a fixed schedule and
+                      latency is measured from the scheduled start, so a
+                      stalled server is not hidden (coordinated omission)
+
+Scenarios:
+    cold   fresh server process, no warm-up: first touches compute scores
+           (use --portfolio with a large synthetic portfolio so most
+           requests are misses)
+    warm   a seeded sample of --working-set businesses (all of them when
+           there are fewer) is requested once, --concurrency at a time,
+           before measuring; the load then draws from that sample
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --concurrency 32 --duration 20
+    python -m benchmarks.loadtest --rps 200 --mix score=80,businesses=20 --scenario cold
+    python -m benchmarks.loadtest --workers 4 --concurrency 64 --output load.json
+    python -m benchmarks.loadtest --workers 4 --launcher preload     # server.py preload-and-fork
+    python -m benchmarks.loadtest --portfolio portfolio.npz --scenario cold
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loop_monitor import percentile  # noqa: E402
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "token=5,score=75,businesses=15,pdf=5"
+ENDPOINTS = ("token", "score", "businesses", "pdf")
+SCENARIOS = ("cold", "warm")
+STARTUP_TIMEOUT_SECONDS = 30.0
+REQUEST_TIMEOUT_SECONDS = 60.0
+DEFAULT_WORKING_SET = 500
+# Warm-up requests in flight in open-loop runs, which have no client count
+DEFAULT_WARM_CONCURRENCY = 16
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """
+    Parse "name=weight,..." into normalized endpoint weights.
+
+    Raises:
+        ValueError: On unknown endpoints or non-positive total weight
+    """
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}'. Valid: {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Mix weights must add up to more than zero")
+    return {name: weight / total for name, weight in weights.items() if weight > 0}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(base_url: str, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/", timeout=1.0).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not become ready in {STARTUP_TIMEOUT_SECONDS:.0f}s")
+
+
+LAUNCHERS = ("uvicorn", "preload")
+
+
+def start_server(
+    workers: int = 1,
+    port: Optional[int] = None,
+    env: Optional[Dict[str, str]] = None,
+    launcher: str = "uvicorn"
+) -> Tuple[subprocess.Popen, str]:
+    """
+    Start the app in a subprocess and wait until it answers.
+
+    Args:
+        workers: Worker processes
+        port: Port to listen on (a free one by default)
+        env: Extra environment variables
+        launcher: "uvicorn" (`uvicorn main:app --workers N`) or "preload"
+            (server.py: preload once, then fork the workers)
+
+    Returns:
+        (server process, base URL)
+    """
+    port = port or free_port()
+    server_env = {**os.environ, "OFFO_SECRET_KEY": secrets.token_urlsafe(32), **(env or {})}
+    if launcher == "preload":
+        command = [
+            sys.executable, "server.py",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=server_env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_ready(base_url, process)
+    except BaseException:
+        stop_server(process)
+        raise
+    return process, base_url
+
+
+def stop_server(process: subprocess.Popen):
+    """Interrupt a server started by start_server() and wait for it to exit."""
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+@contextmanager
+def run_server(
+    workers: int = 1,
+    port: Optional[int] = None,
+    env: Optional[Dict[str, str]] = None,
+    launcher: str = "uvicorn"
+) -> Iterator[str]:
+    """
+    Run the app in a subprocess for the duration of the block.
+
+    All workers share one OFFO_SECRET_KEY so tokens issued by one worker are
+    accepted by the others.
+
+    Yields:
+        Base URL of the server
+    """
+    process, base_url = start_server(workers, port, env, launcher)
+    try:
+        yield base_url
+    finally:
+        stop_server(process)
+
+
+class LoadGenerator:
+    """Sends a weighted endpoint mix and records per-endpoint latencies."""
+
+    def __init__(self, client: httpx.AsyncClient, mix: Dict[str, float], business_ids: List[str], token: str, seed: int = 0):
+        self.client = client
+        self.business_ids = business_ids
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rng = random.Random(seed)
+        self._names = list(mix)
+        self._weights = [mix[name] for name in self._names]
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self._names}
+        self.statuses: Dict[str, Counter] = {name: Counter() for name in self._names}
+
+    def _request_args(self, endpoint: str) -> Tuple[str, str, Dict[str, Any]]:
+        if endpoint == "token":
+            return "POST", "/auth/token", {"params": {"client_id": f"load_{self.rng.randrange(1000)}"}}
+        if endpoint == "businesses":
+            return "GET", "/businesses", {"headers": self.headers}
+        business_id = self.rng.choice(self.business_ids)
+        if endpoint == "pdf":
+            return "GET", f"/risk-score/{business_id}/pdf", {"headers": self.headers}
+        return "GET", f"/risk-score/{business_id}", {"headers": self.headers}
+
+    async def send(self, endpoint: Optional[str] = None, started: Optional[float] = None):
+        """Send one request (random endpoint from the mix unless given)."""
+        endpoint = endpoint or self.rng.choices(self._names, self._weights)[0]
+        method, path, kwargs = self._request_args(endpoint)
+        started = started if started is not None else time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        self.statuses[endpoint][status] += 1
+
+    async def run_closed(self, concurrency: int, duration: float):
+        """Closed loop: `concurrency` clients back to back for `duration` seconds."""
+        deadline = time.perf_counter() + duration
+
+        async def client_loop():
+            while time.perf_counter() < deadline:
+                await self.send()
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+    async def run_open(self, rps: float, duration: float, max_in_flight: int = 1000):
+        """Open loop: start requests at `rps` regardless of completions."""
+        interval = 1.0 / rps
+        start = time.perf_counter()
+        in_flight = set()
+        for i in range(int(rps * duration)):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= max_in_flight:
+                await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            task = asyncio.ensure_future(self.send(started=scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.wait(in_flight)
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """Throughput, error rate and latency percentiles (ms), per endpoint and overall."""
+        def stats(latencies: List[float], statuses: Counter) -> Dict[str, Any]:
+            count = len(latencies)
+            errors = sum(n for status, n in statuses.items() if not status.startswith(("2", "3")))
+            return {
+                "requests": count,
+                "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+                "error_rate": round(errors / count, 4) if count else 0.0,
+                "statuses": dict(statuses),
+                "latency_ms": {
+                    "p50": round(percentile(latencies, 0.50) * 1000, 2),
+                    "p90": round(percentile(latencies, 0.90) * 1000, 2),
+                    "p99": round(percentile(latencies, 0.99) * 1000, 2),
+                    "max": round(max(latencies) * 1000, 2) if latencies else 0.0,
+                },
+            }
+
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        all_statuses = sum(self.statuses.values(), Counter())
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "overall": stats(all_latencies, all_statuses),
+            "endpoints": {
+                name: stats(self.latencies[name], self.statuses[name])
+                for name in self._names if self.latencies[name]
+            },
+        }
+
+
+async def run_load(
+    base_url: str,
+    mix: Dict[str, float],
+    duration: float,
+    concurrency: Optional[int] = None,
+    rps: Optional[float] = None,
+    warm: bool = False,
+    seed: int = 0,
+    working_set: int = DEFAULT_WORKING_SET
+) -> Dict[str, Any]:
+    """
+    Drive a running server and return the summary.
+
+    Args:
+        base_url: Server URL
+        mix: Normalized endpoint weights (see parse_mix)
+        duration: Seconds of load
+        concurrency: Closed-loop client count (used when rps is None)
+        rps: Open-loop request rate
+        warm: Request each business of a sampled working set once (score
+            and, if mixed in, PDF) first, and draw the load from that set
+        seed: Seed for endpoint and business selection
+        working_set: Businesses to warm (0 for all of them)
+    """
+    limits = httpx.Limits(max_connections=max(concurrency or 0, 100), max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        token = (await client.post("/auth/token", params={"client_id": "loadtest"})).json()["access_token"]
+        listing = await client.get("/businesses", headers={"Authorization": f"Bearer {token}"})
+        business_ids = listing.json()["businesses"]
+
+        if warm and 0 < working_set < len(business_ids):
+            business_ids = random.Random(seed).sample(business_ids, working_set)
+        generator = LoadGenerator(client, mix, business_ids, token, seed)
+        if warm:
+            warm_paths = [f"/risk-score/{business_id}" for business_id in business_ids]
+            if "pdf" in mix:
+                warm_paths += [f"{path}/pdf" for path in warm_paths]
+            slots = asyncio.Semaphore(concurrency if concurrency and not rps else DEFAULT_WARM_CONCURRENCY)
+
+            async def warm_one(path: str):
+                async with slots:
+                    await client.get(path, headers=generator.headers)
+
+            await asyncio.gather(*(warm_one(path) for path in warm_paths))
+
+        start = time.perf_counter()
+        if rps:
+            await generator.run_open(rps, duration)
+        else:
+            await generator.run_closed(concurrency or 1, duration)
+        summary = generator.summary(time.perf_counter() - start)
+        summary["businesses"] = len(business_ids)
+        return summary
+
+
+def print_summary(label: str, summary: Dict[str, Any]):
+    print(f"\n== {label} ({summary['elapsed_seconds']}s)")
+    print(f"{'endpoint':<12} {'requests':>9} {'rps':>9} {'errors':>8} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = list(summary["endpoints"].items()) + [("overall", summary["overall"])]
+    for name, stats in rows:
+        latency = stats["latency_ms"]
+        print(
+            f"{name:<12} {stats['requests']:>9} {stats['throughput_rps']:>9.1f} {stats['error_rate']:>8.2%} "
+            f"{latency['p50']:>9.1f} {latency['p90']:>9.1f} {latency['p99']:>9.1f} {latency['max']:>9.1f}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description="End-to-end API load test")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, default=16, help="closed-loop clients (default 16)")
+    load.add_argument("--rps", type=float, help="open-loop target requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per scenario")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("both",), default="both")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--launcher", choices=LAUNCHERS, default="uvicorn",
+                        help="uvicorn --workers, or server.py preload-and-fork")
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--portfolio", help="synthetic portfolio .npz to serve (see synthetic_portfolio.py)")
+    parser.add_argument("--working-set", type=int, default=DEFAULT_WORKING_SET,
+                        help=f"businesses warmed and loaded in the warm scenario (0 for all, default {DEFAULT_WORKING_SET})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    scenarios = SCENARIOS if args.scenario == "both" else (args.scenario,)
+    model = f"{args.rps} rps open loop" if args.rps else f"{args.concurrency} clients closed loop"
+    results = {
+        "mix": mix,
+        "model": model,
+        "duration_seconds": args.duration,
+        "workers": args.workers,
+        "launcher": args.launcher,
+        "scenarios": {},
+    }
+
+    for scenario in scenarios:
+        if args.url:
+            summary = asyncio.run(run_load(
+                args.url, mix, args.duration, args.concurrency, args.rps, scenario == "warm", args.seed,
+                args.working_set
+            ))
+        else:
+            # A fresh process per scenario, without the startup warm-up, so "cold" really starts with empty caches
+            env = {"OFFO_WARMUP_LIMIT": "0", "OFFO_CACHE_SNAPSHOT": ""}
+            if args.portfolio:
+                env["OFFO_PORTFOLIO_PATH"] = os.path.abspath(args.portfolio)
+            with run_server(args.workers, env=env, launcher=args.launcher) as base_url:
+                summary = asyncio.run(run_load(
+                    base_url, mix, args.duration, args.concurrency, args.rps, scenario == "warm", args.seed,
+                    args.working_set
+                ))
+        results["scenarios"][scenario] = summary
+        print_summary(f"{scenario}, {model}, {args.workers} worker(s)", summary)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+replay.py
+
+Re-drive a recorded traffic log (see traffic_recorder.py) against a local
+instance and compare latency distributions.
+
+Requests are sent open loop at their recorded offsets divided by --speed
+(1 = original pace, 10 = ten times faster, 0 = as fast as --concurrency
+allows). Each distinct recorded client key gets its own token, so token
+reuse and the per-client mix are preserved. Admin, profiling and stream
+requests are skipped.
+
+Per route the report shows the recorded server-side latency next to the
+replayed latency. Save a replay with --output and pass it to --compare on a
+later run to check a cache or pool change against the same traffic.
+
+Usage (from backend/):
+    python -m benchmarks.replay traffic.jsonl
+    python -m benchmarks.replay traffic.jsonl --speed 5 --portfolio portfolio.npz --output before.json
+    python -m benchmarks.replay traffic.jsonl --speed 5 --portfolio portfolio.npz --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.loadtest import REQUEST_TIMEOUT_SECONDS, run_server  # noqa: E402
+from loop_monitor import percentile  # noqa: E402
+
+
+SKIPPED_ROUTE_PREFIXES = ("/admin", "/risk-score/stream")
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """
+    Read a traffic log, dropping unreplayable and malformed records.
+
+    Returns:
+        Records ordered by start time (workers interleave their batches)
+    """
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("r", "").startswith(SKIPPED_ROUTE_PREFIXES) or "profile=" in record.get("q", ""):
+                continue
+            records.append(record)
+    records.sort(key=lambda record: record["t"])
+    return records
+
+
+def _latency_stats(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(latencies_ms, 0.50), 2),
+        "p90": round(percentile(latencies_ms, 0.90), 2),
+        "p99": round(percentile(latencies_ms, 0.99), 2),
+        "max": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+
+
+async def replay(
+    base_url: str,
+    records: List[Dict[str, Any]],
+    speed: float = 1.0,
+    concurrency: int = 64
+) -> Dict[str, Any]:
+    """
+    Replay records against a server.
+
+    Args:
+        base_url: Server URL
+        records: Output of load_trace()
+        speed: Time compression factor; 0 sends as fast as concurrency allows
+        concurrency: Maximum requests in flight
+
+    Returns:
+        Per-route recorded vs. replayed latency (ms), status mismatches and errors
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        tokens: Dict[str, str] = {}
+        for key in sorted({record["c"] for record in records if "c" in record}):
+            response = await client.post("/auth/token", params={"client_id": f"replay_{key}"})
+            tokens[key] = response.json()["access_token"]
+
+        replayed: Dict[str, List[float]] = defaultdict(list)
+        mismatches: Counter = Counter()
+        errors: Counter = Counter()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(record: Dict[str, Any], scheduled: float):
+            headers = {}
+            if "c" in record:
+                headers["Authorization"] = f"Bearer {tokens[record['c']]}"
+            if record.get("z"):
+                headers["Accept-Encoding"] = "gzip"
+            url = record["p"] + (f"?{record['q']}" if record.get("q") else "")
+
+            async with semaphore:
+                started = scheduled if speed > 0 else time.perf_counter()
+                try:
+                    response = await client.request(record["m"], url, headers=headers)
+                    if response.status_code != record["s"]:
+                        mismatches[record["r"]] += 1
+                except httpx.HTTPError:
+                    errors[record["r"]] += 1
+                replayed[record["r"]].append((time.perf_counter() - started) * 1000)
+
+        start = time.perf_counter()
+        first = records[0]["t"] if records else 0.0
+        tasks = []
+        for record in records:
+            scheduled = start + (record["t"] - first) / speed if speed > 0 else start
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(send(record, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    recorded: Dict[str, List[float]] = defaultdict(list)
+    for record in records:
+        recorded[record["r"]].append(record["d"])
+
+    return {
+        "requests": len(records),
+        "speed": speed,
+        "elapsed_seconds": round(elapsed, 3),
+        "routes": {
+            route: {
+                "requests": len(recorded[route]),
+                "recorded_ms": _latency_stats(recorded[route]),
+                "replayed_ms": _latency_stats(replayed[route]),
+                "status_mismatches": mismatches[route],
+                "errors": errors[route],
+            }
+            for route in sorted(recorded, key=lambda route: -len(recorded[route]))
+        },
+    }
+
+
+def print_report(summary: Dict[str, Any], previous: Optional[Dict[str, Any]] = None):
+    print(f"Replayed {summary['requests']} requests at {summary['speed']}x in {summary['elapsed_seconds']}s")
+    header = f"{'route':<36} {'count':>7} {'rec p50':>9} {'rec p99':>9} {'rep p50':>9} {'rep p99':>9} {'mism':>6}"
+    if previous:
+        header += f" {'prev p50':>9} {'prev p99':>9}"
+    print(header)
+    for route, stats in summary["routes"].items():
+        line = (
+            f"{route:<36} {stats['requests']:>7} {stats['recorded_ms']['p50']:>9.1f} {stats['recorded_ms']['p99']:>9.1f} "
+            f"{stats['replayed_ms']['p50']:>9.1f} {stats['replayed_ms']['p99']:>9.1f} "
+            f"{stats['status_mismatches'] + stats['errors']:>6}"
+        )
+        before = (previous or {}).get("routes", {}).get(route)
+        if before:
+            line += f" {before['replayed_ms']['p50']:>9.1f} {before['replayed_ms']['p99']:>9.1f}"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay", description="Replay a recorded traffic log")
+    parser.add_argument("trace", help="traffic log written with OFFO_TRAFFIC_LOG")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=64, help="maximum requests in flight")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--portfolio", help="synthetic portfolio .npz to serve (see synthetic_portfolio.py)")
+    parser.add_argument("--output", help="write the replay summary JSON here")
+    parser.add_argument("--compare", help="previous replay summary JSON to show alongside")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    records = load_trace(args.trace)[:args.limit]
+    if not records:
+        print(f"No replayable requests in {args.trace}", file=sys.stderr)
+        return 2
+
+    if args.url:
+        summary = asyncio.run(replay(args.url, records, args.speed, args.concurrency))
+    else:
+        env = {"OFFO_PORTFOLIO_PATH": os.path.abspath(args.portfolio)} if args.portfolio else None
+        with run_server(args.workers, env=env) as base_url:
+            summary = asyncio.run(replay(base_url, records, args.speed, args.concurrency))
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(summary, previous)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nReplay summary written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+startup.py
+
+Cold-start cost: import time report and time to the first GET / response.
+
+Each run starts a fresh interpreter that imports main and sends one GET /
+straight into the ASGI app (no server), the path an autoscaled instance or a
+test run pays before it can answer anything. The parent measures wall-clock
+time from process launch to the response, so interpreter start-up is
+included. One extra run under `python -X importtime` attributes the import
+time to the slowest modules (cumulative, like the importtime "cumulative"
+column) and records whether the heavy PDF/chart subsystems were imported.
+
+The median of the timed runs is checked against a budget
+(STARTUP_BUDGET_SECONDS, --budget) rather than a baseline ratio, since
+start-up time is dominated by the import graph rather than by code speed.
+
+Usage (from backend/):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 7 --budget 1.0 --top 30
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_BUDGET_SECONDS = 1.5
+DEFAULT_RUNS = 5
+DEFAULT_TOP = 15
+
+# Subsystems that should not be imported before the first response
+# (httpx is only needed by sharded workers forwarding requests)
+LAZY_SUBSYSTEMS = ("pdf_generator", "portfolio_report", "matplotlib", "reportlab", "httpx")
+
+FIRST_REQUEST_SCRIPT = """
+import asyncio, json, sys
+import main
+
+status = []
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    if message["type"] == "http.response.start":
+        status.append(message["status"])
+
+scope = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+    "method": "GET", "scheme": "http", "path": "/", "raw_path": b"/",
+    "query_string": b"", "root_path": "", "headers": [],
+    "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000),
+}
+asyncio.run(main.app(scope, receive, send))
+print(json.dumps({
+    "status": status[0],
+    "loaded": sorted(name for name in %r if name in sys.modules),
+}))
+""" % (LAZY_SUBSYSTEMS,)
+
+
+def _run_first_request(extra_args: List[str]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, *extra_args, "-c", FIRST_REQUEST_SCRIPT],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        # Keep the measured process from starting the background import warm-up
+        env={**os.environ, "OFFO_LAZY_WARMUP": "0"},
+    )
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"start-up run failed:\n{completed.stderr}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["seconds"] = elapsed
+    result["stderr"] = completed.stderr
+    return result
+
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """
+    Parse `python -X importtime` output.
+
+    Args:
+        output: stderr of a run with -X importtime
+
+    Returns:
+        One entry per imported module with self_us, cumulative_us and
+        depth (0 for modules imported directly by the script)
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the column header
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        modules.append({
+            "module": stripped,
+            "self_us": int(fields[0]),
+            "cumulative_us": int(fields[1]),
+            "depth": (len(name) - len(stripped) - 1) // 2,
+        })
+    return modules
+
+
+def measure_startup(runs: int = DEFAULT_RUNS, top: int = DEFAULT_TOP) -> Dict[str, Any]:
+    """
+    Time cold starts to the first GET / response and build an import report.
+
+    Args:
+        runs: Number of timed fresh-interpreter runs
+        top: How many modules to list in the import report
+
+    Returns:
+        Dictionary with the per-run and median seconds to first response,
+        total import time of main, the `top` slowest imports (cumulative)
+        and which lazily loaded subsystems were imported
+    """
+    timings = []
+    for _ in range(runs):
+        result = _run_first_request([])
+        if result["status"] != 200:
+            raise RuntimeError(f"GET / returned {result['status']}")
+        timings.append(result["seconds"])
+
+    profiled = _run_first_request(["-X", "importtime"])
+    modules = parse_importtime(profiled["stderr"])
+    main_import = next((m for m in modules if m["module"] == "main" and m["depth"] == 0), None)
+    slowest = sorted(modules, key=lambda m: m["cumulative_us"], reverse=True)[:top]
+
+    return {
+        "runs": [round(seconds, 4) for seconds in timings],
+        "first_response_s": round(statistics.median(timings), 4),
+        "main_import_s": round(main_import["cumulative_us"] / 1e6, 4) if main_import else None,
+        "slowest_imports": [
+            {
+                "module": m["module"],
+                "cumulative_ms": round(m["cumulative_us"] / 1000, 1),
+                "self_ms": round(m["self_us"] / 1000, 1),
+            }
+            for m in slowest
+        ],
+        "lazy_subsystems_loaded": profiled["loaded"],
+    }
+
+
+def check_budget(report: Dict[str, Any], budget: float = STARTUP_BUDGET_SECONDS) -> List[str]:
+    """Budget violations in a measure_startup() report (empty when within budget)."""
+    problems = []
+    if report["first_response_s"] > budget:
+        problems.append(f"first response after {report['first_response_s']:.3f}s (budget {budget:.3f}s)")
+    if report["lazy_subsystems_loaded"]:
+        problems.append(f"imported before the first response: {', '.join(report['lazy_subsystems_loaded'])}")
+    return problems
+
+
+def print_report(report: Dict[str, Any], budget: float):
+    print(f"Time to first GET / response: {report['first_response_s']:.3f}s "
+          f"(median of {len(report['runs'])}, budget {budget:.3f}s)")
+    if report["main_import_s"] is not None:
+        print(f"import main: {report['main_import_s']:.3f}s")
+    print(f"\n{'module':<50} {'cumulative ms':>14} {'self ms':>10}")
+    for entry in report["slowest_imports"]:
+        print(f"{entry['module']:<50} {entry['cumulative_ms']:>14.1f} {entry['self_ms']:>10.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="timed cold starts")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="slowest imports to list")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS,
+                        help="maximum median seconds to the first response")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = measure_startup(args.runs, args.top)
+    print_report(report, args.budget)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    problems = check_budget(report, args.budget)
+    if problems:
+        print(f"\nFAILED: {'; '.join(problems)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
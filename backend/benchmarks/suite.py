@@ -0,0 +1,288 @@
+"""
+suite.py
+
+Microbenchmarks for the scoring, drivers, trend, chart, PDF and auth hot paths.
+
+Each benchmark prepares a pool of seeded synthetic inputs (metrics spread over
+the whole LOW..HIGH range, known and unknown business IDs, fresh tokens) and
+returns a zero-argument callable that cycles through them. run_benchmark()
+calibrates how many calls make up one round, times rounds until the time
+budget is used, and reports ops/sec plus per-call percentiles.
+
+Results are compared with a stored baseline by per-call p50; a benchmark
+whose p50 grew by more than the tolerance is a regression.
+"""
+
+import asyncio
+import itertools
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+import main
+import pdf_generator
+from chart_cache import ChartCache
+from data_layer import get_30day_trend, get_risk_drivers
+from loop_monitor import percentile
+from pdf_generator import create_trend_chart, generate_risk_report_pdf
+from scoring_algorithm import compute_offo_risk_score
+from security import create_access_token, verify_token
+from serialization import JSON_ENCODER
+from benchmarks.bench_cache_hits import BUSINESS_ID, asgi_request
+
+
+SEED = 20240601
+INPUT_POOL_SIZE = 64
+TARGET_ROUND_SECONDS = 0.002
+MIN_ROUNDS = 5
+DEFAULT_SECONDS = 1.0
+DEFAULT_TOLERANCE = 0.25
+
+KNOWN_BUSINESS_IDS = ("biz_excellent", "biz_healthy", "biz_mixed", "biz_risky", "biz_critical")
+
+
+def synthetic_metrics(rng: random.Random) -> Dict[str, float]:
+    """Random normalized metrics spread across all risk categories."""
+    health = rng.random()
+    def jitter(value):
+        return round(min(1.0, max(0.0, value + rng.uniform(-0.1, 0.1))), 3)
+    return {
+        "task_completion_rate": jitter(0.2 + 0.8 * health),
+        "overdue_task_rate": jitter(0.6 - 0.6 * health),
+        "training_completion_rate": jitter(0.2 + 0.8 * health),
+        "doc_error_rate": jitter(0.45 - 0.45 * health),
+        "doc_missing_field_rate": jitter(0.4 - 0.4 * health),
+    }
+
+
+def synthetic_business_id(rng: random.Random, index: int) -> str:
+    """Mix of known IDs (fixed trend shapes) and unknown ones (default branch)."""
+    if index % 2 == 0:
+        return rng.choice(KNOWN_BUSINESS_IDS)
+    return f"biz_synthetic_{index:04d}"
+
+
+def synthetic_report(rng: random.Random, index: int) -> Dict[str, Any]:
+    """Complete PDF report payload built from synthetic metrics."""
+    business_id = synthetic_business_id(rng, index)
+    risk_score = compute_offo_risk_score(synthetic_metrics(rng))
+    return {
+        "business_id": business_id,
+        **risk_score,
+        "trend_30d": get_30day_trend(business_id, risk_score["overall_score"]),
+        "drivers": get_risk_drivers(business_id, risk_score["components"]),
+        "recommended_actions": main.generate_recommended_actions(
+            risk_score["category"], risk_score["components"]
+        ),
+    }
+
+
+def _cycle(inputs: List[Any], call: Callable[[Any], Any]) -> Callable[[], Any]:
+    pool = itertools.cycle(inputs)
+    return lambda: call(next(pool))
+
+
+def setup_compute_score(rng: random.Random) -> Callable[[], Any]:
+    inputs = [synthetic_metrics(rng) for _ in range(INPUT_POOL_SIZE)]
+    return _cycle(inputs, compute_offo_risk_score)
+
+
+def setup_risk_drivers(rng: random.Random) -> Callable[[], Any]:
+    inputs = [
+        (synthetic_business_id(rng, i), compute_offo_risk_score(synthetic_metrics(rng))["components"])
+        for i in range(INPUT_POOL_SIZE)
+    ]
+    return _cycle(inputs, lambda args: get_risk_drivers(*args))
+
+
+def setup_recommended_actions(rng: random.Random) -> Callable[[], Any]:
+    scores = [compute_offo_risk_score(synthetic_metrics(rng)) for _ in range(INPUT_POOL_SIZE)]
+    inputs = [(score["category"], score["components"]) for score in scores]
+    return _cycle(inputs, lambda args: main.generate_recommended_actions(*args))
+
+
+def setup_trend(rng: random.Random) -> Callable[[], Any]:
+    inputs = [
+        (synthetic_business_id(rng, i), rng.uniform(0, 100))
+        for i in range(INPUT_POOL_SIZE)
+    ]
+    return _cycle(inputs, lambda args: get_30day_trend(*args))
+
+
+def setup_trend_chart(rng: random.Random) -> Callable[[], Any]:
+    inputs = [
+        get_30day_trend(synthetic_business_id(rng, i), rng.uniform(0, 100))
+        for i in range(8)
+    ]
+    return _cycle(inputs, lambda trend: create_trend_chart(trend, BytesIO()))
+
+
+def setup_pdf_report(rng: random.Random) -> Callable[[], Any]:
+    inputs = [synthetic_report(rng, i) for i in range(8)]
+    # A cache with no room: every report renders its chart, whatever the time budget
+    uncached = ChartCache(max_bytes=0)
+
+    def report(data):
+        cached, pdf_generator.chart_cache = pdf_generator.chart_cache, uncached
+        try:
+            generate_risk_report_pdf(data).close()
+        finally:
+            pdf_generator.chart_cache = cached
+
+    return _cycle(inputs, report)
+
+
+def setup_verify_token(rng: random.Random) -> Callable[[], Any]:
+    inputs = [
+        HTTPAuthorizationCredentials(
+            scheme="Bearer",
+            credentials=create_access_token(data={
+                "sub": f"client_{i}",
+                "scopes": ["read:scores"] if i % 4 else ["read:scores", "admin"],
+            }),
+        )
+        for i in range(INPUT_POOL_SIZE)
+    ]
+    return _cycle(inputs, verify_token)
+
+
+def setup_cache_hit(rng: random.Random) -> Callable[[], Any]:
+    main.clear_score_cache()
+    loop = asyncio.new_event_loop()
+    token = create_access_token(data={"sub": "bench", "scopes": ["read:scores"]})
+    request = asgi_request(f"/risk-score/{BUSINESS_ID}", token)
+    loop.run_until_complete(request())
+    return lambda: loop.run_until_complete(request())
+
+
+BENCHMARKS: Dict[str, Callable[[random.Random], Callable[[], Any]]] = {
+    "compute_offo_risk_score": setup_compute_score,
+    "get_risk_drivers": setup_risk_drivers,
+    "generate_recommended_actions": setup_recommended_actions,
+    "get_30day_trend": setup_trend,
+    "verify_token": setup_verify_token,
+    "cache_hit_request": setup_cache_hit,
+    "create_trend_chart": setup_trend_chart,
+    "generate_risk_report_pdf": setup_pdf_report,
+}
+
+
+def _calibrate(fn: Callable[[], Any]) -> int:
+    """Calls per round so that one round takes at least TARGET_ROUND_SECONDS."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= TARGET_ROUND_SECONDS:
+            return number
+        number *= 10 if elapsed < TARGET_ROUND_SECONDS / 10 else 2
+
+
+def run_benchmark(fn: Callable[[], Any], seconds: float = DEFAULT_SECONDS) -> Dict[str, Any]:
+    """
+    Time a callable.
+
+    Args:
+        fn: Zero-argument callable to time
+        seconds: Time budget after calibration (at least MIN_ROUNDS rounds run)
+
+    Returns:
+        Dictionary with ops_per_sec, call count, rounds and per-call
+        mean/p50/p90/p99/min in microseconds
+    """
+    number = _calibrate(fn)
+    per_call: List[float] = []
+    total = 0.0
+    deadline = time.perf_counter() + seconds
+    while len(per_call) < MIN_ROUNDS or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        per_call.append(elapsed / number)
+
+    calls = number * len(per_call)
+    return {
+        "ops_per_sec": round(calls / total, 2),
+        "calls": calls,
+        "rounds": len(per_call),
+        "mean_us": round(total / calls * 1e6, 3),
+        "p50_us": round(percentile(per_call, 0.50) * 1e6, 3),
+        "p90_us": round(percentile(per_call, 0.90) * 1e6, 3),
+        "p99_us": round(percentile(per_call, 0.99) * 1e6, 3),
+        "min_us": round(min(per_call) * 1e6, 3),
+    }
+
+
+def run_suite(
+    names: Optional[List[str]] = None,
+    seconds: float = DEFAULT_SECONDS,
+    seed: int = SEED
+) -> Dict[str, Any]:
+    """
+    Run the selected benchmarks (all by default) with seeded inputs.
+
+    Returns:
+        Results document: environment metadata plus one entry per benchmark
+    """
+    names = names or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in names:
+        fn = BENCHMARKS[name](random.Random(f"{seed}:{name}"))
+        results[name] = run_benchmark(fn, seconds)
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "json_encoder": JSON_ENCODER,
+        "seed": seed,
+        "seconds_per_benchmark": seconds,
+        "benchmarks": results,
+    }
+
+
+def compare_to_baseline(
+    results: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = DEFAULT_TOLERANCE
+) -> List[Dict[str, Any]]:
+    """
+    Compare per-call p50 of each benchmark with the baseline.
+
+    Args:
+        results: Document returned by run_suite()
+        baseline: Previously saved results document
+        tolerance: Allowed relative slowdown (0.25 = 25% slower)
+
+    Returns:
+        One row per benchmark present in both documents with the ratio
+        (current / baseline p50) and whether it is a regression
+    """
+    rows = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        ratio = current["p50_us"] / previous["p50_us"] if previous["p50_us"] else 1.0
+        rows.append({
+            "name": name,
+            "baseline_p50_us": previous["p50_us"],
+            "current_p50_us": current["p50_us"],
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1.0 + tolerance,
+        })
+    return rows
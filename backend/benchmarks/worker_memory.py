@@ -0,0 +1,162 @@
+"""
+worker_memory.py
+
+Memory of a multi-worker deployment: `uvicorn main:app --workers N` versus
+the preload-and-fork launcher (server.py).
+
+Each launcher is started with the same worker count. Every worker is
+exercised with score and PDF requests, so matplotlib, ReportLab and the
+report caches are in use. Then the memory of the whole process tree
+(supervisor plus workers) is read from /proc/<pid>/smaps_rollup:
+    rss  resident pages, shared ones counted once per process
+    pss  proportional set size: shared pages divided among their sharers,
+         so the sum over processes is the real footprint
+    uss  pages private to each process
+
+Chart rendering stays in the request threads (OFFO_CHART_WORKERS=0) and the
+score warm-up is off, so both runs build the same state. Linux only.
+
+Usage (from backend/):
+    python -m benchmarks.worker_memory --workers 4
+    python -m benchmarks.worker_memory --workers 4 --portfolio portfolio.npz --output memory.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.loadtest import LAUNCHERS, start_server, stop_server  # noqa: E402
+
+
+DEFAULT_WORKERS = 4
+SETTLE_SECONDS = 1.0
+WORKER_START_TIMEOUT_SECONDS = 60.0
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of a process, found by scanning /proc/<pid>/stat."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the parenthesised command name: state, ppid, ...
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def process_tree(pid: int) -> List[int]:
+    """A process and all its descendants."""
+    pids = [pid]
+    for child in child_pids(pid):
+        pids.extend(process_tree(child))
+    return pids
+
+
+def smaps_rollup(pid: int) -> Dict[str, int]:
+    """Rss, Pss and Uss of one process in bytes."""
+    fields: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            parts = value.split()
+            if len(parts) == 2 and parts[1] == "kB":
+                fields[name] = int(parts[0]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def exercise(base_url: str, workers: int):
+    """Send enough score and PDF requests that every worker serves some."""
+    # No keep-alive: each request is a new connection, so requests spread over the workers
+    limits = httpx.Limits(max_keepalive_connections=0)
+    with httpx.Client(base_url=base_url, timeout=120.0, limits=limits) as client:
+        token = client.post("/auth/token", params={"client_id": "memory"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        business_ids = client.get("/businesses").json()["businesses"]
+        for i in range(8 * workers):
+            client.get(f"/risk-score/{business_ids[i % len(business_ids)]}", headers=headers)
+        for i in range(3 * workers):
+            client.get(f"/risk-score/{business_ids[i % len(business_ids)]}/pdf", headers=headers)
+
+
+def measure_launcher(launcher: str, workers: int, portfolio: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Start one launcher, exercise it and measure its process tree.
+
+    Returns:
+        Per-process and total rss/pss/uss in bytes
+    """
+    env = {"OFFO_CHART_WORKERS": "0", "OFFO_WARMUP_LIMIT": "0"}
+    if portfolio:
+        env["OFFO_PORTFOLIO_PATH"] = os.path.abspath(portfolio)
+    process, base_url = start_server(workers, env=env, launcher=launcher)
+    try:
+        deadline = time.monotonic() + WORKER_START_TIMEOUT_SECONDS
+        while len(child_pids(process.pid)) < workers:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{launcher}: workers did not start")
+            time.sleep(0.1)
+        exercise(base_url, workers)
+        time.sleep(SETTLE_SECONDS)
+        processes = [{"pid": pid, **smaps_rollup(pid)} for pid in process_tree(process.pid)]
+    finally:
+        stop_server(process)
+
+    return {
+        "launcher": launcher,
+        "workers": workers,
+        "processes": processes,
+        "total": {key: sum(p[key] for p in processes) for key in ("rss", "pss", "uss")},
+    }
+
+
+def print_comparison(results: List[Dict[str, Any]]):
+    mb = 1024 * 1024
+    print(f"{'launcher':<10} {'processes':>9} {'RSS MB':>10} {'PSS MB':>10} {'USS MB':>10}")
+    for result in results:
+        total = result["total"]
+        print(
+            f"{result['launcher']:<10} {len(result['processes']):>9} {total['rss'] / mb:>10.1f} "
+            f"{total['pss'] / mb:>10.1f} {total['uss'] / mb:>10.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.worker_memory", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--launchers", nargs="+", choices=LAUNCHERS, default=list(LAUNCHERS))
+    parser.add_argument("--portfolio", help="synthetic portfolio .npz to serve (see synthetic_portfolio.py)")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("worker_memory needs /proc/<pid>/smaps_rollup (Linux)", file=sys.stderr)
+        return 2
+
+    results = [measure_launcher(launcher, args.workers, args.portfolio) for launcher in args.launchers]
+    print_comparison(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
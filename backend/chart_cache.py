@@ -0,0 +1,240 @@
+"""
+chart_cache.py
+
+LRU cache of rendered trend chart images.
+
+A business's 30-day trend is the same for every render on a given day,
+yet create_trend_chart rebuilds and rasterizes the matplotlib figure each
+time. ChartCache keeps rendered images keyed by a hash of the trend points
+and the rendering options:
+    - in memory, least recently used evicted first, up to OFFO_CHART_CACHE_MB
+    - optionally on disk under OFFO_CHART_CACHE_DIR: images evicted from
+      memory are spilled there (up to OFFO_CHART_CACHE_DISK_MB) and promoted
+      back to memory on their next hit. Spilled files survive restarts and
+      can be shared by the workers of one host.
+
+The directory, not a worker's own bookkeeping, is the source of truth for
+the disk tier: a memory miss opens the key's file directly, so spills by
+other workers are found, and every spill rescans the directory and drops
+the least recently used files (by mtime; hits touch their file) until all
+workers' spills together fit the disk budget.
+
+Hits by tier, misses, evictions and spills are counted in
+offo_chart_cache_events_total. Two threads missing the same key at once
+both render it; the second result simply replaces the first.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from metrics import CHART_CACHE_EVENTS
+from serialization import dumps
+
+
+CHART_CACHE_MAX_BYTES = int(float(os.environ.get("OFFO_CHART_CACHE_MB", "32")) * 1024 * 1024)
+CHART_CACHE_DIR = os.environ.get("OFFO_CHART_CACHE_DIR", "")
+CHART_CACHE_DISK_MAX_BYTES = int(float(os.environ.get("OFFO_CHART_CACHE_DISK_MB", "256")) * 1024 * 1024)
+
+SPILL_SUFFIX = ".chart"
+
+
+def chart_cache_key(trend_data: List[Dict[str, Any]], options: Mapping[str, Any]) -> str:
+    """
+    Cache key for a chart: hash of the (date, score) points and the options.
+
+    Args:
+        trend_data: List of {date, score} dicts
+        options: Rendering options (size, dpi, format, ...)
+
+    Returns:
+        32-character hex digest
+    """
+    payload = dumps({
+        "points": [[point["date"], point["score"]] for point in trend_data],
+        "options": sorted(options.items()),
+    })
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class ChartCache:
+    """Byte-bounded LRU of rendered images with optional disk spill."""
+
+    def __init__(
+        self,
+        max_bytes: int = CHART_CACHE_MAX_BYTES,
+        directory: Optional[str] = None,
+        disk_max_bytes: int = CHART_CACHE_DISK_MAX_BYTES
+    ):
+        self.max_bytes = max_bytes
+        self.directory = directory or None
+        self.disk_max_bytes = disk_max_bytes
+        # Dicts keep insertion order; entries are re-inserted on use, so the
+        # first key is always the least recently used
+        self._entries: Dict[str, bytes] = {}
+        self._bytes = 0
+        # Spilled files as of the last directory scan (plus this worker's
+        # changes since), least recently used first; only feeds stats()
+        self._disk: Dict[str, int] = {}
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._prune_disk()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SPILL_SUFFIX)
+
+    @staticmethod
+    def _touch(path: str):
+        """Mark a spilled file as just used (time_ns orders files written within one clock tick)."""
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    @property
+    def spills(self) -> bool:
+        """Whether get() and put() may touch the disk (keep them off the event loop)."""
+        return self.directory is not None
+
+    def get_from_memory(self, key: str) -> Optional[bytes]:
+        """Cached image for `key` from the memory tier only; never does I/O."""
+        with self._lock:
+            image = self._entries.pop(key, None)
+            if image is not None:
+                self._entries[key] = image
+                CHART_CACHE_EVENTS.inc("hit")
+            return image
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Cached image for `key`, from memory or disk, or None."""
+        image = self.get_from_memory(key)
+        if image is not None:
+            return image
+
+        if self.directory:
+            # Look on disk even if this worker never spilled the key: another may have
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    image = f.read()
+                self._touch(path)
+            except OSError:
+                # Never spilled, or pruned by a worker sharing the directory
+                with self._lock:
+                    self._disk_bytes -= self._disk.pop(key, 0)
+            else:
+                CHART_CACHE_EVENTS.inc("disk_hit")
+                with self._lock:
+                    self._disk_bytes -= self._disk.pop(key, 0)
+                    self._disk[key] = len(image)
+                    self._disk_bytes += len(image)
+                self.put(key, image)
+                return image
+
+        CHART_CACHE_EVENTS.inc("miss")
+        return None
+
+    def put(self, key: str, image: bytes):
+        """Store an image, evicting (and spilling) least recently used ones."""
+        if len(image) > self.max_bytes:
+            self._spill(key, image)
+            return
+
+        evicted: List[Tuple[str, bytes]] = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = image
+            self._bytes += len(image)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                oldest_image = self._entries.pop(oldest)
+                self._bytes -= len(oldest_image)
+                evicted.append((oldest, oldest_image))
+
+        for evicted_key, evicted_image in evicted:
+            CHART_CACHE_EVENTS.inc("eviction")
+            self._spill(evicted_key, evicted_image)
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """Cached image for `key`, rendering and storing it on a miss."""
+        image = self.get(key)
+        if image is None:
+            image = render()
+            self.put(key, image)
+        return image
+
+    def _spill(self, key: str, image: bytes):
+        if not self.directory or len(image) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        if os.path.exists(path):
+            # Spilled earlier, possibly by another worker
+            return
+        partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(partial_path, "wb") as f:
+                f.write(image)
+            os.replace(partial_path, path)
+            self._touch(path)
+        except OSError:
+            try:
+                os.remove(partial_path)
+            except OSError:
+                pass
+            return
+        CHART_CACHE_EVENTS.inc("spill")
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Rescan the directory and drop the least recently used files beyond the disk budget."""
+        found: List[Tuple[int, str, int]] = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(SPILL_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            found.append((stat.st_mtime_ns, name[:-len(SPILL_SUFFIX)], stat.st_size))
+        found.sort()
+
+        total = sum(size for _, _, size in found)
+        dropped = 0
+        while total > self.disk_max_bytes and dropped < len(found):
+            _, oldest, size = found[dropped]
+            dropped += 1
+            total -= size
+            try:
+                os.remove(self._path(oldest))
+            except OSError:
+                continue
+            CHART_CACHE_EVENTS.inc("disk_eviction")
+
+        with self._lock:
+            self._disk = {key: size for _, key, size in found[dropped:]}
+            self._disk_bytes = total
+
+    def clear(self):
+        """Empty the in-memory tier (spilled files are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        hits = CHART_CACHE_EVENTS.value("hit") + CHART_CACHE_EVENTS.value("disk_hit")
+        lookups = hits + CHART_CACHE_EVENTS.value("miss")
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+chart_cache = ChartCache(CHART_CACHE_MAX_BYTES, CHART_CACHE_DIR, CHART_CACHE_DISK_MAX_BYTES)
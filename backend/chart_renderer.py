@@ -0,0 +1,108 @@
+"""
+chart_renderer.py
+
+Off-loop rendering of trend chart images for the HTTP endpoints.
+
+matplotlib holds the GIL for most of a render, so rendering in the
+threadpool still stalls the event loop for every other request. ChartRenderer
+renders on a small "spawn" process pool (OFFO_CHART_WORKERS, 0 renders in
+the threadpool instead) and stores results in the chart cache, where PDF
+reports find them too. Concurrent requests for the same chart share one
+render, and a render whose client disconnected still completes and is
+cached. With a disk tier (OFFO_CHART_CACHE_DIR), disk lookups and spills of
+evicted images run in the threadpool; the event loop only reads memory.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from chart_cache import ChartCache, chart_cache_key
+from lazy_imports import LazyModule
+from metrics import time_stage
+
+
+CHART_WORKERS = int(os.environ.get("OFFO_CHART_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+pdf_generator = LazyModule("pdf_generator")
+
+
+def render_chart_image(trend_data: List[Dict[str, Any]], options: Dict[str, Any]) -> bytes:
+    """Render a chart without the cache; matplotlib is only imported here, in the worker."""
+    return pdf_generator.render_trend_chart_image(trend_data, options)
+
+
+class ChartRenderer:
+    """Cache-first chart rendering on a process pool."""
+
+    def __init__(self, cache: ChartCache, workers: int = CHART_WORKERS):
+        self.cache = cache
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def render(self, trend_data: List[Dict[str, Any]], options: Dict[str, Any]) -> bytes:
+        """
+        Chart image for the trend and options, rendering it on a miss.
+
+        Args:
+            trend_data: List of {date, score} dicts
+            options: create_trend_chart keyword arguments
+
+        Returns:
+            Encoded image
+        """
+        key = chart_cache_key(trend_data, options)
+        image = self.cache.get_from_memory(key)
+        if image is not None:
+            return image
+        if self.cache.spills:
+            image = await run_in_threadpool(self.cache.get, key)
+        else:
+            image = self.cache.get(key)
+        if image is not None:
+            return image
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(key, trend_data, options))
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._finished, key))
+        return await asyncio.shield(task)
+
+    async def _render(self, key: str, trend_data: List[Dict[str, Any]], options: Dict[str, Any]) -> bytes:
+        # Timed here, in the server process: observations made in a pool
+        # worker would stay in that worker's registry
+        with time_stage("chart_render"):
+            if self.workers > 0:
+                loop = asyncio.get_running_loop()
+                image = await loop.run_in_executor(self._get_pool(), render_chart_image, trend_data, options)
+            else:
+                image = await run_in_threadpool(render_chart_image, trend_data, options)
+        if self.cache.spills:
+            # Storing may spill evicted images to disk
+            await run_in_threadpool(self.cache.put, key, image)
+        else:
+            self.cache.put(key, image)
+        return image
+
+    def _finished(self, key: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        # Mark failures as retrieved when every waiter has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
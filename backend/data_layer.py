@@ -3,12 +3,43 @@ data_layer.py
 
 Data access layer for retrieving business metrics.
 Currently uses dummy data for MVP - replace with real Compliance AI DB queries.
+
+For scale testing a synthetic portfolio (see synthetic_portfolio.py) can be
+registered next to the demo businesses, either with register_portfolio() or
+by pointing OFFO_PORTFOLIO_PATH at a saved .npz file.
 """
 
+import os
 from typing import Dict, Optional, List, Any
 from datetime import datetime, timedelta
 
 
+# Synthetic portfolio served alongside the demo businesses (None = demo only)
+_portfolio = None
+
+
+def register_portfolio(portfolio) -> None:
+    """
+    Serve a synthetic portfolio in addition to the demo businesses.
+
+    Args:
+        portfolio: synthetic_portfolio.Portfolio, or None to remove it
+    """
+    global _portfolio
+    _portfolio = portfolio
+
+
+def get_portfolio():
+    """Currently registered synthetic portfolio, or None."""
+    return _portfolio
+
+
+def _portfolio_index(business_id: str) -> Optional[int]:
+    if _portfolio is None:
+        return None
+    return _portfolio.index_of(business_id)
+
+
 def get_business_details(business_id: str) -> Optional[Dict[str, Any]]:
     """
     Retrieves business contextual details for a given business ID.
@@ -60,7 +91,11 @@ def get_business_details(business_id: str) -> Optional[Dict[str, Any]]:
         }
     }
 
-    return business_details.get(business_id, None)
+    if business_id in business_details:
+        return business_details[business_id]
+
+    index = _portfolio_index(business_id)
+    return _portfolio.details_at(index) if index is not None else None
 
 
 def get_business_metrics(business_id: str) -> Optional[Dict[str, float]]:
@@ -120,7 +155,11 @@ def get_business_metrics(business_id: str) -> Optional[Dict[str, float]]:
         }
     }
 
-    return dummy_data.get(business_id, None)
+    if business_id in dummy_data:
+        return dummy_data[business_id]
+
+    index = _portfolio_index(business_id)
+    return _portfolio.metrics_at(index) if index is not None else None
 
 
 def get_30day_trend(business_id: str, current_score: float) -> List[Dict[str, Any]]:
@@ -137,6 +176,10 @@ def get_30day_trend(business_id: str, current_score: float) -> List[Dict[str, An
     Returns:
         List of dictionaries with date and score
     """
+    index = _portfolio_index(business_id)
+    if index is not None:
+        return _portfolio.history(index, current_score, days=30)
+
     trend_data = []
     today = datetime.now()
     
@@ -282,4 +325,12 @@ def get_all_business_ids() -> list[str]:
     Returns:
         List of business ID strings
     """
-    return ["biz_healthy", "biz_mixed", "biz_risky", "biz_critical", "biz_excellent"]
+    business_ids = ["biz_healthy", "biz_mixed", "biz_risky", "biz_critical", "biz_excellent"]
+    if _portfolio is not None:
+        business_ids.extend(_portfolio.business_ids())
+    return business_ids
+
+
+if os.environ.get("OFFO_PORTFOLIO_PATH"):
+    from synthetic_portfolio import load_portfolio
+    register_portfolio(load_portfolio(os.environ["OFFO_PORTFOLIO_PATH"]))
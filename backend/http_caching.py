@@ -0,0 +1,110 @@
+"""
+http_caching.py
+
+HTTP validator helpers for cached API responses.
+
+Provides strong ETags, Last-Modified formatting and evaluation of the
+If-None-Match / If-Modified-Since request headers (RFC 9110 §13).
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterable, Mapping
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Build a strong ETag from an encoded response body.
+
+    Args:
+        body: Exact response bytes
+
+    Returns:
+        Quoted entity tag, e.g. '"3f2a..."'
+    """
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def variant_etag(etag: str, variant: str) -> str:
+    """Derive the ETag for an alternate encoding (e.g. gzip) of the same payload."""
+    return f'{etag[:-1]}-{variant}"'
+
+
+def http_date(moment: datetime) -> str:
+    """Format a datetime (naive values are treated as local time) as an HTTP-date."""
+    return formatdate(moment.timestamp(), usegmt=True)
+
+
+def etag_matches(if_none_match: str, etags: Iterable[str]) -> bool:
+    """
+    Check an If-None-Match header against the current ETags (weak comparison).
+
+    Args:
+        if_none_match: Raw If-None-Match header value
+        etags: ETags that identify the current representation(s)
+
+    Returns:
+        True if any listed tag (or "*") matches
+    """
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in candidates:
+        return True
+    return any(etag.removeprefix("W/") in candidates for etag in etags)
+
+
+def not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    """
+    Check an If-Modified-Since header against the resource's Last-Modified time.
+
+    Args:
+        if_modified_since: Raw If-Modified-Since header value
+        last_modified: When the representation was computed
+
+    Returns:
+        True if the resource has not changed since the given date. Unparseable
+        dates are ignored, as required by the spec.
+    """
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+
+    # HTTP-dates have one-second resolution
+    modified = int(last_modified.timestamp())
+    return modified <= int(since.timestamp())
+
+
+def is_not_modified(headers: Mapping[str, str], etags: Iterable[str], last_modified: datetime) -> bool:
+    """
+    Evaluate conditional GET headers.
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted when
+    no If-None-Match header is present.
+
+    Args:
+        headers: Request headers
+        etags: ETags of the current representation(s)
+        last_modified: When the representation was computed
+
+    Returns:
+        True if a 304 Not Modified response should be sent
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etags)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is not None:
+        return not_modified_since(if_modified_since, last_modified)
+
+    return False
+
+
+def cache_control(max_age: int, private: bool = True) -> str:
+    """Build a Cache-Control header value for the remaining freshness lifetime."""
+    scope = "private" if private else "public"
+    return f"{scope}, max-age={max(0, int(max_age))}"
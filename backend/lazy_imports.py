@@ -0,0 +1,82 @@
+"""
+lazy_imports.py
+
+Deferred imports for heavy subsystems.
+
+pdf_generator and portfolio_report pull in matplotlib (font cache setup
+included) and all of ReportLab, roughly half of main's import time, while
+only the PDF and chart endpoints need them. Modules wrapped in LazyModule
+are imported on first attribute access instead of at startup; warm_up()
+imports them on a background thread once the server is accepting
+requests (OFFO_LAZY_WARMUP, on by default), so the first PDF request does
+not pay for the import either.
+
+Import durations are recorded in offo_stage_duration_seconds under
+"import_<module>".
+"""
+
+import importlib
+import os
+import threading
+from types import ModuleType
+from typing import Any, List, Optional
+
+from metrics import time_stage
+
+
+LAZY_WARMUP_ENABLED = os.environ.get("OFFO_LAZY_WARMUP", "1") == "1"
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+        _lazy_modules.append(self)
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> ModuleType:
+        """Import the module (once) and return it."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    with time_stage(f"import_{self.name}"):
+                        self._module = importlib.import_module(self.name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self.name!r} ({state})>"
+
+
+_lazy_modules: List[LazyModule] = []
+
+
+def load_all():
+    """Import every LazyModule now (e.g. before forking workers)."""
+    for module in list(_lazy_modules):
+        module.load()
+
+
+def warm_up() -> threading.Thread:
+    """
+    Import every LazyModule on a daemon thread.
+
+    The import holds the GIL for most of its run, so requests served
+    meanwhile are slowed, but the server no longer waits for it before
+    accepting connections.
+
+    Returns:
+        The started thread
+    """
+    thread = threading.Thread(target=load_all, name="lazy-import-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,154 @@
+"""
+loop_monitor.py
+
+Event-loop lag monitor for the async API.
+
+A ticker coroutine sleeps for a fixed interval and measures how late it
+wakes up; that delay is the time other code held the event loop. Every tick
+is recorded in offo_event_loop_lag_seconds, and recent lag percentiles are
+exported as gauges.
+
+A watchdog thread checks the ticker's heartbeat. When the loop has not ticked
+for longer than the blocking threshold, it captures the stack of the event
+loop thread, which is the code blocking it at that moment. The most recent
+captures can be read from the admin diagnostics endpoint.
+"""
+
+import asyncio
+import math
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from metrics import REGISTRY
+
+
+# Set OFFO_LOOP_MONITOR=0 to disable the monitor
+LOOP_MONITOR_ENABLED = os.environ.get("OFFO_LOOP_MONITOR", "1") != "0"
+LAG_INTERVAL_SECONDS = 0.1
+BLOCKING_THRESHOLD_SECONDS = 0.1
+MAX_BLOCKING_EVENTS = 50
+LAG_WINDOW_SIZE = 3000  # ~5 minutes of ticks at the default interval
+
+LOOP_LAG = REGISTRY.histogram(
+    "offo_event_loop_lag_seconds",
+    "Delay between scheduled and actual wake-up of the event loop ticker.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_BLOCKED = REGISTRY.counter(
+    "offo_event_loop_blocked_total",
+    "Times the event loop was blocked longer than the blocking threshold."
+)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LoopLagMonitor:
+    """Measures event loop lag and captures stacks of blocking code."""
+
+    def __init__(
+        self,
+        interval: float = LAG_INTERVAL_SECONDS,
+        threshold: float = BLOCKING_THRESHOLD_SECONDS
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.recent_lags: Deque[float] = deque(maxlen=LAG_WINDOW_SIZE)
+        self.blocking_events: Deque[Dict[str, Any]] = deque(maxlen=MAX_BLOCKING_EVENTS)
+        self._heartbeat = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the ticker on the running loop and the watchdog thread."""
+        if self.running:
+            return
+        self._stopped.clear()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        """Stop the ticker and watchdog."""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _tick(self):
+        while True:
+            scheduled = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._heartbeat = now
+
+            lag = max(0.0, now - scheduled)
+            self.recent_lags.append(lag)
+            LOOP_LAG.observe(lag)
+
+    def _watch(self):
+        captured_for = None
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.perf_counter() - heartbeat - self.interval
+            if stalled < self.threshold or captured_for == heartbeat:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+
+            captured_for = heartbeat
+            LOOP_BLOCKED.inc()
+            self.blocking_events.append({
+                "detected_at": datetime.now().isoformat(),
+                "blocked_for_seconds": round(stalled, 4),
+                "stack": traceback.format_stack(frame),
+            })
+
+    def summary(self) -> Dict[str, Any]:
+        """Lag percentiles over the recent window plus captured blocking stacks."""
+        lags = list(self.recent_lags)
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "threshold_seconds": self.threshold,
+            "samples": len(lags),
+            "lag_seconds": {
+                "p50": round(percentile(lags, 0.50), 6),
+                "p90": round(percentile(lags, 0.90), 6),
+                "p99": round(percentile(lags, 0.99), 6),
+                "max": round(max(lags), 6) if lags else 0.0,
+            },
+            "blocking_events": list(self.blocking_events),
+        }
+
+
+loop_monitor = LoopLagMonitor()
+
+for _name, _fraction in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99)):
+    REGISTRY.gauge(
+        f"offo_event_loop_lag_{_name}_seconds",
+        f"{_name} event loop lag over the recent window.",
+        lambda fraction=_fraction: percentile(list(loop_monitor.recent_lags), fraction)
+    )
@@ -5,15 +5,33 @@ FastAPI application for OFFO Risk Score™ API
 
 Endpoints:
     GET /risk-score/{business_id} - Get risk score for a business
+    GET /risk-score/stream?ids=... - Server-sent events of score changes
+    GET /risk-score/changes?since=... - Scores changed after a version
     GET /businesses - List all available business IDs
+    GET /risk-score/{business_id}/trend.png|.svg - 30-day trend chart image
+    POST /reports/jobs - Start a bulk PDF export job
+    GET /reports/jobs/{job_id} - Export job progress
+    GET /reports/jobs/{job_id}/download - ZIP of a finished export job
+    GET /reports/portfolio/pdf - Consolidated portfolio PDF report
+    GET /metrics - Prometheus metrics
+    GET /admin/event-loop - Event loop lag and blocking stacks (admin)
+    GET/POST /admin/profiler - Sampling profiler status and control (admin)
+    GET /admin/profiler/flamegraph - Collapsed stacks for flamegraphs (admin)
+    GET /admin/memory - Memory report with tracemalloc diffs (admin)
+    POST /admin/memory/tracing - Switch tracemalloc on or off (admin)
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse, FileResponse
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, FrozenSet
+from types import ModuleType
 from datetime import datetime, timedelta
+import asyncio
 
 from scoring_algorithm import compute_offo_risk_score
 from data_layer import get_business_metrics, get_all_business_ids, get_30day_trend, get_risk_drivers, get_business_details
@@ -24,22 +42,136 @@ from security import (
     get_current_api_key,
     get_security_info,
     rotate_api_key,
+    require_scope,
     DEFAULT_KEY_ID,
-    ACCESS_TOKEN_EXPIRE_MINUTES
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    ADMIN_SCOPE
+)
+from chart_cache import chart_cache, chart_cache_key
+from chart_renderer import ChartRenderer
+from serialization import dumps, gzip_bytes, accepts_gzip, GZIP_MIN_SIZE
+from http_caching import make_etag, variant_etag, http_date, is_not_modified, etag_matches, cache_control
+from metrics import (
+    REGISTRY,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    CACHE_EVENTS,
+    MetricsMiddleware,
+    time_stage
+)
+from profiling import ProfilingMiddleware, profiling_active
+from loop_monitor import loop_monitor, LOOP_MONITOR_ENABLED
+from sampling_profiler import sampling_profiler, SAMPLING_PROFILER_ENABLED
+from memory_diagnostics import memory_diagnostics, DEFAULT_TOP as MEMORY_REPORT_TOP
+from traffic_recorder import TrafficRecorderMiddleware, traffic_recorder
+from tracing import TracingMiddleware, trace_exporter
+from report_jobs import (
+    ReportJobManager, select_businesses, MAX_ACTIVE_JOBS, MAX_JOB_BUSINESSES, MAX_PORTFOLIO_REPORT_BUSINESSES, JOB_COMPLETED,
+    REPORT_DIR
 )
-from pdf_generator import generate_risk_report_pdf
+from lazy_imports import LazyModule, warm_up, LAZY_WARMUP_ENABLED
+from score_warmup import (
+    CACHE_SNAPSHOT_PATH,
+    WARMUP_LIMIT,
+    WARMUP_CONCURRENCY,
+    WARMUP_ACCESS_LOG,
+    hot_business_ids,
+    run_bounded,
+    save_snapshot,
+    load_snapshot
+)
+from sharding import owns_business
+from score_events import (
+    score_broadcaster,
+    score_changes,
+    format_event,
+    MAX_STREAM_IDS,
+    HEARTBEAT_SECONDS,
+    HEARTBEAT_EVENT
+)
+
+# ReportLab and matplotlib are only needed by the PDF endpoints; import them
+# on first use (or from the background warm-up) instead of at startup
+pdf_generator = LazyModule("pdf_generator")
+portfolio_report = LazyModule("portfolio_report")
 
 
-# In-memory cache with TTL
+# In-memory cache with TTL; oldest entries are evicted beyond CACHE_MAX_ENTRIES
 CACHE_TTL_MINUTES = 5
+CACHE_MAX_ENTRIES = 10_000
 _score_cache: Dict[str, Dict[str, Any]] = {}
 _cache_timestamps: Dict[str, datetime] = {}
 
+# Pre-serialized response bodies, keyed like _score_cache. Gzip variants are
+# built lazily the first time a gzip-capable client hits an entry.
+GZIP_CACHED_RESPONSES = True
+_encoded_cache: Dict[str, bytes] = {}
+_gzip_cache: Dict[str, bytes] = {}
+_etag_cache: Dict[str, str] = {}
+
+# Pre-encoded /businesses response (body, etag, computed_at)
+_business_list_cache: Dict[str, Any] = {}
+
+# Fields that can be requested via ``?fields=`` on /risk-score/{business_id}
+RESPONSE_FIELDS = (
+    "business_id",
+    "overall_score",
+    "category",
+    "components",
+    "weights",
+    "business_details",
+    "trend_30d",
+    "drivers",
+    "recommended_actions",
+)
+PDF_REPORT_FIELDS = frozenset(RESPONSE_FIELDS) - {"business_details"}
+TREND_CHART_FIELDS = frozenset({"trend_30d"})
+
+# Trend chart endpoint options: defaults and accepted ranges
+CHART_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+DEFAULT_CHART_WIDTH = 8.0
+DEFAULT_CHART_HEIGHT = 3.0
+DEFAULT_CHART_DPI = 100
+SVG_CHART_DPI = 72
+CHART_WIDTH_RANGE = (2, 16)
+CHART_HEIGHT_RANGE = (1, 8)
+CHART_DPI_RANGE = (50, 300)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background services around the application's lifetime."""
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    if SAMPLING_PROFILER_ENABLED:
+        sampling_profiler.start()
+    if LAZY_WARMUP_ENABLED:
+        warm_up()
+    if CACHE_SNAPSHOT_PATH:
+        # Before serving, so the first wave of traffic already hits the cache
+        restore_score_cache_snapshot(CACHE_SNAPSHOT_PATH)
+    warmup_task = None
+    if WARMUP_LIMIT > 0:
+        warmup_task = asyncio.create_task(warm_score_cache(WARMUP_LIMIT, WARMUP_CONCURRENCY))
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    loop_monitor.stop()
+    sampling_profiler.stop()
+    if traffic_recorder is not None:
+        traffic_recorder.flush()
+    if trace_exporter is not None:
+        trace_exporter.flush()
+    report_jobs.shutdown()
+    chart_renderer.shutdown()
+    if CACHE_SNAPSHOT_PATH:
+        save_score_cache_snapshot(CACHE_SNAPSHOT_PATH)
+
 
 app = FastAPI(
     title="OFFO Risk Score API",
     description="Risk Intelligence scoring system for businesses",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for frontend
@@ -50,6 +182,36 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+if trace_exporter is not None:
+    app.add_middleware(TracingMiddleware, exporter=trace_exporter)
+if traffic_recorder is not None:
+    app.add_middleware(TrafficRecorderMiddleware, recorder=traffic_recorder)
+
+REGISTRY.gauge(
+    "offo_score_cache_entries",
+    "Entries currently held in the score cache (full and partial).",
+    lambda: len(_score_cache)
+)
+
+REGISTRY.gauge(
+    "offo_chart_cache_bytes",
+    "Bytes of rendered chart images held in memory by the chart cache.",
+    lambda: chart_cache.stats()["bytes"]
+)
+
+memory_diagnostics.register_structure("score_cache", lambda: _score_cache)
+memory_diagnostics.register_structure("score_cache_encoded", lambda: _encoded_cache)
+memory_diagnostics.register_structure("score_cache_gzip", lambda: _gzip_cache)
+memory_diagnostics.register_structure("score_cache_etags", lambda: _etag_cache)
+memory_diagnostics.register_structure("score_cache_timestamps", lambda: _cache_timestamps)
+memory_diagnostics.register_structure("score_change_log", lambda: score_changes._entries)
+memory_diagnostics.register_structure("chart_cache", lambda: chart_cache._entries)
+memory_diagnostics.register_structure("stream_subscriptions", lambda: score_broadcaster._subscribers)
+memory_diagnostics.register_structure("sampling_profiler_buckets", lambda: sampling_profiler._buckets)
+
+chart_renderer = ChartRenderer(chart_cache)
 
 
 class TrendDataPoint(BaseModel):
@@ -82,6 +244,14 @@ class BusinessListResponse(BaseModel):
     businesses: list[str]
 
 
+class ReportJobRequest(BaseModel):
+    """Request model for bulk PDF export: explicit IDs or filters"""
+    business_ids: Optional[List[str]] = None
+    industry: Optional[str] = None
+    location: Optional[str] = None
+    category: Optional[str] = None
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -92,6 +262,166 @@ async def root():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus metrics in the text exposition format.
+
+    Includes request counts and latency per route and status, latency per
+    internal pipeline stage, score cache hits/misses/evictions and process
+    memory.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/admin/event-loop")
+async def get_event_loop_health(token_data: TokenData = Depends(require_scope(ADMIN_SCOPE))):
+    """
+    Event loop lag percentiles and stacks of recently detected blocking code.
+    Requires a token with the admin scope.
+
+    Returns:
+        Monitor settings, lag p50/p90/p99/max over the recent window and the
+        latest blocking events with the event loop thread's stack
+    """
+    return loop_monitor.summary()
+
+
+@app.get("/admin/profiler")
+async def get_profiler_status(token_data: TokenData = Depends(require_scope(ADMIN_SCOPE))):
+    """
+    Sampling profiler status: running flag, rate, retained minutes and
+    measured overhead. Requires a token with the admin scope.
+    """
+    return sampling_profiler.status()
+
+
+@app.post("/admin/profiler")
+async def control_profiler(
+    enabled: bool,
+    rate_hz: Optional[float] = None,
+    token_data: TokenData = Depends(require_scope(ADMIN_SCOPE))
+):
+    """
+    Start or stop the background sampling profiler at runtime.
+    Requires a token with the admin scope.
+
+    Args:
+        enabled: True to start sampling, False to stop
+        rate_hz: Optional sampling rate (1-1000 Hz) applied when starting
+
+    Returns:
+        Profiler status after the change
+    """
+    if rate_hz is not None and not 1 <= rate_hz <= 1000:
+        raise HTTPException(status_code=400, detail="rate_hz must be between 1 and 1000")
+
+    if enabled:
+        sampling_profiler.start(rate_hz)
+    else:
+        sampling_profiler.stop()
+    return sampling_profiler.status()
+
+
+@app.get("/admin/profiler/flamegraph", response_class=PlainTextResponse)
+async def download_flamegraph(
+    minutes: int = 5,
+    token_data: TokenData = Depends(require_scope(ADMIN_SCOPE))
+):
+    """
+    Download the last N minutes of samples as collapsed stacks, the input
+    format of flamegraph.pl, speedscope and similar tools.
+    Requires a token with the admin scope.
+
+    Args:
+        minutes: Window to export (1 to the retention period)
+
+    Returns:
+        text/plain attachment with one "frame;frame;frame count" line per stack
+    """
+    if not 1 <= minutes <= sampling_profiler.retention_minutes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"minutes must be between 1 and {sampling_profiler.retention_minutes}"
+        )
+
+    filename = f"offo_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{minutes}m.collapsed"
+    return PlainTextResponse(
+        sampling_profiler.collapsed(minutes),
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@app.get("/admin/memory")
+async def get_memory_report(
+    top: int = MEMORY_REPORT_TOP,
+    reset_baseline: bool = False,
+    token_data: TokenData = Depends(require_scope(ADMIN_SCOPE))
+):
+    """
+    Memory report: RSS and the size of each cache structure, plus (while
+    tracemalloc is on) the top allocating lines and their growth since the
+    baseline snapshot. Requires a token with the admin scope.
+
+    Args:
+        top: Number of source lines to list (1-200)
+        reset_baseline: Use this snapshot as the baseline for the next diff
+
+    Returns:
+        Memory report dictionary
+    """
+    if not 1 <= top <= 200:
+        raise HTTPException(status_code=400, detail="top must be between 1 and 200")
+    return await run_blocking(memory_diagnostics.report, top, reset_baseline)
+
+
+@app.post("/admin/memory/tracing")
+async def control_memory_tracing(
+    enabled: bool,
+    frames: int = 1,
+    token_data: TokenData = Depends(require_scope(ADMIN_SCOPE))
+):
+    """
+    Switch tracemalloc on (taking a fresh baseline) or off at runtime.
+    Tracing slows allocations noticeably, so leave it off when not diagnosing.
+    Requires a token with the admin scope.
+
+    Args:
+        enabled: True to start tracing, False to stop
+        frames: Stack frames stored per allocation when starting (1-25)
+
+    Returns:
+        Current tracing state
+    """
+    if not 1 <= frames <= 25:
+        raise HTTPException(status_code=400, detail="frames must be between 1 and 25")
+
+    if enabled:
+        memory_diagnostics.start(frames)
+    else:
+        memory_diagnostics.stop()
+    return {"tracing": memory_diagnostics.tracing}
+
+
+async def run_blocking(func, *args):
+    """
+    Run synchronous, CPU- or IO-heavy work off the event loop.
+
+    While a request is being profiled the work runs inline instead, so it
+    shows up in the cProfile output.
+    """
+    if profiling_active.get():
+        return func(*args)
+    return await run_in_threadpool(func, *args)
+
+
+async def load_lazy(module: LazyModule) -> ModuleType:
+    """Import a lazily loaded subsystem in the threadpool rather than on the event loop."""
+    if module.loaded:
+        return module.load()
+    return await run_blocking(module.load)
+
+
 @app.post("/auth/token")
 async def get_token(client_id: str = "demo_client"):
     """
@@ -116,115 +446,618 @@ async def get_token(client_id: str = "demo_client"):
     }
 
 
-def is_cache_valid(business_id: str) -> bool:
+def is_cache_valid(key: str) -> bool:
     """Check if cached data is still valid."""
-    if business_id not in _cache_timestamps:
+    if key not in _cache_timestamps:
         return False
 
-    cache_time = _cache_timestamps[business_id]
+    cache_time = _cache_timestamps[key]
     expiry_time = cache_time + timedelta(minutes=CACHE_TTL_MINUTES)
     return datetime.now() < expiry_time
 
 
-def get_cached_score(business_id: str) -> Dict[str, Any] | None:
-    """Retrieve cached score if valid."""
-    if is_cache_valid(business_id):
-        return _score_cache.get(business_id)
+def cache_seconds_remaining(computed_at: datetime) -> int:
+    """Seconds until an entry computed at `computed_at` expires (for max-age)."""
+    expiry_time = computed_at + timedelta(minutes=CACHE_TTL_MINUTES)
+    return max(0, int((expiry_time - datetime.now()).total_seconds()))
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    computed_at: datetime,
+    private: bool = True,
+    gzip_body: Optional[bytes] = None
+) -> Response:
+    """
+    Build a JSON Response with validators, answering 304 when the client is current.
+
+    Args:
+        request: Incoming request (conditional and Accept-Encoding headers)
+        body: Encoded JSON body
+        etag: Strong ETag of the identity-encoded body
+        computed_at: When the payload was computed (Last-Modified)
+        private: Whether shared caches must not store the response
+        gzip_body: Pre-compressed body to serve to gzip-capable clients
+
+    Returns:
+        200 Response with the body, or an empty 304 Response
+    """
+    headers = {
+        "Last-Modified": http_date(computed_at),
+        "Cache-Control": cache_control(cache_seconds_remaining(computed_at), private=private),
+    }
+
+    use_gzip = gzip_body is not None and accepts_gzip(request.headers.get("accept-encoding"))
+    if gzip_body is not None:
+        headers["Vary"] = "Accept-Encoding"
+    if use_gzip:
+        body = gzip_body
+        headers["Content-Encoding"] = "gzip"
+        headers["ETag"] = variant_etag(etag, "gzip")
+    else:
+        headers["ETag"] = etag
+
+    if is_not_modified(request.headers, (etag, variant_etag(etag, "gzip")), computed_at):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def get_cached_score(key: str) -> Dict[str, Any] | None:
+    """Retrieve cached score if valid (key is a business ID or a cache_key())."""
+    if is_cache_valid(key):
+        return _score_cache.get(key)
     return None
 
 
-def set_cached_score(business_id: str, data: Dict[str, Any]):
-    """Store score in cache with current timestamp."""
-    _score_cache[business_id] = data
-    _cache_timestamps[business_id] = datetime.now()
+def set_cached_score(key: str, data: Dict[str, Any], computed_at: Optional[datetime] = None):
+    """Store score and its encoded JSON body in cache with current timestamp."""
+    with time_stage("serialize_json"):
+        body = dumps(data)
 
+    # Re-insert so dict order tracks insertion time for oldest-first eviction
+    if key in _score_cache:
+        delete_cached_score(key)
+    while len(_score_cache) >= CACHE_MAX_ENTRIES:
+        delete_cached_score(next(iter(_score_cache)))
+        CACHE_EVENTS.inc("eviction")
 
-@app.get("/risk-score/{business_id}")
-async def get_risk_score(
+    _score_cache[key] = data
+    _encoded_cache[key] = body
+    _etag_cache[key] = make_etag(body)
+    _gzip_cache.pop(key, None)
+    _cache_timestamps[key] = computed_at or datetime.now()
+
+
+def delete_cached_score(key: str):
+    """Drop one cache entry and its encoded variants."""
+    _score_cache.pop(key, None)
+    _cache_timestamps.pop(key, None)
+    _encoded_cache.pop(key, None)
+    _gzip_cache.pop(key, None)
+    _etag_cache.pop(key, None)
+
+
+def clear_score_cache():
+    """Drop every cached score and its encoded variants."""
+    _score_cache.clear()
+    _cache_timestamps.clear()
+    _encoded_cache.clear()
+    _gzip_cache.clear()
+    _etag_cache.clear()
+
+
+def cached_score_response(request: Request, key: str) -> Response | None:
+    """
+    Build a raw JSON Response from the pre-encoded cache entry for a key.
+
+    The body is returned as stored, skipping jsonable_encoder and json.dumps.
+    Clients that accept gzip get a pre-compressed variant for larger bodies.
+    The response carries ETag, Last-Modified and Cache-Control headers and
+    becomes a 304 when the client's validators still match.
+
+    Args:
+        request: Incoming request (conditional and Accept-Encoding headers)
+        key: Cache key (business ID or cache_key())
+
+    Returns:
+        Response, or None if the key is not cached or has expired
+    """
+    if not is_cache_valid(key):
+        return None
+
+    body = _encoded_cache.get(key)
+    if body is None:
+        return None
+
+    gzip_body = None
+    if GZIP_CACHED_RESPONSES and len(body) >= GZIP_MIN_SIZE:
+        gzip_body = _gzip_cache.get(key)
+        if gzip_body is None:
+            gzip_body = gzip_bytes(body)
+            _gzip_cache[key] = gzip_body
+
+    return conditional_response(
+        request,
+        body,
+        _etag_cache[key],
+        _cache_timestamps[key],
+        gzip_body=gzip_body
+    )
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FrozenSet[str]]:
+    """
+    Parse a comma-separated ``fields`` query parameter.
+
+    Args:
+        fields: Raw query value, e.g. "overall_score,category"
+
+    Returns:
+        Frozen set of requested response fields, or None for the full response
+
+    Raises:
+        HTTPException: 400 if an unknown field is requested
+    """
+    if fields is None or not fields.strip():
+        return None
+
+    requested = frozenset(f.strip() for f in fields.split(",") if f.strip())
+    unknown = requested - set(RESPONSE_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                   f"Valid fields: {', '.join(RESPONSE_FIELDS)}"
+        )
+
+    if requested >= set(RESPONSE_FIELDS):
+        return None
+    return requested | {"business_id"}
+
+
+def cache_key(business_id: str, fields: Optional[FrozenSet[str]] = None) -> str:
+    """Build the cache key for a full or partial risk score response."""
+    if fields is None:
+        return business_id
+    return f"{business_id}?fields={','.join(sorted(fields))}"
+
+
+def select_fields(data: Dict[str, Any], fields: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+    """Trim a full response down to the requested fields, keeping key order."""
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key in fields}
+
+
+def build_risk_score_data(
+    business_id: str,
+    fields: Optional[FrozenSet[str]] = None
+) -> Dict[str, Any] | None:
+    """
+    Run the scoring pipeline for a business, skipping stages that are not needed.
+
+    Metrics fetch and score computation always run; trend, drivers, business
+    details and recommended actions only run when their field is requested.
+
+    Args:
+        business_id: Unique identifier for the business
+        fields: Requested response fields, or None for everything
+
+    Returns:
+        Response dictionary, or None if business_id is not found
+    """
+    def wanted(field: str) -> bool:
+        return fields is None or field in fields
+
+    # Fetch business metrics
+    with time_stage("metrics_fetch"):
+        metrics = get_business_metrics(business_id)
+    if metrics is None:
+        return None
+
+    # Compute risk score
+    with time_stage("compute_score"):
+        risk_score = compute_offo_risk_score(metrics)
+
+    response_data = {
+        "business_id": business_id,
+        **risk_score,
+    }
+
+    # Get business details (employee count, industry, etc.)
+    if wanted("business_details"):
+        with time_stage("business_details"):
+            business_details = get_business_details(business_id)
+        if business_details is None:
+            business_details = {
+                "employee_count": None,
+                "industry": "Unknown",
+                "location": "Unknown",
+                "risk_profile": "No profile available"
+            }
+        response_data["business_details"] = business_details
+
+    # Get 30-day trend
+    if wanted("trend_30d"):
+        with time_stage("trend_30d"):
+            response_data["trend_30d"] = get_30day_trend(business_id, risk_score["overall_score"])
+
+    # Get risk drivers
+    if wanted("drivers"):
+        with time_stage("drivers"):
+            response_data["drivers"] = get_risk_drivers(business_id, risk_score["components"])
+
+    # Generate recommended actions based on category
+    if wanted("recommended_actions"):
+        with time_stage("recommended_actions"):
+            response_data["recommended_actions"] = generate_recommended_actions(
+                risk_score["category"],
+                risk_score["components"]
+            )
+
+    return select_fields(response_data, fields)
+
+
+def compute_and_cache_score(
+    business_id: str,
+    fields: Optional[FrozenSet[str]] = None
+) -> Dict[str, Any] | None:
+    """
+    Compute a (possibly partial) score, cache it and notify live streams.
+
+    Args:
+        business_id: Unique identifier for the business
+        fields: Requested response fields, or None for everything
+
+    Returns:
+        Response dictionary, or None if business_id is not found
+    """
+    response_data = build_risk_score_data(business_id, fields)
+    if response_data is None:
+        return None
+    return store_computed_score(business_id, response_data, fields)
+
+
+def store_computed_score(
     business_id: str,
+    response_data: Dict[str, Any],
+    fields: Optional[FrozenSet[str]] = None
+) -> Dict[str, Any]:
+    """
+    Cache a freshly computed score and notify live streams.
+
+    Full computations get a ``version`` from score_changes. When the score,
+    category or drivers changed, the new version is logged for
+    /risk-score/changes and pushed to /risk-score/stream subscribers.
+    Must run on the event loop thread, like every other cache update.
+
+    Args:
+        business_id: Unique identifier for the business
+        response_data: Output of build_risk_score_data()
+        fields: Requested response fields, or None for everything
+
+    Returns:
+        The response dictionary (with ``version`` for full computations)
+    """
+    key = cache_key(business_id, fields)
+
+    if fields is None:
+        version, changed = score_changes.record(business_id, response_data)
+        response_data["version"] = version
+        set_cached_score(key, response_data)
+        if changed:
+            score_changes.attach_body(business_id, version, _encoded_cache[key])
+            score_broadcaster.publish(business_id, _encoded_cache[key], version)
+    else:
+        set_cached_score(key, response_data)
+
+    return response_data
+
+
+async def refresh_watched_scores(business_ids: List[str]):
+    """Recompute expired scores for streamed businesses so changes get pushed."""
+    for business_id in business_ids:
+        if not is_cache_valid(business_id):
+            compute_and_cache_score(business_id)
+        # Let request handlers run between businesses
+        await asyncio.sleep(0)
+
+
+async def warm_score_cache(limit: int, concurrency: int = WARMUP_CONCURRENCY) -> int:
+    """
+    Pre-score the hottest businesses that are not cached yet.
+
+    Scores are computed in the threadpool, at most `concurrency` at a time,
+    and cached on the event loop, exactly as a request would. In sharded
+    mode only this worker's own businesses are warmed.
+
+    Args:
+        limit: Maximum number of businesses to consider
+        concurrency: Maximum computations in flight
+
+    Returns:
+        Number of businesses scored
+    """
+    business_ids = await run_blocking(hot_business_ids, limit, WARMUP_ACCESS_LOG)
+
+    async def warm(business_id: str) -> bool:
+        if is_cache_valid(business_id) or not owns_business(business_id):
+            return False
+        response_data = await run_blocking(build_risk_score_data, business_id)
+        # A request may have cached it in the meantime
+        if response_data is None or is_cache_valid(business_id):
+            return False
+        store_computed_score(business_id, response_data)
+        CACHE_EVENTS.inc("warmed")
+        return True
+
+    return await run_bounded(business_ids, warm, concurrency)
+
+
+def save_score_cache_snapshot(path: str) -> int:
+    """Write every unexpired score cache entry to a snapshot file."""
+    entries = sorted(
+        ((key, _cache_timestamps[key], _encoded_cache[key]) for key in list(_score_cache) if is_cache_valid(key)),
+        key=lambda entry: entry[1]
+    )
+    return save_snapshot(path, entries, score_changes.latest_version)
+
+
+def restore_score_cache_snapshot(path: str) -> int:
+    """
+    Load unexpired entries from a snapshot into the score cache.
+
+    A missing or unreadable snapshot is ignored (the cache starts cold). In
+    sharded mode entries for businesses other workers own are skipped.
+
+    Returns:
+        Number of entries restored
+    """
+    try:
+        latest_version, entries = load_snapshot(path, timedelta(minutes=CACHE_TTL_MINUTES))
+    except (OSError, ValueError):
+        return 0
+
+    restored = 0
+    versions = []
+    for key, computed_at, data in entries:
+        if not owns_business(key.split("?", 1)[0]):
+            continue
+        set_cached_score(key, data, computed_at=computed_at)
+        if key == data.get("business_id") and "version" in data:
+            versions.append((key, data["version"], data, _encoded_cache[key]))
+        restored += 1
+    score_changes.restore(latest_version, versions)
+    CACHE_EVENTS.inc("restored", amount=restored)
+    return restored
+
+
+@app.get("/risk-score/stream")
+async def stream_risk_scores(
+    ids: str,
     token_data: TokenData = Depends(verify_token)
 ):
     """
-    Calculate and return the OFFO Risk Score for a given business.
+    Stream score changes for a set of businesses as server-sent events.
 
-    Results are cached for 5 minutes for performance.
+    The stream starts with one ``score`` event per business carrying its
+    current full response, then sends a new ``score`` event only when a
+    business's score, category or drivers change. Idle streams receive a
+    keep-alive comment every 15 seconds. Slow clients never queue more than
+    one pending event per business; newer events replace older ones.
     Requires valid JWT Bearer token for authentication.
 
     Args:
-        business_id: Unique identifier for the business
+        ids: Comma-separated business IDs to watch
         token_data: Validated token data from authorization header
 
     Returns:
-        RiskScoreResponse with overall score, category, component breakdown, trend, and drivers
+        text/event-stream response
 
     Raises:
-        HTTPException: 401 if unauthorized, 404 if business_id not found
+        HTTPException: 400 if no IDs or too many IDs are given, 401 if
+            unauthorized, 404 if any business_id is not found
     """
-    # Check cache first
-    cached_data = get_cached_score(business_id)
-    if cached_data is not None:
-        return cached_data
+    business_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if not business_ids:
+        raise HTTPException(status_code=400, detail="At least one business ID is required")
+    if len(business_ids) > MAX_STREAM_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A stream can watch at most {MAX_STREAM_IDS} businesses"
+        )
 
-    # Fetch business metrics
-    metrics = get_business_metrics(business_id)
+    initial_events = []
+    for business_id in business_ids:
+        if get_cached_score(business_id) is None and compute_and_cache_score(business_id) is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Business ID '{business_id}' not found"
+            )
+        initial_events.append(format_event(
+            "score",
+            _encoded_cache[business_id],
+            event_id=str(score_changes.version_of(business_id))
+        ))
+
+    subscription = score_broadcaster.subscribe(business_ids)
+    score_broadcaster.ensure_refresher(refresh_watched_scores)
+
+    async def event_stream():
+        try:
+            yield b"".join(initial_events)
+            while True:
+                events = await subscription.next_events(HEARTBEAT_SECONDS)
+                yield b"".join(events) if events else HEARTBEAT_EVENT
+        finally:
+            score_broadcaster.unsubscribe(subscription)
 
-    if metrics is None:
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+@app.get("/risk-score/changes")
+async def get_score_changes(
+    since: int = 0,
+    limit: int = 1000,
+    token_data: TokenData = Depends(verify_token)
+):
+    """
+    Return the businesses whose score changed after a given version.
+
+    Every full score carries a ``version`` that increases only when its
+    score, category or drivers change. Clients keep ``latest_version`` from
+    the previous call and pass it back as ``since`` to receive just the
+    delta. When more than ``limit`` businesses changed, call again with
+    ``since=next_since`` until ``has_more`` is false.
+
+    Only businesses that have been scored since the process started appear
+    in the log, and only the most recent CHANGE_LOG_RETENTION changes are
+    retained. When changes after ``since`` have already been dropped, the
+    response has ``truncated`` set and carries every retained change: the
+    client should refetch the businesses it tracks and continue from
+    ``next_since``. Requires valid JWT Bearer token for authentication.
+
+    Args:
+        since: Last version the client has seen (0 for all retained changes)
+        limit: Maximum number of businesses to return (1-10000)
+        token_data: Validated token data from authorization header
+
+    Returns:
+        JSON with latest_version, next_since, has_more, truncated and
+        changes (full score payloads, each including its version)
+
+    Raises:
+        HTTPException: 400 for an invalid limit, 401 if unauthorized, 410 if
+            `since` is newer than the latest version (client must resync)
+    """
+    if not 1 <= limit <= 10000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 10000")
+
+    truncated = not score_changes.covers(since)
+    changes = score_changes.changes_since(since, limit)
+    if changes is None:
         raise HTTPException(
-            status_code=404,
-            detail=f"Business ID '{business_id}' not found"
+            status_code=410,
+            detail=f"Version {since} is newer than the latest version "
+                   f"{score_changes.latest_version}; resync with since=0"
         )
 
-    # Compute risk score
-    risk_score = compute_offo_risk_score(metrics)
+    latest = score_changes.latest_version
+    next_since = changes[-1][0] if len(changes) >= limit else latest
+    body = b"".join([
+        b'{"latest_version":', str(latest).encode(),
+        b',"next_since":', str(next_since).encode(),
+        b',"has_more":', b"true" if next_since < latest else b"false",
+        b',"truncated":', b"true" if truncated else b"false",
+        b',"changes":[', b",".join(change[2] for change in changes), b"]}",
+    ])
+    return Response(content=body, media_type="application/json")
 
-    # Get 30-day trend
-    trend_data = get_30day_trend(business_id, risk_score["overall_score"])
 
-    # Get risk drivers
-    drivers = get_risk_drivers(business_id, risk_score["components"])
+@app.get("/risk-score/{business_id}")
+async def get_risk_score(
+    business_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    token_data: TokenData = Depends(verify_token)
+):
+    """
+    Calculate and return the OFFO Risk Score for a given business.
 
-    # Get business details (employee count, industry, etc.)
-    business_details = get_business_details(business_id)
-    if business_details is None:
-        business_details = {
-            "employee_count": None,
-            "industry": "Unknown",
-            "location": "Unknown",
-            "risk_profile": "No profile available"
-        }
+    Results are cached for 5 minutes for performance, as pre-encoded JSON
+    bytes (plus a gzip variant) that are returned directly as a raw Response.
+    Requires valid JWT Bearer token for authentication.
 
-    # Generate recommended actions based on category
-    recommended_actions = generate_recommended_actions(
-        risk_score["category"],
-        risk_score["components"]
-    )
+    Pass ``fields`` (comma-separated, e.g. ``fields=overall_score,category``) to
+    receive a sparse response; pipeline stages for omitted fields are skipped.
+    ``business_id`` is always included.
 
-    # Build complete response
-    response_data = {
-        "business_id": business_id,
-        **risk_score,
-        "business_details": business_details,
-        "trend_30d": trend_data,
-        "drivers": drivers,
-        "recommended_actions": recommended_actions
-    }
+    Args:
+        business_id: Unique identifier for the business
+        request: Incoming request (conditional and Accept-Encoding headers)
+        fields: Optional comma-separated list of response fields
+        token_data: Validated token data from authorization header
 
-    # Cache the result
-    set_cached_score(business_id, response_data)
+    Returns:
+        RiskScoreResponse with overall score, category, component breakdown, trend, and drivers
 
-    return response_data
+    Raises:
+        HTTPException: 400 for unknown fields, 401 if unauthorized, 404 if business_id not found
+    """
+    requested_fields = parse_fields(fields)
+    key = cache_key(business_id, requested_fields)
+
+    with time_stage("cache_lookup"):
+        cached_response = cached_score_response(request, key)
+    if cached_response is not None:
+        CACHE_EVENTS.inc("hit")
+        return cached_response
+
+    # A cached full response can serve any field selection; cache the trimmed
+    # body alongside it with the same timestamp so both expire together.
+    if requested_fields is not None:
+        cached_data = get_cached_score(business_id)
+        if cached_data is not None:
+            CACHE_EVENTS.inc("hit")
+            set_cached_score(
+                key,
+                select_fields(cached_data, requested_fields),
+                computed_at=_cache_timestamps[business_id]
+            )
+            return cached_score_response(request, key)
+
+    CACHE_EVENTS.inc("miss")
+
+    # Compute and cache the result
+    response_data = compute_and_cache_score(business_id, requested_fields)
+
+    if response_data is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Business ID '{business_id}' not found"
+        )
+
+    return cached_score_response(request, key)
 
 
 @app.get("/businesses", response_model=BusinessListResponse)
-async def list_businesses():
+async def list_businesses(request: Request):
     """
     Get list of all available business IDs.
 
+    The encoded list is cached for the same TTL as scores and served with
+    ETag / Last-Modified validators and a public Cache-Control header.
+
+    Args:
+        request: Incoming request (conditional headers)
+
     Returns:
         BusinessListResponse with list of business IDs
     """
-    businesses = get_all_business_ids()
-    return {"businesses": businesses}
+    computed_at = _business_list_cache.get("computed_at")
+    if computed_at is None or cache_seconds_remaining(computed_at) <= 0:
+        body = dumps({"businesses": get_all_business_ids()})
+        computed_at = datetime.now()
+        _business_list_cache.update(body=body, etag=make_etag(body), computed_at=computed_at)
+
+    return conditional_response(
+        request,
+        _business_list_cache["body"],
+        _business_list_cache["etag"],
+        computed_at,
+        private=False
+    )
 
 
 @app.get("/risk-score/{business_id}/raw")
@@ -274,51 +1107,276 @@ async def export_risk_report_pdf(
         token_data: Validated token data from authorization header
 
     Returns:
-        PDF file as streaming response
+        PDF file streamed in chunks from a spooled temporary file
 
     Raises:
         HTTPException: 401 if unauthorized, 404 if business_id not found
     """
-    # Get complete risk data
-    metrics = get_business_metrics(business_id)
+    # Get complete risk data (business details are not part of the report)
+    complete_data = build_risk_score_data(business_id, PDF_REPORT_FIELDS)
 
-    if metrics is None:
+    if complete_data is None:
         raise HTTPException(
             status_code=404,
             detail=f"Business ID '{business_id}' not found"
         )
 
-    # Compute risk score
-    risk_score = compute_offo_risk_score(metrics)
-
-    # Get additional data
-    trend_data = get_30day_trend(business_id, risk_score["overall_score"])
-    drivers = get_risk_drivers(business_id, risk_score["components"])
-    recommended_actions = generate_recommended_actions(
-        risk_score["category"],
-        risk_score["components"]
+    # Generate PDF in the threadpool; ReportLab and matplotlib would
+    # otherwise block the event loop for the whole render
+    generator = await load_lazy(pdf_generator)
+    pdf_file = await run_blocking(generator.generate_risk_report_pdf, complete_data)
+    size = pdf_file.seek(0, 2)
+    pdf_file.seek(0)
+
+    # Stream in chunks; iter_file_chunks closes the file when done
+    filename = f"OFFO_Risk_Report_{business_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+
+    return StreamingResponse(
+        generator.iter_file_chunks(pdf_file),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(size)
+        }
     )
 
-    # Build complete data
-    complete_data = {
-        "business_id": business_id,
-        **risk_score,
-        "trend_30d": trend_data,
-        "drivers": drivers,
-        "recommended_actions": recommended_actions
+
+@app.get("/risk-score/{business_id}/trend.{image_format}")
+async def get_trend_chart_image(
+    request: Request,
+    business_id: str,
+    image_format: str,
+    width: float = DEFAULT_CHART_WIDTH,
+    height: float = DEFAULT_CHART_HEIGHT,
+    dpi: int = DEFAULT_CHART_DPI,
+    token_data: TokenData = Depends(verify_token)
+):
+    """
+    30-day trend chart as a PNG or SVG image.
+
+    Images are identified by a hash of the trend points and the rendering
+    options, which doubles as a strong ETag: clients revalidating with
+    If-None-Match get a 304 without a render. Misses are rendered on the
+    chart worker pool and kept in the chart cache shared with PDF reports
+    (which request dpi=300).
+    Requires valid JWT Bearer token for authentication.
+
+    Args:
+        business_id: Unique identifier for the business
+        image_format: "png" or "svg"
+        width: Figure width in inches (2-16)
+        height: Figure height in inches (1-8)
+        dpi: Raster resolution (50-300, PNG only)
+
+    Raises:
+        HTTPException: 404 if business_id or the format is not found,
+            400 for out-of-range size or dpi
+    """
+    media_type = CHART_MEDIA_TYPES.get(image_format)
+    if media_type is None:
+        raise HTTPException(status_code=404, detail=f"Unsupported image format '{image_format}'")
+    for name, value, (low, high) in (
+        ("width", width, CHART_WIDTH_RANGE),
+        ("height", height, CHART_HEIGHT_RANGE),
+        ("dpi", dpi, CHART_DPI_RANGE),
+    ):
+        if not low <= value <= high:
+            raise HTTPException(status_code=400, detail=f"{name} must be between {low} and {high}")
+
+    trend_data = build_risk_score_data(business_id, TREND_CHART_FIELDS)
+    if trend_data is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Business ID '{business_id}' not found"
+        )
+
+    trend = trend_data["trend_30d"]
+    options = {
+        "width": float(width),
+        "height": float(height),
+        # Vector output does not depend on dpi; pin it so SVGs share a key
+        "dpi": dpi if image_format == "png" else SVG_CHART_DPI,
+        "image_format": image_format,
+    }
+    etag = f'"{chart_cache_key(trend, options)}"'
+    # The trend moves on at midnight, so freshness never outlives the day
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control(min(CACHE_TTL_MINUTES * 60, (midnight - now).total_seconds())),
     }
 
-    # Generate PDF
-    pdf_buffer = generate_risk_report_pdf(complete_data)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, [etag]):
+        return Response(status_code=304, headers=headers)
 
-    # Return as streaming response
-    filename = f"OFFO_Risk_Report_{business_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    image = await chart_renderer.render(trend, options)
+    return Response(content=image, media_type=media_type, headers=headers)
+
+
+def render_report_pdf(business_id: str) -> bytes | None:
+    """
+    Render one business's PDF report (runs in report job worker processes).
+
+    Returns:
+        PDF bytes, or None if business_id is not found
+    """
+    complete_data = build_risk_score_data(business_id, PDF_REPORT_FIELDS)
+    if complete_data is None:
+        return None
+    with pdf_generator.generate_risk_report_pdf(complete_data) as pdf_file:
+        return pdf_file.read()
+
+
+report_jobs = ReportJobManager(render_report_pdf, directory=REPORT_DIR or None)
+
+
+@app.post("/reports/jobs", status_code=202)
+async def create_report_job(
+    job_request: ReportJobRequest,
+    token_data: TokenData = Depends(verify_token)
+):
+    """
+    Start a bulk PDF export for a list of businesses or all businesses
+    matching the given filters (industry, location or state, category).
+    Requires valid JWT Bearer token for authentication.
+
+    Args:
+        job_request: Business IDs, or filters when no IDs are given
+        token_data: Validated token data from authorization header
+
+    Returns:
+        Job status, including the URL to poll
+
+    Raises:
+        HTTPException: 400 for an empty or oversized selection, 429 when too
+            many jobs are running
+    """
+    await run_blocking(report_jobs.purge_expired)
+    if report_jobs.active_jobs() >= MAX_ACTIVE_JOBS:
+        raise HTTPException(status_code=429, detail="Too many export jobs running; try again later")
+
+    if job_request.business_ids is not None:
+        business_ids = list(dict.fromkeys(job_request.business_ids))
+    else:
+        business_ids = await run_blocking(
+            select_businesses,
+            job_request.industry,
+            job_request.location,
+            job_request.category
+        )
+
+    if not business_ids:
+        raise HTTPException(status_code=400, detail="No businesses selected")
+    if len(business_ids) > MAX_JOB_BUSINESSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A job can export at most {MAX_JOB_BUSINESSES} businesses"
+        )
+
+    job = await run_blocking(report_jobs.create, business_ids, token_data.client_id)
+    return job.to_dict()
+
+
+@app.get("/reports/jobs/{job_id}")
+async def get_report_job(
+    job_id: str,
+    token_data: TokenData = Depends(verify_token)
+):
+    """
+    Progress of a bulk PDF export job. Only visible to the client that
+    created it.
+
+    Raises:
+        HTTPException: 404 if the job does not exist or has expired
+    """
+    await run_blocking(report_jobs.purge_expired)
+    job = await run_blocking(report_jobs.get, job_id, token_data.client_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report job '{job_id}' not found")
+    return job.to_dict()
+
+
+@app.get("/reports/jobs/{job_id}/download")
+async def download_report_job(
+    job_id: str,
+    token_data: TokenData = Depends(verify_token)
+):
+    """
+    Download the ZIP of a finished export job, streamed from disk.
+
+    Raises:
+        HTTPException: 404 if the job does not exist or has expired,
+            409 if it has not completed
+    """
+    await run_blocking(report_jobs.purge_expired)
+    job = await run_blocking(report_jobs.get, job_id, token_data.client_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Report job '{job_id}' not found")
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Report job is {job.status}")
+
+    return FileResponse(
+        job.path,
+        media_type="application/zip",
+        filename=f"OFFO_Risk_Reports_{job_id}.zip"
+    )
+
+
+@app.get("/reports/portfolio/pdf")
+async def export_portfolio_report_pdf(
+    industry: Optional[str] = None,
+    location: Optional[str] = None,
+    category: Optional[str] = None,
+    token_data: TokenData = Depends(verify_token)
+):
+    """
+    Export one PDF covering every business matching the filters: summary
+    page, per-category and per-industry breakdown, and a table of all
+    businesses with score and category.
+    Requires valid JWT Bearer token for authentication.
+
+    Args:
+        industry: Only businesses in this industry
+        location: Only businesses in this location, city or state
+        category: Only businesses in this risk category
+        token_data: Validated token data from authorization header
+
+    Returns:
+        PDF file streamed from a spooled temporary file
+
+    Raises:
+        HTTPException: 400 if more than MAX_PORTFOLIO_REPORT_BUSINESSES
+            match, 404 if none do
+    """
+    business_ids = await run_blocking(
+        select_businesses, industry, location, category, MAX_PORTFOLIO_REPORT_BUSINESSES
+    )
+    if not business_ids:
+        raise HTTPException(status_code=404, detail="No businesses match the given filters")
+    if len(business_ids) > MAX_PORTFOLIO_REPORT_BUSINESSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A portfolio report can cover at most {MAX_PORTFOLIO_REPORT_BUSINESSES} businesses; "
+                   "narrow the filters or use /reports/jobs"
+        )
+
+    filters = {"Industry": industry, "Location": location, "Category": category.upper() if category else None}
+    report = await load_lazy(portfolio_report)
+    pdf_file = await run_blocking(
+        report.generate_portfolio_report_pdf, lambda: report.portfolio_rows(business_ids), report.REPORT_TITLE, filters
+    )
+    size = pdf_file.seek(0, 2)
+    pdf_file.seek(0)
 
+    filename = f"OFFO_Portfolio_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     return StreamingResponse(
-        pdf_buffer,
+        pdf_generator.iter_file_chunks(pdf_file),
         media_type="application/pdf",
         headers={
-            "Content-Disposition": f"attachment; filename={filename}"
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(size)
         }
     )
 
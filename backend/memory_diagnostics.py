@@ -0,0 +1,169 @@
+"""
+memory_diagnostics.py
+
+Runtime memory diagnostics built on tracemalloc.
+
+Tracing is off by default and costs nothing until an admin switches it on.
+Once on, each report lists the top allocating source lines and the growth
+of each line since a baseline snapshot, which is taken when tracing starts
+and can be reset on demand. Independently of tracing, the approximate size
+of every registered in-memory structure (caches, change log, ...) is
+reported so growth can be attributed to a concrete structure.
+"""
+
+import sys
+import tracemalloc
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import _resident_memory_bytes
+
+
+DEFAULT_TOP = 20
+MAX_SIZEOF_OBJECTS = 500_000
+
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def approximate_size(obj: Any, limit: int = MAX_SIZEOF_OBJECTS) -> int:
+    """
+    Approximate deep size of a container in bytes.
+
+    Follows dicts, lists, tuples, sets and deques, counting each object
+    once; other objects are counted shallowly. Stops after `limit` objects
+    so huge structures stay cheap to measure (the result is then a lower
+    bound).
+
+    Args:
+        obj: Root object
+        limit: Maximum number of objects to visit
+
+    Returns:
+        Sum of sys.getsizeof over reachable objects
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < limit:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+    return total
+
+
+def _format_stat(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    return {
+        "location": f"{frame.filename}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+
+
+def _format_diff(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    return {
+        "location": f"{frame.filename}:{frame.lineno}",
+        "size_bytes": stat.size,
+        "size_diff_bytes": stat.size_diff,
+        "count": stat.count,
+        "count_diff": stat.count_diff,
+    }
+
+
+class MemoryDiagnostics:
+    """Runtime-switchable tracemalloc reports plus registered structure sizes."""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._structures: Dict[str, Callable[[], Any]] = {}
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def register_structure(self, name: str, getter: Callable[[], Any]):
+        """
+        Register an in-memory structure to report on.
+
+        Args:
+            name: Display name
+            getter: Returns the structure (called at report time)
+        """
+        self._structures[name] = getter
+
+    def start(self, frames: int = 1):
+        """Start tracing allocations and take the baseline snapshot."""
+        if not self.tracing:
+            tracemalloc.start(frames)
+        self._baseline = self._take_snapshot()
+
+    def stop(self):
+        """Stop tracing and drop all snapshots."""
+        self._baseline = None
+        if self.tracing:
+            tracemalloc.stop()
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+    def structure_sizes(self) -> Dict[str, Dict[str, int]]:
+        """Entry count and approximate deep size of each registered structure."""
+        sizes = {}
+        for name, getter in self._structures.items():
+            structure = getter()
+            sizes[name] = {
+                "entries": len(structure) if hasattr(structure, "__len__") else 1,
+                "approx_bytes": approximate_size(structure),
+            }
+        return sizes
+
+    def report(self, top: int = DEFAULT_TOP, reset_baseline: bool = False) -> Dict[str, Any]:
+        """
+        Build a memory report.
+
+        Args:
+            top: Number of source lines in the allocation and diff lists
+            reset_baseline: Make this snapshot the new baseline for later diffs
+
+        Returns:
+            RSS, registered structure sizes and, while tracing, traced memory,
+            top allocating lines and the diff against the baseline
+        """
+        report: Dict[str, Any] = {
+            "tracing": self.tracing,
+            "rss_bytes": int(_resident_memory_bytes()),
+            "structures": self.structure_sizes(),
+        }
+        if not self.tracing:
+            return report
+
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self._take_snapshot()
+        report["traced_bytes"] = current
+        report["traced_peak_bytes"] = peak
+        report["top_allocations"] = [_format_stat(s) for s in snapshot.statistics("lineno")[:top]]
+
+        if self._baseline is not None:
+            diffs: List = snapshot.compare_to(self._baseline, "lineno")
+            report["growth_since_baseline"] = [_format_diff(s) for s in diffs[:top]]
+
+        if reset_baseline or self._baseline is None:
+            self._baseline = snapshot
+        return report
+
+
+memory_diagnostics = MemoryDiagnostics()
@@ -0,0 +1,313 @@
+"""
+metrics.py
+
+Minimal Prometheus-style metrics for the OFFO Risk Score API.
+
+Provides counters, gauges and histograms with label support, rendered in the
+Prometheus text exposition format (version 0.0.4), plus:
+    - time_stage(): a context manager timing internal pipeline stages (and
+      recording them as spans of the current trace, see tracing.py)
+    - MetricsMiddleware: ASGI middleware counting and timing requests per
+      route template, method and status
+
+Recording is lock-free and allocation-light (well under a microsecond per
+observation) so stage timers can stay on the hot path.
+"""
+
+import os
+import resource
+import sys
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from tracing import end_span, start_span
+
+
+# Default latency buckets in seconds (100µs .. 10s)
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing counter, optionally labelled."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labelvalues, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.callback())}",
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, optionally labelled."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+
+    def labels(self, *labelvalues: str) -> _HistogramChild:
+        child = self._children.get(labelvalues)
+        if child is None:
+            child = self._children[labelvalues] = _HistogramChild(self.bounds)
+        return child
+
+    def observe(self, value: float, *labelvalues: str):
+        self.labels(*labelvalues).observe(value)
+
+    def count(self, *labelvalues: str) -> int:
+        child = self._children.get(labelvalues)
+        return sum(child.counts) if child else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, child in sorted(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together by the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, documentation, callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "offo_http_requests_total",
+    "HTTP requests by method, route template and status code.",
+    ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "offo_http_request_duration_seconds",
+    "HTTP request latency by method, route template and status code.",
+    ("method", "route", "status")
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    "offo_stage_duration_seconds",
+    "Latency of internal pipeline stages.",
+    ("stage",)
+)
+CACHE_EVENTS = REGISTRY.counter(
+    "offo_score_cache_events_total",
+    "Score cache events (hit, miss, eviction, restored from snapshot, warmed at startup).",
+    ("event",)
+)
+SHARD_REQUESTS = REGISTRY.counter(
+    "offo_shard_requests_total",
+    "Requests in sharded mode (local, forwarded to the owning worker, fallback when it was unreachable, fanned_out to every worker).",
+    ("route",)
+)
+CHART_CACHE_EVENTS = REGISTRY.counter(
+    "offo_chart_cache_events_total",
+    "Trend chart cache events (hit, disk_hit, miss, eviction, spill, disk_eviction).",
+    ("event",)
+)
+
+
+def _resident_memory_bytes() -> float:
+    """Current resident set size, from /proc where available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return float(int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        return _max_resident_memory_bytes()
+
+
+def _max_resident_memory_bytes() -> float:
+    """Peak resident set size (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return float(peak if sys.platform == "darwin" else peak * 1024)
+
+
+REGISTRY.gauge(
+    "offo_process_resident_memory_bytes",
+    "Resident memory size of the process in bytes.",
+    _resident_memory_bytes
+)
+REGISTRY.gauge(
+    "offo_process_max_resident_memory_bytes",
+    "Peak resident memory size of the process in bytes.",
+    _max_resident_memory_bytes
+)
+
+
+class _StageTimer:
+    __slots__ = ("_child", "_stage", "_span", "_start")
+
+    def __init__(self, child: _HistogramChild, stage: str):
+        self._child = child
+        self._stage = stage
+
+    def __enter__(self):
+        self._span = start_span(self._stage)
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(perf_counter() - self._start)
+        if self._span is not None:
+            end_span(self._span)
+        return False
+
+
+def time_stage(stage: str) -> _StageTimer:
+    """
+    Time a block of code into offo_stage_duration_seconds.
+
+    Usage:
+        with time_stage("compute_score"):
+            risk_score = compute_offo_risk_score(metrics)
+
+    Args:
+        stage: Stage label
+
+    Returns:
+        Context manager recording the block's wall-clock duration (and a
+        span, when the block runs inside a traced request)
+    """
+    return _StageTimer(STAGE_LATENCY.labels(stage), stage)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts and latency.
+
+    Requests are labelled with the matched route template (e.g.
+    /risk-score/{business_id}) rather than the raw path, so label
+    cardinality stays bounded; unmatched paths use "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"), str(status[0]))
+            HTTP_REQUESTS.inc(*labels)
+            HTTP_LATENCY.observe(perf_counter() - start, *labels)
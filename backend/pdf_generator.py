@@ -17,19 +17,41 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.pdfbase import pdfmetrics
 from reportlab.graphics.shapes import Drawing
 from reportlab.graphics.charts.linecharts import HorizontalLineChart
 from reportlab.graphics.charts.legends import Legend
 from io import BytesIO
 from datetime import datetime
-from typing import Dict, Any, List
-import matplotlib.pyplot as plt
+import tempfile
+from functools import partial
+from typing import Dict, Any, List, BinaryIO, Iterator, Optional
 import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend
+from matplotlib.figure import Figure
+from PIL import Image as PILImage
 import os
 
+from metrics import time_stage
+from chart_cache import chart_cache, chart_cache_key
+
+# Generated PDFs are spooled in memory up to this size, then to a temp file
+SPOOL_MAX_BYTES = int(float(os.environ.get("OFFO_PDF_SPOOL_MAX_MB", "8")) * 1024 * 1024)
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Trend chart rendering used by PDF reports and the trend image endpoint
+TREND_CHART_OPTIONS = {'width': 8.0, 'height': 3.0, 'dpi': 300, 'image_format': 'png'}
+
 # Path to OFFO logo
 LOGO_PATH = os.path.join(os.path.dirname(__file__), '..', 'Logo', 'OFFO_logo.png')
+LOGO_WIDTH = 2.5 * inch
+LOGO_HEIGHT = 0.8 * inch
+LOGO_DPI = 300
+
+# Logo PNG resampled to its printed size, built on first use
+_logo_png: Optional[bytes] = None
+
+REPORT_FONTS = ('Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique')
 
 # Business name mapping for professional display
 BUSINESS_NAMES = {
@@ -41,6 +63,68 @@ BUSINESS_NAMES = {
 }
 
 
+def iter_file_chunks(file: BinaryIO, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Read a file in chunks for a StreamingResponse, closing it at the end.
+
+    Args:
+        file: Open binary file positioned where streaming should start
+        chunk_size: Bytes per chunk
+
+    Yields:
+        Successive chunks of the file
+    """
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+
+def get_logo_png() -> Optional[bytes]:
+    """
+    Logo resampled to LOGO_DPI at its printed size, as PNG bytes.
+
+    The source logo is 1024x1024 RGBA. Embedding it directly made ReportLab
+    decode and recompress it on every report (most of the render's memory
+    and about 1.6 MB of each PDF). The resampled copy is built once per
+    process and prints identically.
+
+    Returns:
+        PNG bytes, or None if the logo file is missing
+    """
+    global _logo_png
+    if _logo_png is None and os.path.exists(LOGO_PATH):
+        size = (round(LOGO_WIDTH / inch * LOGO_DPI), round(LOGO_HEIGHT / inch * LOGO_DPI))
+        with PILImage.open(LOGO_PATH) as source:
+            resized = source.resize(size, PILImage.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, format='PNG', optimize=True)
+        _logo_png = buffer.getvalue()
+    return _logo_png
+
+
+def preload_static_data():
+    """
+    Build the static data reports use: the resampled logo, ReportLab font
+    metrics and matplotlib's font and text caches.
+
+    Each process otherwise builds these on its first report. The preforking
+    launcher (server.py) calls this before forking so workers share one copy.
+    """
+    get_logo_png()
+    for font_name in REPORT_FONTS:
+        pdfmetrics.getFont(font_name)
+    create_trend_chart(
+        [{'date': '2000-01-01', 'score': 50.0}, {'date': '2000-01-02', 'score': 50.0}],
+        BytesIO(),
+        dpi=72
+    )
+
+
 def get_category_color(category: str) -> tuple:
     """Get RGB color for risk category."""
     colors_map = {
@@ -63,23 +147,36 @@ def create_section_divider() -> Table:
     return divider_table
 
 
-def create_trend_chart(trend_data: List[Dict[str, Any]], buffer: BytesIO) -> str:
+def create_trend_chart(
+    trend_data: List[Dict[str, Any]],
+    buffer: BytesIO,
+    width: float = 8.0,
+    height: float = 3.0,
+    dpi: int = 300,
+    image_format: str = 'png'
+) -> str:
     """
     Create matplotlib trend chart and return as bytes.
 
     Args:
         trend_data: List of {date, score} dicts
         buffer: BytesIO buffer to write image
+        width: Figure width in inches
+        height: Figure height in inches
+        dpi: Raster resolution
+        image_format: Any format matplotlib can save ('png', 'svg', ...)
 
     Returns:
-        BytesIO buffer with PNG image
+        BytesIO buffer with the image
     """
     # Extract data
     dates = [item['date'] for item in trend_data]
     scores = [item['score'] for item in trend_data]
 
-    # Create figure
-    fig, ax = plt.subplots(figsize=(8, 3))
+    # Create figure (object API, no pyplot global state, so charts can be
+    # rendered from worker threads and are freed with the Figure)
+    fig = Figure(figsize=(width, height))
+    ax = fig.subplots()
 
     # Plot line
     ax.plot(dates, scores, marker='o', linewidth=2, markersize=4, color='#3b82f6')
@@ -102,37 +199,94 @@ def create_trend_chart(trend_data: List[Dict[str, Any]], buffer: BytesIO) -> str
     ax.axhspan(50, 80, alpha=0.08, color='#F0B429', label='Moderate Risk Zone')
     ax.axhspan(0, 50, alpha=0.08, color='#E63946', label='High Risk Zone')
 
-    # Rotate x-axis labels for readability
-    plt.xticks(rotation=45, ha='right', fontsize=8)
-    plt.yticks(fontsize=9)
-
     # Show only every 5th date label
     ax.set_xticks(ax.get_xticks()[::5])
 
+    # Rotate x-axis labels for readability
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment('right')
+        label.set_fontsize(8)
+    ax.tick_params(axis='y', labelsize=9)
+
     # Legend with frame and shadow
     ax.legend(fontsize=8, loc='upper left', frameon=True, shadow=True, ncol=2)
 
     # Tight layout
-    plt.tight_layout()
+    fig.tight_layout()
 
     # Save to buffer at higher DPI for better quality
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    plt.close()
+    if image_format == 'svg':
+        # Fixed element ids and no creation date, so identical charts are
+        # identical bytes (the trend endpoint's ETag promises that)
+        with matplotlib.rc_context({'svg.hashsalt': 'offo-trend'}):
+            fig.savefig(buffer, format=image_format, dpi=dpi, bbox_inches='tight', metadata={'Date': None})
+    else:
+        fig.savefig(buffer, format=image_format, dpi=dpi, bbox_inches='tight')
 
     return buffer
 
 
-def generate_risk_report_pdf(data: Dict[str, Any]) -> BytesIO:
+def render_trend_chart_image(trend_data: List[Dict[str, Any]], options: Dict[str, Any]) -> bytes:
+    """
+    Render a trend chart to bytes, bypassing the cache (picklable, so it can
+    run in chart worker processes).
+
+    Not timed here: in a worker process the observation would land in that
+    process's registry. Callers time the render where they wait for it.
+
+    Args:
+        trend_data: List of {date, score} dicts
+        options: create_trend_chart keyword arguments
+
+    Returns:
+        Encoded image
+    """
+    buffer = BytesIO()
+    create_trend_chart(trend_data, buffer, **options)
+    return buffer.getvalue()
+
+
+def _timed_render(trend_data: List[Dict[str, Any]], options: Dict[str, Any]) -> bytes:
+    with time_stage("chart_render"):
+        return render_trend_chart_image(trend_data, options)
+
+
+def render_trend_chart(trend_data: List[Dict[str, Any]], **options: Any) -> bytes:
+    """
+    Trend chart image bytes, from the chart cache when possible.
+
+    Args:
+        trend_data: List of {date, score} dicts
+        **options: Overrides of TREND_CHART_OPTIONS (create_trend_chart
+            keyword arguments); part of the cache key
+
+    Returns:
+        Encoded image
+    """
+    options = {**TREND_CHART_OPTIONS, **options}
+    return chart_cache.get_or_render(
+        chart_cache_key(trend_data, options),
+        partial(_timed_render, trend_data, options)
+    )
+
+
+def generate_risk_report_pdf(data: Dict[str, Any]) -> tempfile.SpooledTemporaryFile:
     """
     Generate a comprehensive PDF risk report.
 
+    The PDF is written to a SpooledTemporaryFile that stays in memory up to
+    SPOOL_MAX_BYTES and moves to disk beyond that. The trend chart comes
+    from the chart cache, so the render holds no chart buffer of its own.
+
     Args:
         data: Complete risk score data from API
 
     Returns:
-        BytesIO buffer containing PDF
+        SpooledTemporaryFile containing the PDF, positioned at the start;
+        the caller closes it (iter_file_chunks does)
     """
-    buffer = BytesIO()
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
     doc = SimpleDocTemplate(buffer, pagesize=letter,
                            rightMargin=72, leftMargin=72,
                            topMargin=72, bottomMargin=18)
@@ -186,8 +340,9 @@ def generate_risk_report_pdf(data: Dict[str, Any]) -> BytesIO:
     # --- PROFESSIONAL COVER PAGE ---
 
     # OFFO Logo (top-left)
-    if os.path.exists(LOGO_PATH):
-        logo = Image(LOGO_PATH, width=2.5*inch, height=0.8*inch)
+    logo_png = get_logo_png()
+    if logo_png is not None:
+        logo = Image(BytesIO(logo_png), width=LOGO_WIDTH, height=LOGO_HEIGHT)
         story.append(logo)
         story.append(Spacer(1, 0.4 * inch))
 
@@ -375,13 +530,9 @@ def generate_risk_report_pdf(data: Dict[str, Any]) -> BytesIO:
     if trend_data:
         story.append(Paragraph("30-Day Risk Trend", heading_style))
 
-        # Create chart
-        chart_buffer = BytesIO()
-        create_trend_chart(trend_data, chart_buffer)
-        chart_buffer.seek(0)
-
-        # Add to PDF
-        img = Image(chart_buffer, width=6.5*inch, height=2.5*inch)
+        # Chart PNG from the chart cache; the BytesIO shares the cached
+        # bytes instead of copying them
+        img = Image(BytesIO(render_trend_chart(trend_data)), width=6.5*inch, height=2.5*inch)
         story.append(img)
 
         # Add figure caption
@@ -458,7 +609,12 @@ def generate_risk_report_pdf(data: Dict[str, Any]) -> BytesIO:
         canvas_obj.restoreState()
 
     # Build PDF with page decorations
-    doc.build(story, onFirstPage=add_page_decorations, onLaterPages=add_page_decorations)
+    try:
+        with time_stage("pdf_build"):
+            doc.build(story, onFirstPage=add_page_decorations, onLaterPages=add_page_decorations)
+    except BaseException:
+        buffer.close()
+        raise
 
     # Return buffer
     buffer.seek(0)
@@ -0,0 +1,308 @@
+"""
+portfolio_report.py
+
+Consolidated PDF report covering a whole portfolio of businesses:
+- Summary page: totals, per-category breakdown, industries by category
+- Table of every business with its score and category
+
+Portfolios can hold tens of thousands of businesses, so the document is
+never assembled as one story list. Rows are produced twice from a factory
+(once to aggregate the summary, once for the table) and the table is fed
+to ReportLab one page-sized LongTable at a time through _FlowableStream, so
+only the current page's flowables are alive. Each chunk fits a page
+exactly, so tables are never split and every page gets the column header.
+The PDF is written to a SpooledTemporaryFile that moves to disk once it
+exceeds SPOOL_MAX_BYTES.
+"""
+
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import LongTable, PageBreak, Paragraph, SimpleDocTemplate, Table, TableStyle
+
+from data_layer import get_business_details, get_business_metrics
+from metrics import time_stage
+from pdf_generator import SPOOL_MAX_BYTES, get_category_color
+from scoring_algorithm import compute_offo_risk_score
+
+
+REPORT_TITLE = "OFFO Portfolio Risk Report"
+CATEGORIES = ("LOW", "MODERATE", "HIGH")
+TABLE_COLUMNS = ("Business ID", "Industry", "Location", "Score", "Category")
+TABLE_COLUMN_WIDTHS = (1.3 * inch, 2.1 * inch, 1.5 * inch, 0.7 * inch, 0.9 * inch)
+TABLE_ROW_HEIGHT = 14
+FRAME_PADDING = 12  # SimpleDocTemplate frames pad 6pt on each side
+
+# (business_id, industry, location, overall_score, category)
+PortfolioRow = Tuple[str, str, str, float, str]
+
+
+def portfolio_rows(business_ids: Iterable[str]) -> Iterator[PortfolioRow]:
+    """Score businesses one at a time, skipping IDs without metrics."""
+    for business_id in business_ids:
+        metrics = get_business_metrics(business_id)
+        if metrics is None:
+            continue
+        details = get_business_details(business_id) or {}
+        result = compute_offo_risk_score(metrics)
+        yield (
+            business_id,
+            details.get("industry", ""),
+            details.get("location", ""),
+            result["overall_score"],
+            result["category"],
+        )
+
+
+def summarize_portfolio(rows: Iterable[PortfolioRow]) -> Dict[str, Any]:
+    """
+    Aggregate rows in one pass without keeping them.
+
+    Returns:
+        Dict with total, average score, per-category count/average/min/max
+        and per-industry category counts
+    """
+    total = 0
+    score_sum = 0.0
+    by_category = {category: {"count": 0, "sum": 0.0, "min": None, "max": None} for category in CATEGORIES}
+    by_industry: Dict[str, Dict[str, int]] = {}
+
+    for _, industry, _, score, category in rows:
+        total += 1
+        score_sum += score
+        stats = by_category.setdefault(category, {"count": 0, "sum": 0.0, "min": None, "max": None})
+        stats["count"] += 1
+        stats["sum"] += score
+        stats["min"] = score if stats["min"] is None else min(stats["min"], score)
+        stats["max"] = score if stats["max"] is None else max(stats["max"], score)
+        counts = by_industry.setdefault(industry or "Unknown", dict.fromkeys(CATEGORIES, 0))
+        counts[category] = counts.get(category, 0) + 1
+
+    return {
+        "total": total,
+        "average_score": score_sum / total if total else 0.0,
+        "categories": {
+            category: {
+                "count": stats["count"],
+                "share": stats["count"] / total if total else 0.0,
+                "average_score": stats["sum"] / stats["count"] if stats["count"] else None,
+                "min_score": stats["min"],
+                "max_score": stats["max"],
+            }
+            for category, stats in by_category.items()
+        },
+        "industries": dict(sorted(by_industry.items())),
+    }
+
+
+class _FlowableStream(list):
+    """
+    Story list that SimpleDocTemplate.build() drains from the front and that
+    refills itself from an iterator whenever it runs empty.
+
+    build() checks len() before handling each flowable, so at most the
+    current flowable (plus any pieces ReportLab split off it) is held.
+    """
+
+    def __init__(self, flowables: Iterable[Any]):
+        super().__init__()
+        self._source = iter(flowables)
+
+    def __len__(self) -> int:
+        if not super().__len__():
+            flowable = next(self._source, None)
+            if flowable is not None:
+                self.append(flowable)
+        return super().__len__()
+
+
+def _table_rows_per_page(doc: SimpleDocTemplate) -> int:
+    """Data rows that fit one page below the repeated header row."""
+    return max(1, int((doc.height - FRAME_PADDING) // TABLE_ROW_HEIGHT) - 2)
+
+
+def _business_table(rows: List[PortfolioRow]) -> LongTable:
+    data = [list(TABLE_COLUMNS)]
+    style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 8),
+        ('FONT', (0, 1), (-1, -1), 'Helvetica', 8),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f4f6')]),
+        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 1),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+        ('LINEBELOW', (0, 0), (-1, 0), 1, colors.HexColor('#93c5fd')),
+    ]
+    for index, (business_id, industry, location, score, category) in enumerate(rows, 1):
+        data.append([business_id, industry, location, f"{score:.1f}", category])
+        style.append(('TEXTCOLOR', (4, index), (4, index), colors.Color(*get_category_color(category))))
+
+    table = LongTable(data, colWidths=TABLE_COLUMN_WIDTHS, rowHeights=TABLE_ROW_HEIGHT, repeatRows=1)
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def _summary_flowables(summary: Dict[str, Any], title: str, filters: Dict[str, Optional[str]]) -> List[Any]:
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'PortfolioTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1f2937'),
+        spaceAfter=8,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    subtitle_style = ParagraphStyle(
+        'PortfolioSubtitle',
+        parent=styles['Normal'],
+        fontSize=11,
+        textColor=colors.HexColor('#6b7280'),
+        spaceAfter=16,
+        alignment=TA_CENTER
+    )
+    heading_style = ParagraphStyle(
+        'PortfolioHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#1f2937'),
+        spaceBefore=14,
+        spaceAfter=8,
+        fontName='Helvetica-Bold'
+    )
+    grid_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 9),
+        ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#93c5fd')),
+        ('INNERGRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#bfdbfe')),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]
+
+    filter_text = ", ".join(f"{name}: {value}" for name, value in filters.items() if value) or "All businesses"
+    story: List[Any] = [
+        Paragraph(title, title_style),
+        Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y')} &mdash; {filter_text}", subtitle_style),
+    ]
+
+    totals = Table(
+        [["Businesses", f"{summary['total']:,}"], ["Average Risk Score", f"{summary['average_score']:.1f}"]],
+        colWidths=[3 * inch, 3 * inch]
+    )
+    totals.setStyle(TableStyle([
+        ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 11),
+        ('FONT', (1, 0), (1, -1), 'Helvetica-Bold', 14),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f3f4f6')),
+        ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#d1d5db')),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    story.append(totals)
+
+    story.append(Paragraph("Breakdown by Risk Category", heading_style))
+    category_data = [["Category", "Businesses", "Share", "Avg Score", "Min", "Max"]]
+    for category, stats in summary["categories"].items():
+        def fmt(value):
+            return "-" if value is None else f"{value:.1f}"
+        category_data.append([
+            category, f"{stats['count']:,}", f"{stats['share']:.1%}",
+            fmt(stats["average_score"]), fmt(stats["min_score"]), fmt(stats["max_score"]),
+        ])
+    category_table = Table(category_data, colWidths=[1.4 * inch, 1.1 * inch, 0.9 * inch, 1.0 * inch, 0.8 * inch, 0.8 * inch])
+    category_style = list(grid_style)
+    for index, category in enumerate(summary["categories"], 1):
+        category_style.append(('TEXTCOLOR', (0, index), (0, index), colors.Color(*get_category_color(category))))
+    category_table.setStyle(TableStyle(category_style))
+    story.append(category_table)
+
+    story.append(Paragraph("Industries by Risk Category", heading_style))
+    industry_data = [["Industry", *CATEGORIES, "Total"]]
+    for industry, counts in summary["industries"].items():
+        industry_data.append([industry, *(f"{counts.get(category, 0):,}" for category in CATEGORIES),
+                              f"{sum(counts.values()):,}"])
+    industry_table = LongTable(industry_data, colWidths=[2.6 * inch, 0.9 * inch, 1.0 * inch, 0.9 * inch, 0.9 * inch],
+                               repeatRows=1)
+    industry_table.setStyle(TableStyle(grid_style))
+    story.append(industry_table)
+    return story
+
+
+def _portfolio_story(
+    rows: Callable[[], Iterable[PortfolioRow]],
+    summary: Dict[str, Any],
+    title: str,
+    filters: Dict[str, Optional[str]],
+    rows_per_page: int
+) -> Iterator[Any]:
+    yield from _summary_flowables(summary, title, filters)
+    if not summary["total"]:
+        return
+    yield PageBreak()
+
+    chunk: List[PortfolioRow] = []
+    for row in rows():
+        chunk.append(row)
+        if len(chunk) == rows_per_page:
+            yield _business_table(chunk)
+            chunk = []
+    if chunk:
+        yield _business_table(chunk)
+
+
+def generate_portfolio_report_pdf(
+    rows: Callable[[], Iterable[PortfolioRow]],
+    title: str = REPORT_TITLE,
+    filters: Optional[Dict[str, Optional[str]]] = None
+) -> tempfile.SpooledTemporaryFile:
+    """
+    Generate a portfolio PDF with bounded memory.
+
+    Args:
+        rows: Factory returning a fresh iterator of rows; called twice
+            (summary pass, then table pass)
+        title: Report title
+        filters: Filters the portfolio was selected with, shown on the summary page
+
+    Returns:
+        SpooledTemporaryFile containing the PDF, positioned at the start;
+        the caller closes it
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    doc = SimpleDocTemplate(output, pagesize=letter,
+                            rightMargin=54, leftMargin=54,
+                            topMargin=54, bottomMargin=54,
+                            title=title)
+
+    def add_page_decorations(canvas_obj, doc_obj):
+        canvas_obj.saveState()
+        canvas_obj.setFont('Helvetica-Oblique', 8)
+        canvas_obj.setFillColor(colors.HexColor('#6b7280'))
+        canvas_obj.drawString(54, 30, "OFFO Portfolio Risk Report — For internal use only — Confidential")
+        canvas_obj.setFont('Helvetica', 8)
+        canvas_obj.drawRightString(doc_obj.pagesize[0] - 54, 30, f"Page {canvas_obj.getPageNumber()}")
+        canvas_obj.restoreState()
+
+    try:
+        with time_stage("portfolio_summary"):
+            summary = summarize_portfolio(rows())
+        story = _portfolio_story(rows, summary, title, filters or {}, _table_rows_per_page(doc))
+        with time_stage("pdf_build"):
+            doc.build(_FlowableStream(story), onFirstPage=add_page_decorations, onLaterPages=add_page_decorations)
+    except BaseException:
+        output.close()
+        raise
+
+    output.seek(0)
+    return output
@@ -0,0 +1,237 @@
+"""
+profiling.py
+
+Opt-in per-request profiling for admin tokens.
+
+Adding ``profile=1`` to any request made with a token carrying the admin
+scope runs that request under cProfile and replaces the response with the
+profile:
+    - profile_format=text (default): top-N pstats summary
+    - profile_format=pstats: binary pstats file (load with pstats.Stats)
+    - profile_format=collapsed: collapsed stacks for flamegraph tools
+
+Other options: profile_top (default 40), profile_sort (default cumulative).
+One request is profiled at a time per process; a second ``profile=1``
+request while one is running gets 409.
+
+Requests without ``profile=`` in the query string only pay a single bytes
+search in ProfilingMiddleware.
+"""
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+from contextvars import ContextVar
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+
+from security import ADMIN_SCOPE, decode_access_token, has_scope
+from serialization import dumps
+
+
+DEFAULT_TOP = 40
+MAX_COLLAPSED_DEPTH = 64
+SORT_KEYS = ("cumulative", "tottime", "calls", "ncalls")
+
+# True while the current request runs under cProfile; code that would move
+# work to another thread runs it inline instead so it shows in the profile.
+profiling_active: ContextVar[bool] = ContextVar("profiling_active", default=False)
+
+
+def function_label(func: Tuple[str, int, str]) -> str:
+    """Short label for a pstats function key (filename, lineno, name)."""
+    filename, lineno, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def collapsed_stacks(stats: Dict) -> str:
+    """
+    Approximate collapsed stacks from cProfile's caller graph.
+
+    cProfile only records caller/callee pairs, so time is distributed down
+    each call path in proportion to the cumulative time of each edge.
+
+    Args:
+        stats: Profile.stats mapping (as produced by create_stats())
+
+    Returns:
+        One "frame;frame;frame microseconds" line per path
+    """
+    children: Dict[Tuple, List[Tuple[Tuple, float]]] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, entry in stats.items() if not entry[4]]
+    totals: Dict[str, float] = {}
+
+    def walk(func, path, fraction):
+        tottime, cumtime = stats[func][2], stats[func][3]
+        path = path + [function_label(func)]
+        stack = ";".join(path)
+        totals[stack] = totals.get(stack, 0.0) + tottime * fraction
+
+        if len(path) >= MAX_COLLAPSED_DEPTH or cumtime <= 0:
+            return
+        for child, edge_cumtime in children.get(func, ()):
+            if function_label(child) in path or stats[child][3] <= 0:
+                continue
+            walk(child, path, fraction * edge_cumtime / stats[child][3])
+
+    for root in roots:
+        walk(root, [], 1.0)
+
+    lines = [
+        f"{stack} {int(seconds * 1_000_000)}"
+        for stack, seconds in totals.items()
+        if seconds * 1_000_000 >= 1
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def render_profile(profiler: cProfile.Profile, fmt: str, top: int, sort: str) -> Tuple[bytes, str, Dict[str, str]]:
+    """
+    Render a finished profile.
+
+    Args:
+        profiler: Disabled profiler
+        fmt: "text", "pstats" or "collapsed"
+        top: Number of functions in the text summary
+        sort: pstats sort key for the text summary
+
+    Returns:
+        Tuple of (body, media type, extra headers)
+    """
+    profiler.create_stats()
+
+    if fmt == "pstats":
+        return (
+            marshal.dumps(profiler.stats),
+            "application/octet-stream",
+            {"Content-Disposition": "attachment; filename=request.pstats"},
+        )
+
+    if fmt == "collapsed":
+        return (
+            collapsed_stacks(profiler.stats).encode(),
+            "text/plain; charset=utf-8",
+            {"Content-Disposition": "attachment; filename=request.collapsed"},
+        )
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(top)
+    return stream.getvalue().encode(), "text/plain; charset=utf-8", {}
+
+
+def _parse_options(query_string: bytes) -> Tuple[bool, str, int, str]:
+    params = parse_qs(query_string.decode("latin-1"))
+    enabled = params.get("profile", ["0"])[-1].lower() in ("1", "true", "yes")
+    fmt = params.get("profile_format", ["text"])[-1]
+    sort = params.get("profile_sort", ["cumulative"])[-1]
+    try:
+        top = max(1, int(params.get("profile_top", [DEFAULT_TOP])[-1]))
+    except ValueError:
+        top = DEFAULT_TOP
+
+    if not enabled:
+        return enabled, fmt, top, sort
+    if fmt not in ("text", "pstats", "collapsed"):
+        raise HTTPException(status_code=400, detail="profile_format must be text, pstats or collapsed")
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"profile_sort must be one of {', '.join(SORT_KEYS)}")
+    return enabled, fmt, top, sort
+
+
+def _authorize(scope) -> None:
+    """Require a Bearer token with the admin scope on the raw ASGI request."""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                if has_scope(decode_access_token(token), ADMIN_SCOPE):
+                    return
+                raise HTTPException(status_code=403, detail="Profiling requires the admin scope")
+    raise HTTPException(
+        status_code=401,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def _send_response(send, status: int, body: bytes, media_type: str, headers: Dict[str, str]):
+    raw_headers = [
+        (b"content-type", media_type.encode()),
+        (b"content-length", str(len(body)).encode()),
+    ] + [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware running ``?profile=1`` requests under cProfile.
+
+    cProfile follows the event loop thread only: other coroutines that run
+    while the profiled request is suspended are included, and work handed to
+    other threads is not (see profiling_active).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # cProfile hooks are per interpreter on Python 3.12+, so one profile at a time
+        self._profiling = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or b"profile=" not in scope.get("query_string", b""):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            enabled, fmt, top, sort = _parse_options(scope["query_string"])
+            if enabled:
+                _authorize(scope)
+        except HTTPException as exc:
+            body = dumps({"detail": exc.detail})
+            await _send_response(send, exc.status_code, body, "application/json", exc.headers or {})
+            return
+
+        if not enabled:
+            await self.app(scope, receive, send)
+            return
+
+        if not self._profiling.acquire(blocking=False):
+            body = dumps({"detail": "Another request is being profiled; retry when it finishes"})
+            await _send_response(send, 409, body, "application/json", {})
+            return
+        try:
+            await self._profile(scope, receive, send, fmt, top, sort)
+        finally:
+            self._profiling.release()
+
+    async def _profile(self, scope, receive, send, fmt: str, top: int, sort: str):
+
+        status = [500]
+
+        async def discard_send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+
+        profiler = cProfile.Profile()
+        token = profiling_active.set(True)
+        profiler.enable()
+        try:
+            await self.app(scope, receive, discard_send)
+        finally:
+            profiler.disable()
+            profiling_active.reset(token)
+
+        body, media_type, headers = render_profile(profiler, fmt, top, sort)
+        headers["X-Profiled-Status"] = str(status[0])
+        await _send_response(send, 200, body, media_type, headers)
@@ -0,0 +1,364 @@
+"""
+report_jobs.py
+
+Bulk PDF report export as background jobs.
+
+A job renders one PDF per business across a process pool and writes them
+into a ZIP archive on disk as they finish. At most 2 x workers renders are
+in flight, so memory stays bounded however many businesses a job covers.
+Each job runs in its own thread, which only submits work and writes the
+archive, so the event loop is never blocked.
+
+Next to its archive each job keeps its state in <job_id>.json, rewritten at
+most every STATE_SAVE_SECONDS while it runs. Workers sharing the directory
+(OFFO_REPORT_DIR; server.py gives its workers one) answer status and
+download requests for each other's jobs from that file. A job whose worker
+died before finishing is reported as failed. In sharded mode job IDs start
+with the worker's name ("worker-1.<hex>"), and requests for a job are
+forwarded to the worker running it (see sharding.py).
+
+Finished archives are kept for REPORT_TTL_MINUTES and then deleted, along
+with the job record. Expired jobs are purged lazily on every job API call.
+
+The pool uses the "spawn" start method: workers import the render function
+fresh instead of forking a process that is running the event loop and
+monitoring threads.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from data_layer import get_all_business_ids, get_business_details, get_business_metrics
+from scoring_algorithm import compute_offo_risk_score
+from serialization import dumps
+
+
+REPORT_WORKERS = int(os.environ.get("OFFO_REPORT_WORKERS", str(os.cpu_count() or 1)))
+REPORT_TTL_MINUTES = int(os.environ.get("OFFO_REPORT_TTL_MINUTES", "60"))
+# Archives and job state shared by all workers (a private temporary directory when empty)
+REPORT_DIR = os.environ.get("OFFO_REPORT_DIR", "")
+MAX_JOB_BUSINESSES = int(os.environ.get("OFFO_REPORT_JOB_MAX_BUSINESSES", "10000"))
+# Cap for the single-document portfolio report (GET /reports/portfolio/pdf)
+MAX_PORTFOLIO_REPORT_BUSINESSES = int(os.environ.get("OFFO_PORTFOLIO_REPORT_MAX_BUSINESSES", "50000"))
+MAX_ACTIVE_JOBS = 4
+STATE_SAVE_SECONDS = 0.5
+
+# "<hex>", or "<worker name>.<hex>" for jobs of a sharded worker
+JOB_ID_PATTERN = re.compile(r"(?:[A-Za-z0-9_-]+\.)?[0-9a-f]{32}")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+def _location_matches(location: str, wanted: str) -> bool:
+    """Match a "City, ST" location by full name, city or state code."""
+    wanted = wanted.strip().lower()
+    city, _, state = location.lower().rpartition(", ")
+    return wanted in (location.lower(), city, state)
+
+
+def select_businesses(
+    industry: Optional[str] = None,
+    location: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = MAX_JOB_BUSINESSES
+) -> List[str]:
+    """
+    Business IDs matching every given filter.
+
+    Args:
+        industry: Exact industry name (case-insensitive)
+        location: Location, city or state code (e.g. "Seattle, WA", "Seattle", "WA")
+        category: Current risk category (LOW, MODERATE, HIGH)
+        limit: Stop after this many matches plus one (so callers can detect overflow)
+
+    Returns:
+        Matching business IDs in data layer order
+    """
+    matches = []
+    for business_id in get_all_business_ids():
+        if industry or location:
+            details = get_business_details(business_id)
+            if details is None:
+                continue
+            if industry and details["industry"].lower() != industry.strip().lower():
+                continue
+            if location and not _location_matches(details["location"], location):
+                continue
+        if category:
+            metrics = get_business_metrics(business_id)
+            if metrics is None or compute_offo_risk_score(metrics)["category"] != category.upper():
+                continue
+        matches.append(business_id)
+        if len(matches) > limit:
+            break
+    return matches
+
+
+class ReportJob:
+    """State of one bulk export job."""
+
+    def __init__(self, business_ids: List[str], owner: str, directory: str, node: Optional[str] = None):
+        self.job_id = f"{node}.{uuid.uuid4().hex}" if node else uuid.uuid4().hex
+        self.business_ids = business_ids
+        self.total = len(business_ids)
+        self.owner = owner
+        self.pid = os.getpid()
+        self.status = JOB_QUEUED
+        self.completed = 0
+        self.failures: List[Dict[str, str]] = []
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.path = os.path.join(directory, f"{self.job_id}.zip")
+        self.cancelled = False
+        self.saved_at = 0.0
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], directory: str) -> "ReportJob":
+        """A read-only view of a job saved by to_state(), possibly in another worker."""
+        job = cls.__new__(cls)
+        job.job_id = state["job_id"]
+        job.business_ids = []
+        job.total = state["total"]
+        job.owner = state["owner"]
+        job.pid = state["pid"]
+        job.status = state["status"]
+        job.completed = state["completed"]
+        job.failures = state["failures"]
+        job.error = state["error"]
+        job.created_at = datetime.fromisoformat(state["created_at"])
+        job.finished_at = datetime.fromisoformat(state["finished_at"]) if state["finished_at"] else None
+        job.path = os.path.join(directory, f"{job.job_id}.zip")
+        job.cancelled = False
+        job.saved_at = 0.0
+        return job
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "total": self.total,
+            "owner": self.owner,
+            "pid": self.pid,
+            "status": self.status,
+            "completed": self.completed,
+            "failures": self.failures,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    @property
+    def done(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    @property
+    def expires_at(self) -> Optional[datetime]:
+        if self.finished_at is None:
+            return None
+        return self.finished_at + timedelta(minutes=REPORT_TTL_MINUTES)
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.total
+        processed = self.completed + len(self.failures)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": total,
+            "completed": self.completed,
+            "failed": len(self.failures),
+            "progress": round(processed / total, 4) if total else 1.0,
+            "failures": self.failures[:100],
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "download_url": f"/reports/jobs/{self.job_id}/download" if self.status == JOB_COMPLETED else None,
+        }
+
+
+class ReportJobManager:
+    """Creates, runs, tracks and expires bulk export jobs."""
+
+    def __init__(
+        self,
+        render: Callable[[str], Optional[bytes]],
+        workers: int = REPORT_WORKERS,
+        directory: Optional[str] = None
+    ):
+        self.render = render
+        self.workers = max(1, workers)
+        self._owns_directory = directory is None
+        self.directory = directory
+        self.jobs: Dict[str, ReportJob] = {}
+        # Set by sharded workers: job IDs name the worker running the job
+        self.node: Optional[str] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job: ReportJob):
+        """Publish the job's state to the other workers."""
+        path = self._state_path(job.job_id)
+        partial_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(partial_path, "wb") as f:
+                f.write(dumps(job.to_state()))
+            os.replace(partial_path, path)
+        except OSError:
+            # The directory is gone (shutdown); the job cannot be polled anyway
+            return
+        job.saved_at = time.monotonic()
+
+    def _load(self, job_id: str) -> Optional[ReportJob]:
+        """A job from its state file, e.g. one created by another worker."""
+        if self.directory is None or not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        path = self._state_path(job_id)
+        try:
+            with open(path, "rb") as f:
+                state = json.loads(f.read())
+            saved = os.stat(path).st_mtime
+        except (OSError, ValueError):
+            return None
+        job = ReportJob.from_state(state, self.directory)
+        if not job.done and not _process_alive(job.pid):
+            job.status = JOB_FAILED
+            job.error = "The worker running the job exited before it finished"
+            job.finished_at = datetime.fromtimestamp(saved)
+        return job
+
+    def active_jobs(self) -> int:
+        return sum(1 for job in self.jobs.values() if not job.done)
+
+    def create(self, business_ids: List[str], owner: str) -> ReportJob:
+        """Register a job and start rendering it in the background."""
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="offo-reports-")
+        job = ReportJob(business_ids, owner, self.directory, self.node)
+        self.jobs[job.job_id] = job
+        self._save(job)
+        threading.Thread(target=self._run, args=(job,), name=f"report-job-{job.job_id[:8]}", daemon=True).start()
+        return job
+
+    def get(self, job_id: str, owner: str) -> Optional[ReportJob]:
+        """A job by ID, created by this worker or another, only for the client that created it."""
+        job = self.jobs.get(job_id) or self._load(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def purge_expired(self):
+        """Delete archives and records of jobs past their TTL, whichever worker created them."""
+        if self.directory is None:
+            return
+        now = datetime.now()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            job = self.jobs.get(job_id) or self._load(job_id)
+            if job is not None and job.expires_at is not None and job.expires_at <= now:
+                self.jobs.pop(job_id, None)
+                for path in (job.path, job.path + ".part", self._state_path(job_id)):
+                    self._remove(path)
+
+    def shutdown(self):
+        """Stop running jobs, the worker pool and remove artifacts."""
+        for job in self.jobs.values():
+            job.cancelled = True
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+        if self._owns_directory and self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _run(self, job: ReportJob):
+        job.status = JOB_RUNNING
+        self._save(job)
+        partial_path = job.path + ".part"
+        pending: Deque[Tuple[str, Future]] = deque()
+
+        def collect():
+            self._collect(job, archive, *pending.popleft())
+            if time.monotonic() - job.saved_at >= STATE_SAVE_SECONDS:
+                self._save(job)
+
+        try:
+            pool = self._get_pool()
+            with zipfile.ZipFile(partial_path, "w", zipfile.ZIP_STORED) as archive:
+                for business_id in job.business_ids:
+                    if job.cancelled:
+                        raise RuntimeError("Job cancelled")
+                    pending.append((business_id, pool.submit(self.render, business_id)))
+                    if len(pending) >= self.workers * 2:
+                        collect()
+                while pending:
+                    collect()
+                if job.failures:
+                    archive.writestr("failures.json", dumps(job.failures))
+            os.replace(partial_path, job.path)
+            job.status = JOB_COMPLETED
+        except Exception as e:
+            for _, future in pending:
+                future.cancel()
+            self._remove(partial_path)
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = datetime.now()
+            self._save(job)
+
+    @staticmethod
+    def _collect(job: ReportJob, archive: zipfile.ZipFile, business_id: str, future: Future):
+        try:
+            pdf = future.result()
+        except Exception as e:
+            job.failures.append({"business_id": business_id, "error": str(e) or type(e).__name__})
+            return
+        if pdf is None:
+            job.failures.append({"business_id": business_id, "error": "Business ID not found"})
+            return
+        archive.writestr(f"{business_id}.pdf", pdf)
+        job.completed += 1
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,307 @@
+"""
+score_events.py
+
+Change tracking and notifications for risk scores.
+
+ScoreChangeLog assigns each business a monotonically increasing version that
+only moves when its score, category or drivers change, and keeps a bounded,
+in-memory log of those changes for delta polling (/risk-score/changes).
+
+ScoreBroadcaster keeps, per business ID, the set of subscriptions that watch
+it. A change is encoded once as a server-sent event and handed to every
+watcher (/risk-score/stream).
+
+Each subscription keeps at most one pending event per business (newer events
+replace older ones), so a slow client only ever holds memory proportional to
+the number of businesses it watches, never to the number of updates.
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+
+# Maximum business IDs a single stream may subscribe to
+MAX_STREAM_IDS = 1000
+
+# Seconds between keep-alive comments on idle streams
+HEARTBEAT_SECONDS = 15.0
+
+# Seconds between refreshes of watched businesses whose cached score expired
+REFRESH_SECONDS = 30.0
+
+# Number of change entries kept for /risk-score/changes
+CHANGE_LOG_RETENTION = 50_000
+
+HEARTBEAT_EVENT = b": keepalive\n\n"
+
+
+def score_fingerprint(data: Dict[str, Any]) -> Tuple:
+    """
+    Reduce a risk score payload to the parts that count as a visible change.
+
+    Args:
+        data: Full risk score response
+
+    Returns:
+        Hashable tuple of score, category and drivers
+    """
+    drivers = tuple(
+        (driver.get("label"), driver.get("impact"), driver.get("description"))
+        for driver in data.get("drivers", [])
+    )
+    return (data.get("overall_score"), data.get("category"), drivers)
+
+
+def format_event(event: str, body: bytes, event_id: Optional[str] = None) -> bytes:
+    """
+    Frame an encoded JSON body as a server-sent event.
+
+    Args:
+        event: Event name
+        body: Single-line JSON bytes
+        event_id: Optional SSE id field
+
+    Returns:
+        Complete event, terminated by a blank line
+    """
+    parts = [b"event: ", event.encode(), b"\n"]
+    if event_id is not None:
+        parts += [b"id: ", event_id.encode(), b"\n"]
+    parts += [b"data: ", body, b"\n\n"]
+    return b"".join(parts)
+
+
+class ScoreChangeLog:
+    """
+    Versioned record of score changes with bounded retention.
+
+    Versions come from one global counter, so they are unique and increasing
+    across businesses; a business's version is the counter value of its
+    latest change. Only the newest entry per business keeps its body, older
+    entries are kept as tombstones so version ranges stay contiguous.
+    """
+
+    def __init__(self, retention: int = CHANGE_LOG_RETENTION):
+        self.latest_version = 0
+        self._entries: Deque[List[Any]] = deque(maxlen=retention)
+        self._latest_entry: Dict[str, List[Any]] = {}
+        self._fingerprints: Dict[str, Tuple] = {}
+
+    @property
+    def oldest_version(self) -> int:
+        """Version of the oldest retained entry (latest_version + 1 if empty)."""
+        if not self._entries:
+            return self.latest_version + 1
+        return self._entries[0][0]
+
+    def version_of(self, business_id: str) -> int:
+        """Current version for a business (0 if it was never recorded)."""
+        return self._fingerprints.get(business_id, (0,))[0]
+
+    def record(self, business_id: str, data: Dict[str, Any]) -> Tuple[int, bool]:
+        """
+        Assign a version to a freshly computed score.
+
+        Args:
+            business_id: Business the payload belongs to
+            data: Full risk score response
+
+        Returns:
+            Tuple of (version, changed). Unchanged payloads keep the
+            business's current version.
+        """
+        fingerprint = score_fingerprint(data)
+        current = self._fingerprints.get(business_id)
+        if current is not None and current[1] == fingerprint:
+            return current[0], False
+
+        self.latest_version += 1
+        self._fingerprints[business_id] = (self.latest_version, fingerprint)
+        return self.latest_version, True
+
+    def restore(self, latest_version: int, scores: Iterable[Tuple[str, int, Dict[str, Any], bytes]]):
+        """
+        Resume versioning from a score cache snapshot after a restart.
+
+        Restored businesses keep their versions and only get a new one when
+        they change again. Each restored score becomes the log entry for its
+        version, so a full resync (since=0) returns them; changes between
+        them that were not in the snapshot are gone, and such polls are
+        reported as not covered (see covers()).
+
+        Args:
+            latest_version: Counter value when the snapshot was taken
+            scores: (business_id, version, full payload, encoded payload)
+                of restored scores
+        """
+        restored = []
+        for business_id, version, data, body in scores:
+            self._fingerprints[business_id] = (version, score_fingerprint(data))
+            latest_version = max(latest_version, version)
+            restored.append((version, business_id, body))
+        self.latest_version = max(self.latest_version, latest_version)
+        for version, business_id, body in sorted(restored):
+            # Entries must stay in version order
+            if not self._entries or self._entries[-1][0] < version:
+                self.attach_body(business_id, version, body)
+
+    def attach_body(self, business_id: str, version: int, body: bytes):
+        """Append the encoded payload for a recorded change to the log."""
+        previous = self._latest_entry.get(business_id)
+        if previous is not None:
+            previous[2] = None
+
+        entry = [version, business_id, body]
+        self._entries.append(entry)
+        self._latest_entry[business_id] = entry
+
+    def covers(self, since: int) -> bool:
+        """Whether every change after `since` is still in the retained log."""
+        return since >= self.oldest_version - 1
+
+    def changes_since(self, since: int, limit: int) -> Optional[List[Tuple[int, str, bytes]]]:
+        """
+        Latest payload of every business that changed after a version.
+
+        When the log no longer covers `since` (see covers()), every retained
+        change is returned; older ones are lost.
+
+        Args:
+            since: Version the client already has (0 for everything retained)
+            limit: Maximum number of changes to return
+
+        Returns:
+            (version, business_id, body) tuples in version order, or None when
+            `since` is newer than any version this log issued (the versions
+            were reset, e.g. by a restart) and the client must resync
+        """
+        if since > self.latest_version:
+            return None
+
+        # Walk back from the newest entry so the cost is O(changes since)
+        newer = []
+        for entry in reversed(self._entries):
+            if entry[0] <= since:
+                break
+            newer.append(entry)
+
+        changes = []
+        for version, business_id, body in reversed(newer):
+            if body is None:
+                continue
+            changes.append((version, business_id, body))
+            if len(changes) >= limit:
+                break
+        return changes
+
+
+class ScoreSubscription:
+    """One client's stream: the IDs it watches and its coalesced pending events."""
+
+    def __init__(self, business_ids: FrozenSet[str]):
+        self.business_ids = business_ids
+        self.coalesced = 0
+        self._pending: Dict[str, bytes] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, business_id: str, event: bytes):
+        """Queue an event, replacing any not-yet-sent event for the same business."""
+        if business_id in self._pending:
+            self.coalesced += 1
+        self._pending[business_id] = event
+        self._ready.set()
+
+    async def next_events(self, timeout: float) -> List[bytes]:
+        """
+        Wait for pending events.
+
+        Args:
+            timeout: Seconds to wait before returning an empty list
+
+        Returns:
+            Pending events (one per business), or [] if the wait timed out
+        """
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+
+        events = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        return events
+
+
+class ScoreBroadcaster:
+    """Fans out score changes to the subscriptions watching each business."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[ScoreSubscription]] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def subscription_count(self) -> int:
+        return len({sub for subs in self._subscribers.values() for sub in subs})
+
+    def watched_ids(self) -> List[str]:
+        """Business IDs with at least one subscriber."""
+        return list(self._subscribers)
+
+    def subscribe(self, business_ids: Iterable[str]) -> ScoreSubscription:
+        """Register a new subscription for a set of business IDs."""
+        subscription = ScoreSubscription(frozenset(business_ids))
+        for business_id in subscription.business_ids:
+            self._subscribers.setdefault(business_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ScoreSubscription):
+        """Remove a subscription; businesses nobody watches are forgotten."""
+        for business_id in subscription.business_ids:
+            watchers = self._subscribers.get(business_id)
+            if watchers is None:
+                continue
+            watchers.discard(subscription)
+            if not watchers:
+                del self._subscribers[business_id]
+
+        if not self._subscribers and self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    def publish(self, business_id: str, body: bytes, version: int):
+        """
+        Send a changed score to every subscription watching the business.
+
+        Args:
+            business_id: Business the payload belongs to
+            body: Full risk score response, already JSON-encoded
+            version: Change version, sent as the SSE event id
+        """
+        watchers = self._subscribers.get(business_id)
+        if watchers:
+            event = format_event("score", body, event_id=str(version))
+            for subscription in watchers:
+                subscription.push(business_id, event)
+
+    def ensure_refresher(self, refresh: Callable[[List[str]], Awaitable[None]]):
+        """
+        Start the background refresher if it is not running.
+
+        Args:
+            refresh: Coroutine function called every REFRESH_SECONDS with the
+                currently watched IDs; it recomputes expired scores and
+                publishes them back through this broadcaster
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop(refresh))
+
+    async def _refresh_loop(self, refresh: Callable[[List[str]], Awaitable[None]]):
+        while self._subscribers:
+            await asyncio.sleep(REFRESH_SECONDS)
+            await refresh(self.watched_ids())
+
+
+score_changes = ScoreChangeLog()
+score_broadcaster = ScoreBroadcaster()
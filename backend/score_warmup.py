@@ -0,0 +1,177 @@
+"""
+score_warmup.py
+
+Score cache warm-up and snapshots for warm restarts.
+
+After a deploy the score cache is empty and the first wave of dashboard
+traffic recomputes everything at once. Two mechanisms avoid that:
+
+- Snapshot (OFFO_CACHE_SNAPSHOT=<path>): on shutdown every cached entry is
+  written to a local JSON-lines file with its computation time, and on
+  startup entries that are still within the TTL are loaded back. Entries
+  keep their original timestamp, so they expire when they would have
+  without the restart, and their bodies re-encode to the same bytes, so
+  clients' ETags stay valid.
+- Warm-up (OFFO_WARMUP_LIMIT businesses, off by default): after startup the
+  hottest businesses not restored from the snapshot are scored in the
+  background, OFFO_WARMUP_CONCURRENCY at a time. Hot businesses are the
+  most requested ones in a recorded traffic log (OFFO_WARMUP_ACCESS_LOG,
+  the OFFO_TRAFFIC_LOG format), or every business when no log is set.
+
+Snapshot format: a header line {"format", "saved_at", "latest_version"},
+then one {"key", "computed_at", "data"} line per entry (epoch seconds),
+oldest first. The data is the cached body, written without re-encoding.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from data_layer import get_all_business_ids
+from serialization import dumps
+
+
+CACHE_SNAPSHOT_PATH = os.environ.get("OFFO_CACHE_SNAPSHOT", "")
+WARMUP_LIMIT = int(os.environ.get("OFFO_WARMUP_LIMIT", "0"))
+WARMUP_CONCURRENCY = int(os.environ.get("OFFO_WARMUP_CONCURRENCY", "4"))
+WARMUP_ACCESS_LOG = os.environ.get("OFFO_WARMUP_ACCESS_LOG", "")
+
+SNAPSHOT_FORMAT = "offo-score-cache/1"
+
+# (cache key, computed_at, data)
+SnapshotEntry = Tuple[str, datetime, Dict[str, Any]]
+
+
+def hot_business_ids(limit: int, access_log: Optional[str] = None) -> List[str]:
+    """
+    Businesses worth pre-scoring, hottest first.
+
+    Args:
+        limit: Maximum number of IDs
+        access_log: Traffic log (JSON lines with a "b" business_id field);
+            when missing or unreadable, all businesses in data layer order
+
+    Returns:
+        Up to `limit` business IDs
+    """
+    if access_log:
+        counts: Counter = Counter()
+        try:
+            with open(access_log, "rb") as f:
+                for line in f:
+                    try:
+                        business_id = json.loads(line).get("b")
+                    except ValueError:
+                        continue  # a partially written last line
+                    if business_id:
+                        counts[business_id] += 1
+        except OSError:
+            counts = Counter()
+        known = set(get_all_business_ids())
+        hot = [business_id for business_id, _ in counts.most_common() if business_id in known]
+        if hot:
+            return hot[:limit]
+    return get_all_business_ids()[:limit]
+
+
+async def run_bounded(
+    items: Iterable[Any],
+    worker: Callable[[Any], Awaitable[bool]],
+    concurrency: int = WARMUP_CONCURRENCY
+) -> int:
+    """
+    Await worker(item) for every item, at most `concurrency` at a time.
+
+    Args:
+        items: Work items, consumed lazily
+        worker: Coroutine function returning True when it did work
+        concurrency: Maximum number of workers in flight
+
+    Returns:
+        Number of items for which the worker returned True
+    """
+    pending = iter(items)
+    done = 0
+
+    async def drain():
+        nonlocal done
+        for item in pending:
+            if await worker(item):
+                done += 1
+
+    await asyncio.gather(*(drain() for _ in range(max(1, concurrency))))
+    return done
+
+
+def save_snapshot(
+    path: str,
+    entries: Iterable[Tuple[str, datetime, bytes]],
+    latest_version: int = 0
+) -> int:
+    """
+    Write cache entries to a snapshot file, replacing it atomically.
+
+    Args:
+        path: Snapshot file path
+        entries: (cache key, computed_at, encoded JSON body), oldest first
+        latest_version: Score change log version to carry over
+
+    Returns:
+        Number of entries written
+    """
+    written = 0
+    partial_path = f"{path}.{os.getpid()}.tmp"
+    with open(partial_path, "wb") as f:
+        f.write(dumps({"format": SNAPSHOT_FORMAT, "saved_at": time.time(), "latest_version": latest_version}) + b"\n")
+        for key, computed_at, body in entries:
+            f.write(b"".join([
+                b'{"key":', dumps(key),
+                b',"computed_at":', dumps(computed_at.timestamp()),
+                b',"data":', body, b"}\n",
+            ]))
+            written += 1
+    os.replace(partial_path, path)
+    return written
+
+
+def load_snapshot(path: str, ttl: timedelta) -> Tuple[int, Iterator[SnapshotEntry]]:
+    """
+    Read a snapshot written by save_snapshot().
+
+    Args:
+        path: Snapshot file path
+        ttl: Cache TTL; entries older than this are skipped
+
+    Returns:
+        (latest_version, iterator of unexpired entries oldest first)
+
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If it is not a score cache snapshot
+    """
+    f = open(path, "rb")
+    try:
+        header = json.loads(f.readline() or b"null")
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != SNAPSHOT_FORMAT:
+        f.close()
+        raise ValueError(f"{path} is not a score cache snapshot")
+
+    def entries() -> Iterator[SnapshotEntry]:
+        oldest = datetime.now() - ttl
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    key, computed_at, data = record["key"], datetime.fromtimestamp(record["computed_at"]), record["data"]
+                except (ValueError, KeyError, TypeError):
+                    continue  # a truncated or foreign line
+                if computed_at > oldest:
+                    yield key, computed_at, data
+
+    return header.get("latest_version", 0), entries()
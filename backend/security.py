@@ -11,6 +11,7 @@ Features:
 
 from datetime import datetime, timedelta
 from typing import Dict, Optional
+import os
 import secrets
 from jose import JWTError, jwt
 from fastapi import HTTPException, Security, Depends
@@ -19,10 +20,15 @@ from pydantic import BaseModel
 
 
 # Security configuration
-SECRET_KEY = secrets.token_urlsafe(32)  # Generate secure random key
+# Generate a secure random key unless one is configured; set OFFO_SECRET_KEY
+# when running several workers so tokens are valid on all of them
+SECRET_KEY = os.environ.get("OFFO_SECRET_KEY") or secrets.token_urlsafe(32)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Scope required for diagnostics such as per-request profiling
+ADMIN_SCOPE = "admin"
+
 # API Key rotation storage
 _api_keys: Dict[str, Dict[str, any]] = {}
 _active_api_key_id: str = ""
@@ -143,12 +149,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Security(security_scheme)) -> TokenData:
+def decode_access_token(token: str) -> TokenData:
     """
-    Verify JWT token from request.
+    Decode and validate a raw JWT access token.
 
     Args:
-        credentials: HTTP Authorization credentials
+        token: Encoded JWT (without the "Bearer " prefix)
 
     Returns:
         TokenData if valid
@@ -156,8 +162,6 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security_s
     Raises:
         HTTPException: If token is invalid
     """
-    token = credentials.credentials
-
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         client_id: str = payload.get("sub")
@@ -184,6 +188,45 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security_s
         )
 
 
+def verify_token(credentials: HTTPAuthorizationCredentials = Security(security_scheme)) -> TokenData:
+    """
+    Verify JWT token from request.
+
+    Args:
+        credentials: HTTP Authorization credentials
+
+    Returns:
+        TokenData if valid
+
+    Raises:
+        HTTPException: If token is invalid
+    """
+    return decode_access_token(credentials.credentials)
+
+
+def has_scope(token_data: TokenData, scope: str) -> bool:
+    """Check whether a validated token grants a scope."""
+    return scope in token_data.scopes
+
+
+def require_scope(scope: str):
+    """
+    Build a dependency that verifies the token and requires a scope.
+
+    Args:
+        scope: Scope the token must carry
+
+    Returns:
+        Dependency returning TokenData, raising 403 if the scope is missing
+    """
+    def dependency(token_data: TokenData = Depends(verify_token)) -> TokenData:
+        if not has_scope(token_data, scope):
+            raise HTTPException(status_code=403, detail=f"Requires the '{scope}' scope")
+        return token_data
+
+    return dependency
+
+
 # Initialize default API key for development
 DEFAULT_KEY_ID, DEFAULT_API_KEY = generate_api_key("demo_client", expiry_days=365)
 
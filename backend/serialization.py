@@ -0,0 +1,146 @@
+"""
+serialization.py
+
+Fast JSON encoding for API responses.
+
+Uses orjson when it is installed and falls back to the standard library json
+module otherwise. Both paths produce compact UTF-8 bytes that can be cached
+and returned as-is in a raw Response. JsonLinesLog appends encoded records
+to a local file in batches, up to a size cap.
+"""
+
+import gzip
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+# Name of the active encoder ("orjson" or "json"), useful for diagnostics
+JSON_ENCODER = "orjson" if orjson is not None else "json"
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Encode an object to compact JSON bytes.
+
+    Args:
+        obj: JSON-serializable object (dicts, lists, str, int, float, bool, None)
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def gzip_bytes(body: bytes) -> bytes:
+    """Compress a response body with gzip (mtime fixed so output is deterministic)."""
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """
+    Check whether an Accept-Encoding header allows gzip.
+
+    Args:
+        accept_encoding: Raw Accept-Encoding header value
+
+    Returns:
+        True if gzip is listed without q=0
+    """
+    if not accept_encoding:
+        return False
+
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip() not in ("gzip", "*"):
+            continue
+        params = params.replace(" ", "")
+        if params in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            return False
+        return True
+
+    return False
+
+
+class JsonLinesLog:
+    """
+    Buffers JSON records and appends them to a JSON-lines file, up to a size cap.
+
+    Full batches are written by a background thread, so record() never does
+    file I/O on the event loop. The cap is checked against the file's real
+    size before every write, so several workers appending to one file stay
+    within it (give or take one batch each).
+    """
+
+    def __init__(self, path: str, max_bytes: int, flush_every: int = 256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.recorded = 0
+        self.dropped = 0
+        self._buffer: List[bytes] = []
+        self._lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    @property
+    def full(self) -> bool:
+        return self._size >= self.max_bytes
+
+    def record(self, entry: Dict[str, Any]):
+        """Buffer one record; dropped (and counted) once the file is full."""
+        if self.full:
+            self.dropped += 1
+            return
+        line = dumps(entry) + b"\n"
+        self._buffer.append(line)
+        # Counted now so the cap holds while the batch waits for the writer
+        self._size += len(line)
+        self.recorded += 1
+        if len(self._buffer) >= self.flush_every:
+            self._submit(self._take())
+
+    def flush(self):
+        """Append buffered records and wait until every queued write is done."""
+        data = self._take()
+        if self._writer is not None:
+            # One writer thread, so this runs after every earlier batch
+            self._submit(data).result()
+        else:
+            self._write(data)
+
+    def _take(self) -> bytes:
+        data = b"".join(self._buffer)
+        self._buffer = []
+        return data
+
+    def _submit(self, data: bytes) -> Future:
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jsonl-writer")
+        return self._writer.submit(self._write, data)
+
+    def _write(self, data: bytes):
+        if not data:
+            return
+        with self._lock, open(self.path, "ab") as f:
+            # Other processes may append to the same file
+            size = os.fstat(f.fileno()).st_size
+            if size >= self.max_bytes:
+                self.dropped += data.count(b"\n")
+            else:
+                f.write(data)
+                size += len(data)
+            self._size = max(self._size, size)
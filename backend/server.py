@@ -0,0 +1,339 @@
+"""
+server.py
+
+Preload-and-fork launcher for running several workers.
+
+`uvicorn main:app --workers N` starts N fresh interpreters. Each one imports
+FastAPI, matplotlib and ReportLab on its own, builds the report logo and
+font caches, and loads the demo data and any OFFO_PORTFOLIO_PATH
+portfolio, so memory grows with the worker count. This launcher does all
+of that once in a parent process and then forks the workers. They share
+those pages copy-on-write:
+
+- everything the app needs is imported and built before the fork:
+  lazily loaded modules, pdf_generator's static data, and the portfolio,
+  which is columnar numpy arrays whose buffers refcount changes never
+  touch;
+- gc.freeze() moves every object that exists at that point out of the
+  collector's reach, so garbage collections in the workers do not write
+  to, and so copy, the shared pages;
+- nothing is started before the fork: no threads, pools or event loop.
+  Monitoring threads, warm-ups and pools start per worker in the lifespan.
+
+Workers inherit the parent's OFFO_SECRET_KEY (or the key it generated), so
+tokens issued by one worker are accepted by all of them. They also share
+one bulk export directory (OFFO_REPORT_DIR, a temporary one by default), so
+any worker can report on and serve an export job started by another. The parent
+restarts workers that die and forwards SIGINT/SIGTERM for a graceful
+shutdown. SIGTTIN adds a worker and SIGTTOU retires the newest one.
+POSIX only (needs os.fork).
+
+With --shard (OFFO_SHARDING=1) businesses are partitioned across the
+workers by consistent hashing (see sharding.py), so each worker caches only
+its own shard. The parent binds one Unix socket per worker slot in the
+shard directory and publishes the slots in a membership file; a restarted
+worker takes over its slot's socket, so peers' forwarded requests wait in
+the socket backlog instead of failing. With OFFO_CACHE_SNAPSHOT set each
+worker keeps its own snapshot, <path>.<worker name>.
+
+Usage (from backend/):
+    python server.py --workers 4 --port 8000
+    python server.py --workers 4 --port 8000 --shard
+
+Run `python -m benchmarks.worker_memory` to compare memory against
+`uvicorn main:app --workers N`.
+"""
+
+import argparse
+import gc
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import uvicorn
+
+
+DEFAULT_WORKERS = int(os.environ.get("OFFO_WORKERS", str(os.cpu_count() or 1)))
+SHARDING_ENABLED = os.environ.get("OFFO_SHARDING", "0") == "1"
+
+# Workers that exit sooner than this after starting are restarted with a delay
+MIN_WORKER_LIFETIME_SECONDS = 1.0
+SUPERVISOR_POLL_SECONDS = 0.1
+
+MEMBERSHIP_FILE = "members.json"
+
+
+def preload():
+    """
+    Import the app and build all shared read-only data, then freeze it.
+
+    Returns:
+        The ASGI app
+    """
+    import main
+    import lazy_imports
+
+    lazy_imports.load_all()
+    main.pdf_generator.preload_static_data()
+
+    gc.collect()
+    gc.freeze()
+    return main.app
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def bind_unix_socket(path: str, backlog: int) -> socket.socket:
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def worker_name(index: int) -> str:
+    return f"worker-{index}"
+
+
+class Shard:
+    """A worker slot's place in sharded mode."""
+
+    def __init__(self, name: str, sock: socket.socket, membership_path: str):
+        self.name = name
+        self.sock = sock
+        self.membership_path = membership_path
+
+
+def run_worker(app, sock: socket.socket, log_level: str, shard: Optional[Shard] = None):
+    """Serve the preloaded app on the shared socket (runs in the forked child)."""
+    # Children inherit the parent's PRNG state; give each its own
+    random.seed()
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGTTIN, signal.SIG_DFL)
+    signal.signal(signal.SIGTTOU, signal.SIG_DFL)
+    sockets = [sock]
+    if shard is not None:
+        import main
+        import sharding
+
+        if main.CACHE_SNAPSHOT_PATH:
+            main.CACHE_SNAPSHOT_PATH = f"{main.CACHE_SNAPSHOT_PATH}.{shard.name}"
+        main.report_jobs.node = shard.name
+        app = sharding.enable(app, shard.name, shard.membership_path)
+        sockets.append(shard.sock)
+    config = uvicorn.Config(app, log_level=log_level, access_log=False)
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+def fork_worker(
+    app,
+    sock: socket.socket,
+    log_level: str,
+    shard: Optional[Shard] = None,
+    close: List[socket.socket] = ()
+) -> int:
+    """Fork a worker; `close` lists inherited sockets the child does not serve."""
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            for other in close:
+                other.close()
+            run_worker(app, sock, log_level, shard)
+            status = 0
+        finally:
+            os._exit(status)
+    return pid
+
+
+def serve(
+    app,
+    sock: socket.socket,
+    workers: int,
+    log_level: str = "info",
+    shard_dir: Optional[str] = None,
+    backlog: int = 2048
+):
+    """
+    Fork `workers` children and supervise them until SIGINT/SIGTERM.
+
+    SIGTTIN adds a worker and SIGTTOU retires the newest one.
+
+    Args:
+        app: Preloaded ASGI app
+        sock: Bound, listening socket shared by all workers
+        workers: Number of worker processes
+        log_level: uvicorn log level for the workers
+        shard_dir: Directory for the shard sockets and membership file;
+            sharded mode is off when None
+        backlog: Listen backlog of the shard sockets
+    """
+    slots: Dict[int, Optional[Shard]] = {}
+    pids: Dict[int, int] = {}
+    started: Dict[int, float] = {}
+    # Retiring worker pid -> its shard (None when not sharded), closed once it exits
+    retiring: Dict[int, Optional[Shard]] = {}
+    pending: List[int] = []
+    stopping = False
+    membership_path = os.path.join(shard_dir, MEMBERSHIP_FILE) if shard_dir else ""
+
+    def publish():
+        if shard_dir:
+            import sharding
+
+            sharding.write_membership(
+                membership_path, {shard.name: shard.sock.getsockname() for shard in slots.values()}
+            )
+
+    def start(index: int):
+        others = [
+            shard.sock for shard in [*(slots[other] for other in slots if other != index), *retiring.values()]
+            if shard is not None
+        ]
+        pid = fork_worker(app, sock, log_level, slots[index], close=others)
+        pids[pid] = index
+        started[pid] = time.monotonic()
+
+    def add_worker():
+        # A retiring worker still owns its socket path until it exits
+        busy = set(slots) | {pids[pid] for pid in retiring}
+        index = next(i for i in range(len(busy) + 1) if i not in busy)
+        shard = None
+        if shard_dir:
+            name = worker_name(index)
+            shard = Shard(name, bind_unix_socket(os.path.join(shard_dir, f"{name}.sock"), backlog), membership_path)
+        slots[index] = shard
+        # Peers may forward to the new slot at once: its socket queues connections until the worker accepts
+        publish()
+        start(index)
+
+    def retire_worker():
+        if len(slots) <= 1:
+            return
+        index = max(slots)
+        shard = slots.pop(index)
+        # Peers stop forwarding to it before it stops accepting
+        publish()
+        for pid, slot in pids.items():
+            if slot == index:
+                retiring[pid] = shard
+                os.kill(pid, signal.SIGTERM)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for _ in range(workers):
+        add_worker()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    # Resizing forks, so it happens in the loop below rather than in the handler
+    signal.signal(signal.SIGTTIN, lambda signum, frame: pending.append(signum))
+    signal.signal(signal.SIGTTOU, lambda signum, frame: pending.append(signum))
+
+    while pids:
+        while pending and not stopping:
+            if pending.pop(0) == signal.SIGTTIN:
+                add_worker()
+            else:
+                retire_worker()
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(SUPERVISOR_POLL_SECONDS)
+            continue
+        index = pids.pop(pid)
+        lifetime = time.monotonic() - started.pop(pid)
+        if pid in retiring:
+            shard = retiring.pop(pid)
+            if shard is not None:
+                _close_shard(shard)
+        elif not stopping:
+            if lifetime < MIN_WORKER_LIFETIME_SECONDS:
+                time.sleep(MIN_WORKER_LIFETIME_SECONDS)
+            start(index)
+
+    for shard in [*slots.values(), *retiring.values()]:
+        if shard is not None:
+            _close_shard(shard)
+
+
+def _close_shard(shard: Shard):
+    path = shard.sock.getsockname()
+    shard.sock.close()
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Preload the app once and fork uvicorn workers.")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="worker processes (OFFO_WORKERS)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument(
+        "--shard", action="store_true", default=SHARDING_ENABLED,
+        help="partition businesses across the workers by consistent hashing (OFFO_SHARDING=1)"
+    )
+    parser.add_argument(
+        "--shard-dir", default=os.environ.get("OFFO_SHARD_DIR", ""),
+        help="directory for the shard sockets (a temporary one by default)"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    if not hasattr(os, "fork"):
+        print("server.py needs os.fork; use `uvicorn main:app --workers N` on this platform", file=sys.stderr)
+        return 2
+    args = parse_args(argv)
+    report_dir = None
+    if not os.environ.get("OFFO_REPORT_DIR"):
+        # Set before the app is imported: every worker polls every export job
+        report_dir = tempfile.mkdtemp(prefix="offo-reports-")
+        os.environ["OFFO_REPORT_DIR"] = report_dir
+    app = preload()
+    sock = bind_socket(args.host, args.port, args.backlog)
+    shard_dir = None
+    if args.shard:
+        shard_dir = args.shard_dir or tempfile.mkdtemp(prefix="offo-shards-")
+        os.makedirs(shard_dir, exist_ok=True)
+    try:
+        serve(app, sock, args.workers, args.log_level, shard_dir, args.backlog)
+    finally:
+        sock.close()
+        if args.shard and not args.shard_dir:
+            shutil.rmtree(shard_dir, ignore_errors=True)
+        if report_dir:
+            shutil.rmtree(report_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,567 @@
+"""
+sharding.py
+
+Consistent-hash sharding of businesses across local worker processes.
+
+Each worker keeps its own score and chart caches, so without sharding every
+worker ends up caching every business and adding workers adds no cache
+capacity. In sharded mode (`python server.py --shard`) business IDs are
+partitioned across the workers with a consistent-hash ring:
+
+- the kernel still hands each connection to whichever worker accepts it;
+- a request for /risk-score/{business_id} (and its /raw, /pdf and trend
+  sub-routes) that lands on a worker that does not own the business is
+  forwarded once, over a Unix socket, to the owning worker, and the owner's
+  response is streamed back unchanged. Forwarded requests carry a hop
+  header so they are always served where they arrive;
+- export job IDs name the worker that runs the job ("worker-1.<hex>"), and
+  /reports/jobs/{job_id} and its /download are forwarded to that worker the
+  same way, so progress comes from the job itself;
+- if the owner cannot be reached (it is being restarted) the request is
+  served locally: a cache miss, not an error (jobs are read from the
+  export directory all workers share).
+
+Each worker's ScoreChangeLog only sees its own shard and has its own
+version counter, so the change endpoints are fanned out:
+
+- /risk-score/changes queries every worker and merges the results. Its
+  cursor (`since`, `next_since`, `latest_version`) is a composite of
+  per-worker versions, "worker-0:12,worker-1:7", to be passed back as is;
+  `since=0` starts every shard from the beginning. `limit` applies per
+  shard. A business's `version` is only comparable with earlier versions
+  of the same business; it starts again from that worker's counter when
+  the business moves to another worker. A worker that restarted (its
+  versions began again) is read from the start and the response is marked
+  `truncated`.
+- /risk-score/stream splits the watched IDs by owner, opens one stream per
+  owner and interleaves their events. The merged stream ends when any of
+  them ends (e.g. a worker restarts), so the client reconnects.
+
+The ring places DEFAULT_REPLICAS virtual points per worker, so adding or
+removing one of N workers moves only about 1/N of the businesses; the rest
+keep their warm cache entries. Worker names are stable across restarts, so
+a restarted worker owns the same shard.
+
+Membership is a small JSON file ({name: unix socket path}) written by the
+server.py parent whenever workers are added or removed; workers re-read it
+when it changes, at most every MEMBERSHIP_CHECK_SECONDS.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import re
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from metrics import SHARD_REQUESTS
+from score_events import MAX_STREAM_IDS
+from serialization import dumps
+
+if TYPE_CHECKING:
+    import httpx
+
+
+DEFAULT_REPLICAS = 128
+MEMBERSHIP_CHECK_SECONDS = 0.5
+FORWARD_TIMEOUT_SECONDS = 120.0
+
+# Served by the worker that produced the response
+SHARD_HEADER = "x-offo-shard"
+# Set on forwarded requests (the forwarding worker's name) and echoed on their responses
+HOP_HEADER = "x-offo-shard-hop"
+
+_SHARDED_PATH = re.compile(r"^/risk-score/([^/]+?)(?:/raw|/pdf|/trend\.[a-z]+)?$")
+# Export jobs of a sharded worker have IDs "<worker name>.<hex>" (see report_jobs.py)
+_JOB_PATH = re.compile(r"^/reports/jobs/([A-Za-z0-9_-]+)\.[0-9a-f]{32}(?:/download)?$")
+# Routes under /risk-score/ that are not a business ID
+_UNSHARDED_NAMES = frozenset({"stream", "changes"})
+_HOP_BY_HOP = frozenset({
+    b"connection", b"keep-alive", b"proxy-connection", b"te", b"trailer",
+    b"transfer-encoding", b"upgrade",
+})
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys to node names."""
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = DEFAULT_REPLICAS):
+        """
+        Args:
+            nodes: Initial node names
+            replicas: Virtual points per node; more spreads keys more evenly
+        """
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: set = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, node: str):
+        """Add a node; only keys that now hash to its points move to it."""
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self.replicas):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        """Remove a node; only its keys move, each to the next point on the ring."""
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """The node owning a key, or None when the ring is empty."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+def write_membership(path: str, members: Dict[str, str]):
+    """Atomically replace the membership file with {node name: unix socket path}."""
+    partial_path = f"{path}.{os.getpid()}.tmp"
+    with open(partial_path, "w") as f:
+        json.dump(members, f, sort_keys=True)
+    os.replace(partial_path, path)
+
+
+def read_membership(path: str) -> Dict[str, str]:
+    """
+    Read a membership file written by write_membership().
+
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If it is not valid JSON
+    """
+    with open(path) as f:
+        members = json.load(f)
+    if not isinstance(members, dict):
+        raise ValueError(f"{path} is not a shard membership file")
+    return {str(name): str(address) for name, address in members.items()}
+
+
+def parse_cursor(value: str) -> Dict[str, int]:
+    """
+    Per-worker versions from a composite /risk-score/changes cursor.
+
+    Args:
+        value: "worker-0:12,worker-1:7", or "0"/"" for the beginning
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if value in ("", "0"):
+        return {}
+    cursor = {}
+    for part in value.split(","):
+        node, separator, version = part.rpartition(":")
+        if not separator or not node:
+            raise ValueError(f"Malformed cursor part {part!r}")
+        cursor[node] = int(version)
+    return cursor
+
+
+def format_cursor(versions: Dict[str, int]) -> str:
+    return ",".join(f"{node}:{versions[node]}" for node in sorted(versions))
+
+
+def job_shard(path: str) -> Optional[str]:
+    """The worker named in an export job request path, or None for other routes."""
+    match = _JOB_PATH.match(path)
+    return match.group(1) if match else None
+
+
+def shard_key(path: str) -> Optional[str]:
+    """The business ID a request path is sharded by, or None for other routes."""
+    match = _SHARDED_PATH.match(path)
+    if match is None or match.group(1) in _UNSHARDED_NAMES:
+        return None
+    return match.group(1)
+
+
+class ShardingMiddleware:
+    """
+    ASGI middleware forwarding per-business requests to the owning worker.
+
+    Lifespan and non-sharded requests pass straight through to the app.
+    """
+
+    def __init__(self, app, node: str, membership_path: str, replicas: int = DEFAULT_REPLICAS):
+        """
+        Args:
+            app: The ASGI app served by this worker
+            node: This worker's name in the membership file
+            membership_path: Membership file written by the server.py parent
+            replicas: Virtual points per node on the ring
+        """
+        self.app = app
+        self.node = node
+        self.membership_path = membership_path
+        self.replicas = replicas
+        self._members: Dict[str, str] = {}
+        self._ring = HashRing(replicas=replicas)
+        self._membership_version: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        # One client per peer socket, created on the worker's event loop
+        self._clients: Dict[str, "httpx.AsyncClient"] = {}
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < MEMBERSHIP_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            stat = os.stat(self.membership_path)
+            # write_membership() replaces the file, so the inode changes on every update
+            version = (stat.st_ino, stat.st_mtime_ns)
+            if version == self._membership_version:
+                return
+            members = read_membership(self.membership_path)
+        except (OSError, ValueError):
+            return  # keep the last good membership
+        self._membership_version = version
+        for node in set(self._members) - set(members):
+            self._ring.remove(node)
+        for node in set(members) - set(self._members):
+            self._ring.add(node)
+        self._members = members
+
+    def owner(self, business_id: str) -> Optional[str]:
+        """The worker owning a business, or None before membership is known."""
+        self._refresh()
+        return self._ring.node_for(business_id)
+
+    def job_owner(self, path: str) -> Optional[str]:
+        """The worker running the export job a path refers to, while it is a member."""
+        node = job_shard(path)
+        if node is None:
+            return None
+        self._refresh()
+        return node if node in self._members else None
+
+    def owns(self, business_id: str) -> bool:
+        """Whether this worker owns a business (True before membership is known)."""
+        owner = self.owner(business_id)
+        return owner is None or owner == self.node
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            if scope["type"] == "lifespan":
+                return await self._lifespan(scope, receive, send)
+            return await self.app(scope, receive, send)
+
+        business_id = shard_key(scope["path"])
+        hop = any(name == HOP_HEADER.encode() for name, _ in scope["headers"])
+        if not hop and scope["path"] == "/risk-score/changes":
+            self._refresh()
+            if self._members:
+                SHARD_REQUESTS.inc("fanned_out")
+                return await self._merged_changes(scope, send)
+        if not hop and scope["path"] == "/risk-score/stream":
+            groups = self._stream_groups(scope)
+            if len(groups) > 1:
+                SHARD_REQUESTS.inc("fanned_out")
+                return await self._merged_stream(scope, receive, send, groups)
+            # All watched businesses live on one worker: route it like a per-business request
+            business_id = next(iter(groups.values()))[0] if groups else None
+        routed = business_id is not None or job_shard(scope["path"]) is not None
+        if routed and not hop:
+            owner = self.owner(business_id) if business_id is not None else self.job_owner(scope["path"])
+            if owner is not None and owner != self.node:
+                body = await _read_body(receive)
+                if await self._forward(scope, body, send, owner):
+                    SHARD_REQUESTS.inc("forwarded")
+                    return
+                SHARD_REQUESTS.inc("fallback")
+                receive = _replay(body, receive)
+            else:
+                SHARD_REQUESTS.inc("local")
+
+        async def send_with_shard(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (SHARD_HEADER.encode(), self.node.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_shard)
+
+    async def _lifespan(self, scope, receive, send):
+        """Run the app's lifespan, closing the peer clients after its shutdown."""
+        async def send_after_close(message):
+            if message["type"] == "lifespan.shutdown.complete":
+                await self.aclose()
+            await send(message)
+
+        await self.app(scope, receive, send_after_close)
+
+    def _client(self, owner: str) -> "httpx.AsyncClient":
+        # main imports this module for owns_business(); only sharded workers need httpx
+        import httpx
+
+        address = self._members[owner]
+        client = self._clients.get(address)
+        if client is None:
+            client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=address),
+                base_url="http://shard",
+                timeout=FORWARD_TIMEOUT_SECONDS,
+            )
+            self._clients[address] = client
+        return client
+
+    async def _forward(self, scope, body: bytes, send, owner: str) -> bool:
+        """
+        Stream the owner's response for this request back to the client.
+
+        Returns:
+            False if the owner could not be reached before it started
+            responding (the caller serves the request locally)
+        """
+        import httpx
+
+        headers = self._upstream_headers(scope)
+        client = self._client(owner)
+        request = client.build_request(
+            scope["method"],
+            httpx.URL(path=scope["path"], query=scope.get("query_string", b"")),
+            headers=headers,
+            content=body,
+        )
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.TransportError:
+            return False
+
+        try:
+            response_headers = [
+                (name, value) for name, value in response.headers.raw if name.lower() not in _HOP_BY_HOP
+            ]
+            response_headers.append((HOP_HEADER.encode(), self.node.encode()))
+            await send({"type": "http.response.start", "status": response.status_code, "headers": response_headers})
+            # Raw bytes: a gzip body stays compressed, matching its Content-Encoding
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await response.aclose()
+        return True
+
+    def _upstream_headers(self, scope) -> List[Tuple[bytes, bytes]]:
+        """The request's headers for a hop to another worker."""
+        headers = [(name, value) for name, value in scope["headers"] if name.lower() not in _HOP_BY_HOP]
+        headers.append((HOP_HEADER.encode(), self.node.encode()))
+        return headers
+
+    async def _shard_changes(self, node: str, since: int, limit: str, headers) -> Tuple[Any, bool]:
+        """One worker's /risk-score/changes response, and whether it had restarted."""
+        client = self._client(node)
+        response = await client.get("/risk-score/changes", params={"since": since, "limit": limit}, headers=headers)
+        if response.status_code != 410:
+            return response, False
+        # Newer than anything the worker issued: it restarted and its versions began again
+        response = await client.get("/risk-score/changes", params={"since": 0, "limit": limit}, headers=headers)
+        return response, True
+
+    async def _merged_changes(self, scope, send):
+        """Answer /risk-score/changes from every worker's change log."""
+        import httpx
+
+        params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        try:
+            cursor = parse_cursor(params.get("since", ["0"])[-1])
+        except ValueError:
+            return await self._send_json(
+                send, 400, {"detail": "since must be 0 or the next_since cursor of a previous response"}
+            )
+        limit = params.get("limit", ["1000"])[-1]
+        headers = self._upstream_headers(scope)
+        nodes = sorted(self._members)
+        try:
+            results = await asyncio.gather(*(
+                self._shard_changes(node, cursor.get(node, 0), limit, headers) for node in nodes
+            ))
+        except httpx.TransportError:
+            return await self._send_json(send, 503, {"detail": "A shard worker is unreachable; retry"})
+
+        for response, _ in results:
+            if response.status_code != 200:
+                # Invalid limit, missing or expired token: the same answer from every worker
+                return await self._send_json(send, response.status_code, response.json())
+
+        bodies = {node: response.json() for node, (response, _) in zip(nodes, results)}
+        await self._send_json(send, 200, {
+            "latest_version": format_cursor({node: body["latest_version"] for node, body in bodies.items()}),
+            "next_since": format_cursor({node: body["next_since"] for node, body in bodies.items()}),
+            "has_more": any(body["has_more"] for body in bodies.values()),
+            "truncated": any(body["truncated"] for body in bodies.values()) or any(r for _, r in results),
+            "changes": [change for body in bodies.values() for change in body["changes"]],
+        })
+
+    def _stream_groups(self, scope) -> Dict[str, List[str]]:
+        """Watched business IDs of a /risk-score/stream request by owning worker."""
+        params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        ids = params.get("ids", [""])[-1].split(",")
+        business_ids = list(dict.fromkeys(i.strip() for i in ids if i.strip()))
+        if len(business_ids) > MAX_STREAM_IDS:
+            return {}  # rejected by the endpoint itself
+        groups: Dict[str, List[str]] = {}
+        for business_id in business_ids:
+            groups.setdefault(self.owner(business_id) or self.node, []).append(business_id)
+        return groups
+
+    async def _merged_stream(self, scope, receive, send, groups: Dict[str, List[str]]):
+        """Interleave the event streams of every worker owning watched businesses."""
+        import httpx
+
+        headers = self._upstream_headers(scope)
+
+        async def open_stream(owner: str, business_ids: List[str]):
+            client = self._client(owner)
+            request = client.build_request(
+                "GET", "/risk-score/stream", params={"ids": ",".join(business_ids)}, headers=headers
+            )
+            return await client.send(request, stream=True)
+
+        opened = await asyncio.gather(
+            *(open_stream(owner, business_ids) for owner, business_ids in groups.items()),
+            return_exceptions=True
+        )
+        upstreams = [response for response in opened if isinstance(response, httpx.Response)]
+        try:
+            if len(upstreams) < len(opened):
+                return await self._send_json(send, 503, {"detail": "A shard worker is unreachable; retry"})
+            failed = next((response for response in upstreams if response.status_code != 200), None)
+            if failed is not None:
+                # Unknown business, invalid token: relay the owner's answer
+                await failed.aread()
+                return await self._send_json(send, failed.status_code, failed.json())
+
+            await send({"type": "http.response.start", "status": 200, "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+                (SHARD_HEADER.encode(), self.node.encode()),
+            ]})
+            await self._pump_events(upstreams, receive, send)
+        finally:
+            for response in upstreams:
+                await response.aclose()
+
+    async def _pump_events(self, upstreams, receive, send):
+        """Forward complete events from every upstream until one ends or the client leaves."""
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def read(response):
+            buffer = b""
+            try:
+                async for chunk in response.aiter_raw():
+                    complete, separator, buffer = (buffer + chunk).rpartition(b"\n\n")
+                    if separator:
+                        await events.put(complete + separator)
+            finally:
+                await events.put(None)
+
+        async def disconnected():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        readers = [asyncio.ensure_future(read(response)) for response in upstreams]
+        watcher = asyncio.ensure_future(disconnected())
+        try:
+            while True:
+                getter = asyncio.ensure_future(events.get())
+                await asyncio.wait({getter, watcher}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    return
+                chunk = getter.result()
+                if chunk is None:
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            for task in [*readers, watcher]:
+                task.cancel()
+            await asyncio.gather(*readers, watcher, return_exceptions=True)
+
+    async def _send_json(self, send, status: int, payload: Dict[str, Any]):
+        body = dumps(payload)
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (SHARD_HEADER.encode(), self.node.encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay(body: bytes, receive):
+    """A receive callable yielding an already-read request body, then the original messages."""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+# The sharding middleware of this worker, when sharded mode is on
+_local_shard: Optional[ShardingMiddleware] = None
+
+
+def enable(app, node: str, membership_path: str, replicas: int = DEFAULT_REPLICAS) -> ShardingMiddleware:
+    """
+    Wrap an app for sharded serving and make owns_business() use its ring.
+
+    Called by server.py in each forked worker.
+    """
+    global _local_shard
+    _local_shard = ShardingMiddleware(app, node, membership_path, replicas)
+    return _local_shard
+
+
+def owns_business(business_id: str) -> bool:
+    """Whether this worker should cache a business (always True when not sharded)."""
+    return _local_shard is None or _local_shard.owns(business_id)
@@ -0,0 +1,278 @@
+"""
+synthetic_portfolio.py
+
+Deterministic synthetic business portfolios for scale testing.
+
+generate_portfolio(count, seed) builds N businesses in columnar numpy arrays
+(about 30 bytes per business, so 1M businesses fit in ~30 MB and generate in
+a few seconds):
+    - a latent compliance "health" per business, shifted by industry risk and
+      company size, drives all five metrics through a shared factor plus
+      correlated noise, so good task completion goes with good training and
+      low documentation error rates as in real data
+    - industry, location and employee count (log-normal)
+    - daily score history: not stored, but regenerated on demand from
+      (seed, index) as a mean-reverting walk ending at the current score,
+      so multi-year histories cost nothing until requested
+
+Business IDs are derived from the row index ("syn_0000042"), so no string
+column is kept. Portfolios are saved as .npz and registered with the data
+layer (data_layer.register_portfolio, or OFFO_PORTFOLIO_PATH at startup).
+
+Usage (from backend/):
+    python synthetic_portfolio.py --count 1000000 --seed 7 --output portfolio.npz
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+ID_PREFIX = "syn_"
+ID_DIGITS = 7
+DEFAULT_SEED = 7
+HISTORY_DAYS = 3 * 365
+HISTORY_MEAN_REVERSION = 0.08
+GENERATION_CHUNK_SIZE = 65_536
+
+METRIC_NAMES = (
+    "task_completion_rate",
+    "overdue_task_rate",
+    "training_completion_rate",
+    "doc_error_rate",
+    "doc_missing_field_rate",
+)
+
+# (industry, risk offset applied to latent health)
+INDUSTRIES = (
+    ("Healthcare Services", 0.06),
+    ("Manufacturing", 0.0),
+    ("Construction", -0.08),
+    ("Transportation & Logistics", -0.07),
+    ("Warehousing & Distribution", -0.05),
+    ("Retail", -0.02),
+    ("Hospitality", -0.04),
+    ("Financial Services", 0.07),
+    ("Technology", 0.05),
+    ("Agriculture", -0.06),
+    ("Energy & Utilities", 0.01),
+    ("Education", 0.03),
+)
+
+LOCATIONS = (
+    "Seattle, WA", "Portland, OR", "Denver, CO", "Phoenix, AZ", "Las Vegas, NV",
+    "San Francisco, CA", "Los Angeles, CA", "San Diego, CA", "Salt Lake City, UT", "Boise, ID",
+    "Austin, TX", "Dallas, TX", "Houston, TX", "Oklahoma City, OK", "Kansas City, MO",
+    "Chicago, IL", "Minneapolis, MN", "Detroit, MI", "Columbus, OH", "Indianapolis, IN",
+    "Atlanta, GA", "Miami, FL", "Orlando, FL", "Charlotte, NC", "Nashville, TN",
+    "New York, NY", "Boston, MA", "Philadelphia, PA", "Pittsburgh, PA", "Baltimore, MD",
+)
+
+# Metric = intercept + slope * health + noise; the sign of the slope makes
+# "rate of good things" rise and "rate of bad things" fall with health
+_METRIC_INTERCEPTS = np.array([0.25, 0.60, 0.20, 0.45, 0.40])
+_METRIC_SLOPES = np.array([0.75, -0.58, 0.78, -0.44, -0.39])
+_NOISE_SCALE = np.array([0.12, 0.09, 0.14, 0.07, 0.07])
+# Residual correlation: tasks/overdue and the two documentation rates move together
+_NOISE_CORRELATION = np.array([
+    [1.0, -0.6, 0.3, -0.2, -0.2],
+    [-0.6, 1.0, -0.2, 0.2, 0.2],
+    [0.3, -0.2, 1.0, -0.2, -0.2],
+    [-0.2, 0.2, -0.2, 1.0, 0.7],
+    [-0.2, 0.2, -0.2, 0.7, 1.0],
+])
+
+_RISK_PROFILES = (
+    (0.75, "Strong compliance culture with consistent task follow-through and training"),
+    (0.55, "Established compliance program with some gaps to monitor"),
+    (0.35, "Moderate compliance gaps in task follow-through and documentation"),
+    (0.0, "Significant compliance challenges requiring remediation"),
+)
+
+
+class Portfolio:
+    """Columnar synthetic portfolio; row index i is business syn_<i>."""
+
+    def __init__(
+        self,
+        seed: int,
+        metrics: np.ndarray,
+        industry: np.ndarray,
+        location: np.ndarray,
+        employees: np.ndarray,
+        health: np.ndarray,
+        volatility: np.ndarray
+    ):
+        self.seed = seed
+        self.metrics = metrics
+        self.industry = industry
+        self.location = location
+        self.employees = employees
+        self.health = health
+        self.volatility = volatility
+
+    def __len__(self) -> int:
+        return len(self.metrics)
+
+    @staticmethod
+    def business_id(index: int) -> str:
+        return f"{ID_PREFIX}{index:0{ID_DIGITS}d}"
+
+    def index_of(self, business_id: str) -> Optional[int]:
+        """Row index of a business ID, or None if it is not in this portfolio."""
+        if not business_id.startswith(ID_PREFIX):
+            return None
+        digits = business_id[len(ID_PREFIX):]
+        if not digits.isdigit():
+            return None
+        index = int(digits)
+        if index >= len(self) or business_id != self.business_id(index):
+            return None
+        return index
+
+    def business_ids(self) -> List[str]:
+        return [self.business_id(index) for index in range(len(self))]
+
+    def metrics_at(self, index: int) -> Dict[str, float]:
+        values = self.metrics[index].tolist()
+        return {name: round(value, 4) for name, value in zip(METRIC_NAMES, values)}
+
+    def details_at(self, index: int) -> Dict[str, Any]:
+        health = float(self.health[index])
+        profile = next(text for threshold, text in _RISK_PROFILES if health >= threshold)
+        return {
+            "employee_count": int(self.employees[index]),
+            "industry": INDUSTRIES[self.industry[index]][0],
+            "location": LOCATIONS[self.location[index]],
+            "risk_profile": profile,
+        }
+
+    def history_offsets(self, index: int, days: int = HISTORY_DAYS) -> np.ndarray:
+        """
+        Daily deviation from the current score, oldest first, ending at 0.
+
+        Regenerated from (seed, index) on every call, so it is identical
+        across processes and never stored. Shocks are drawn newest day
+        first, so a shorter history is the tail of a longer one.
+        """
+        rng = np.random.default_rng([self.seed, index])
+        shocks = rng.normal(0.0, float(self.volatility[index]), days).tolist()
+        offsets = [0.0] * days
+        value = 0.0
+        # Walk backwards from today so the newest point is exactly the current score
+        for age in range(1, days):
+            value = (1.0 - HISTORY_MEAN_REVERSION) * value + shocks[age - 1]
+            offsets[days - 1 - age] = value
+        return np.array(offsets)
+
+    def history(self, index: int, current_score: float, days: int = HISTORY_DAYS,
+                end: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Daily {date, score} points for the last `days` days, ending at `end` (today)."""
+        end = end or date.today()
+        scores = np.clip(current_score + self.history_offsets(index, days), 0, 100)
+        return [
+            {"date": (end - timedelta(days=days - 1 - day)).isoformat(), "score": round(score, 1)}
+            for day, score in enumerate(scores.tolist())
+        ]
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            seed=np.array(self.seed),
+            metrics=self.metrics,
+            industry=self.industry,
+            location=self.location,
+            employees=self.employees,
+            health=self.health,
+            volatility=self.volatility,
+        )
+
+
+def load_portfolio(path: str) -> Portfolio:
+    """Load a portfolio saved with Portfolio.save()."""
+    with np.load(path) as data:
+        return Portfolio(
+            seed=int(data["seed"]),
+            metrics=data["metrics"],
+            industry=data["industry"],
+            location=data["location"],
+            employees=data["employees"],
+            health=data["health"],
+            volatility=data["volatility"],
+        )
+
+
+def _generate_chunk(rng: np.random.Generator, size: int) -> Dict[str, np.ndarray]:
+    industry = rng.integers(0, len(INDUSTRIES), size, dtype=np.uint8)
+    location = rng.integers(0, len(LOCATIONS), size, dtype=np.uint8)
+    employees = np.clip(rng.lognormal(mean=4.0, sigma=1.1, size=size), 3, 50_000).astype(np.uint32)
+
+    industry_offset = np.array([offset for _, offset in INDUSTRIES])[industry]
+    # Larger companies tend to have more formal compliance programs
+    size_offset = 0.02 * (np.log10(employees) - 2.0)
+    health = np.clip(rng.beta(4.0, 2.2, size) + industry_offset + size_offset, 0.0, 1.0)
+
+    covariance = _NOISE_CORRELATION * np.outer(_NOISE_SCALE, _NOISE_SCALE)
+    noise = rng.multivariate_normal(np.zeros(len(METRIC_NAMES)), covariance, size, method="cholesky")
+    metrics = np.clip(_METRIC_INTERCEPTS + np.outer(health, _METRIC_SLOPES) + noise, 0.0, 1.0)
+
+    # Weaker programs swing more from day to day
+    volatility = (0.6 + 1.8 * (1.0 - health)) * rng.uniform(0.7, 1.3, size)
+
+    return {
+        "metrics": metrics.astype(np.float32),
+        "industry": industry,
+        "location": location,
+        "employees": employees,
+        "health": health.astype(np.float32),
+        "volatility": volatility.astype(np.float32),
+    }
+
+
+def generate_portfolio(count: int, seed: int = DEFAULT_SEED) -> Portfolio:
+    """
+    Generate `count` businesses deterministically from `seed`.
+
+    Rows are produced in fixed-size chunks, each from its own
+    (seed, chunk) stream, so peak memory stays flat and the first N rows of
+    a larger portfolio equal a smaller one with the same seed.
+
+    Args:
+        count: Number of businesses (up to 10**ID_DIGITS)
+        seed: Generator seed
+
+    Returns:
+        Portfolio
+    """
+    if not 0 < count <= 10 ** ID_DIGITS:
+        raise ValueError(f"count must be between 1 and {10 ** ID_DIGITS}")
+
+    chunks = []
+    for chunk_index, start in enumerate(range(0, count, GENERATION_CHUNK_SIZE)):
+        rng = np.random.default_rng([seed, chunk_index])
+        chunk = _generate_chunk(rng, GENERATION_CHUNK_SIZE)
+        chunks.append({name: column[:count - start] for name, column in chunk.items()})
+
+    columns = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+    return Portfolio(seed=seed, **columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic business portfolio")
+    parser.add_argument("--count", type=int, default=100_000, help="number of businesses")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", default="portfolio.npz", help="where to save the .npz file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    portfolio = generate_portfolio(args.count, args.seed)
+    portfolio.save(args.output)
+    print(f"Generated {len(portfolio):,} businesses in {time.perf_counter() - start:.1f}s -> {args.output}")
+    print(f"Load it with OFFO_PORTFOLIO_PATH={args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,32 @@ test_api.py
 Integration tests for FastAPI endpoints.
 """
 
+import gzip
+import json
+
 import pytest
 from fastapi.testclient import TestClient
+import main
 from main import app
+from security import create_access_token
 
 client = TestClient(app)
 
 
+def auth_headers(scopes=("read:scores", "read:reports")):
+    """Build a bearer Authorization header for an authenticated test client."""
+    token = create_access_token(data={"sub": "test_client", "scopes": list(scopes)})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def clear_score_cache():
+    """Start each cache-sensitive test from an empty score cache."""
+    main.clear_score_cache()
+    yield
+    main.clear_score_cache()
+
+
 class TestHealthEndpoint:
     """Tests for root health check endpoint"""
 
@@ -93,6 +112,152 @@ class TestRiskScoreEndpoint:
         assert abs(total_weight - 1.0) < 0.0001
 
 
+class TestSparseFields:
+    """Tests for ?fields= sparse field selection on /risk-score/{business_id}"""
+
+    def test_fields_trims_response(self, clear_score_cache):
+        response = client.get(
+            "/risk-score/biz_mixed?fields=overall_score,category",
+            headers=auth_headers()
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "business_id": "biz_mixed",
+            "overall_score": response.json()["overall_score"],
+            "category": "MODERATE",
+        }
+
+    def test_fields_skips_unrequested_stages(self, clear_score_cache, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError("stage should not run")
+
+        monkeypatch.setattr(main, "get_30day_trend", fail)
+        monkeypatch.setattr(main, "get_risk_drivers", fail)
+        monkeypatch.setattr(main, "get_business_details", fail)
+        monkeypatch.setattr(main, "generate_recommended_actions", fail)
+
+        response = client.get("/risk-score/biz_critical?fields=category", headers=auth_headers())
+        assert response.status_code == 200
+        assert response.json()["category"] == "HIGH"
+
+    def test_unknown_field_rejected(self):
+        response = client.get("/risk-score/biz_healthy?fields=category,bogus", headers=auth_headers())
+        assert response.status_code == 400
+
+    def test_partial_and_full_cached_separately(self, clear_score_cache):
+        partial = client.get("/risk-score/biz_healthy?fields=category", headers=auth_headers())
+        full = client.get("/risk-score/biz_healthy", headers=auth_headers())
+
+        assert set(partial.json()) == {"business_id", "category"}
+        assert "trend_30d" in full.json()
+        assert "biz_healthy" in main._score_cache
+        assert main.cache_key("biz_healthy", frozenset({"business_id", "category"})) in main._score_cache
+
+    def test_full_cache_serves_partial_request(self, clear_score_cache):
+        full = client.get("/risk-score/biz_excellent", headers=auth_headers()).json()
+        partial = client.get(
+            "/risk-score/biz_excellent?fields=drivers", headers=auth_headers()
+        ).json()
+
+        assert partial == {"business_id": "biz_excellent", "drivers": full["drivers"]}
+        key = main.cache_key("biz_excellent", frozenset({"business_id", "drivers"}))
+        assert main._cache_timestamps[key] == main._cache_timestamps["biz_excellent"]
+
+
+class TestEncodedCache:
+    """Tests for pre-serialized cache entries on /risk-score/{business_id}"""
+
+    def test_cache_stores_encoded_body(self, clear_score_cache):
+        response = client.get("/risk-score/biz_healthy", headers=auth_headers())
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert json.loads(main._encoded_cache["biz_healthy"]) == response.json()
+
+    def test_cache_hit_returns_same_body(self, clear_score_cache):
+        first = client.get("/risk-score/biz_mixed", headers=auth_headers())
+        second = client.get("/risk-score/biz_mixed", headers=auth_headers())
+        assert first.content == second.content
+
+    def test_gzip_variant_for_gzip_clients(self, clear_score_cache):
+        response = client.get(
+            "/risk-score/biz_mixed",
+            headers={**auth_headers(), "Accept-Encoding": "gzip"}
+        )
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.json()["business_id"] == "biz_mixed"
+        assert gzip.decompress(main._gzip_cache["biz_mixed"]) == main._encoded_cache["biz_mixed"]
+
+    def test_identity_for_other_clients(self, clear_score_cache):
+        response = client.get(
+            "/risk-score/biz_mixed",
+            headers={**auth_headers(), "Accept-Encoding": "identity"}
+        )
+        assert "content-encoding" not in response.headers
+
+
+class TestConditionalRequests:
+    """Tests for ETag / Last-Modified / Cache-Control on cached endpoints"""
+
+    def test_validators_present(self, clear_score_cache):
+        response = client.get("/risk-score/biz_healthy", headers=auth_headers())
+        assert response.headers["etag"].startswith('"')
+        assert "last-modified" in response.headers
+
+        scope, max_age = response.headers["cache-control"].split(", max-age=")
+        assert scope == "private"
+        assert 0 < int(max_age) <= main.CACHE_TTL_MINUTES * 60
+
+    def test_if_none_match_returns_304(self, clear_score_cache):
+        first = client.get("/risk-score/biz_healthy", headers=auth_headers())
+        second = client.get(
+            "/risk-score/biz_healthy",
+            headers={**auth_headers(), "If-None-Match": first.headers["etag"]}
+        )
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["etag"] == first.headers["etag"]
+
+    def test_stale_etag_returns_200(self, clear_score_cache):
+        response = client.get(
+            "/risk-score/biz_healthy",
+            headers={**auth_headers(), "If-None-Match": '"not-the-current-etag"'}
+        )
+        assert response.status_code == 200
+
+    def test_gzip_etag_also_validates(self, clear_score_cache):
+        first = client.get(
+            "/risk-score/biz_mixed", headers={**auth_headers(), "Accept-Encoding": "gzip"}
+        )
+        assert first.headers["etag"].endswith('-gzip"')
+        second = client.get(
+            "/risk-score/biz_mixed",
+            headers={**auth_headers(), "If-None-Match": first.headers["etag"]}
+        )
+        assert second.status_code == 304
+
+    def test_if_modified_since_returns_304(self, clear_score_cache):
+        first = client.get("/risk-score/biz_healthy", headers=auth_headers())
+        second = client.get(
+            "/risk-score/biz_healthy",
+            headers={**auth_headers(), "If-Modified-Since": first.headers["last-modified"]}
+        )
+        assert second.status_code == 304
+
+    def test_if_modified_since_in_past_returns_200(self, clear_score_cache):
+        response = client.get(
+            "/risk-score/biz_healthy",
+            headers={**auth_headers(), "If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+        )
+        assert response.status_code == 200
+
+    def test_business_list_conditional(self):
+        first = client.get("/businesses")
+        assert first.headers["cache-control"].startswith("public, max-age=")
+        second = client.get("/businesses", headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 304
+
+
 class TestBusinessListEndpoint:
     """Tests for /businesses endpoint"""
 
@@ -138,6 +303,24 @@ class TestRawMetricsEndpoint:
         assert response.status_code == 404
 
 
+class TestPdfEndpoint:
+    """Tests for /risk-score/{business_id}/pdf export"""
+
+    def test_export_pdf(self):
+        response = client.get("/risk-score/biz_mixed/pdf", headers=auth_headers())
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.content.startswith(b"%PDF-")
+
+    def test_export_pdf_content_length(self):
+        response = client.get("/risk-score/biz_healthy/pdf", headers=auth_headers())
+        assert int(response.headers["content-length"]) == len(response.content)
+
+    def test_export_pdf_not_found(self):
+        response = client.get("/risk-score/nonexistent/pdf", headers=auth_headers())
+        assert response.status_code == 404
+
+
 class TestCORS:
     """Tests for CORS configuration"""
 
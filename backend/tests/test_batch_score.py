@@ -0,0 +1,117 @@
+"""
+test_batch_score.py
+
+Tests for the offline batch scoring CLI.
+"""
+
+import io
+import json
+
+import pytest
+
+from batch_score import main as batch_main, score_file, validate_metrics
+from scoring_algorithm import compute_offo_risk_score
+
+
+HEALTHY = {
+    "task_completion_rate": 0.95,
+    "overdue_task_rate": 0.05,
+    "training_completion_rate": 0.92,
+    "doc_error_rate": 0.05,
+    "doc_missing_field_rate": 0.03,
+}
+CSV_HEADER = "business_id," + ",".join(HEALTHY)
+
+
+def csv_row(business_id, metrics):
+    return business_id + "," + ",".join(str(value) for value in metrics.values())
+
+
+def run(text, input_format="csv", output_format="csv", **kwargs):
+    destination, errors = io.StringIO(), io.StringIO()
+    summary = score_file(io.StringIO(text), destination, input_format, output_format, errors=errors, **kwargs)
+    return summary, destination.getvalue(), [json.loads(line) for line in errors.getvalue().splitlines()]
+
+
+class TestValidation:
+    """Tests for per-row metric validation"""
+
+    def test_valid_row_converted(self):
+        assert validate_metrics({name: str(value) for name, value in HEALTHY.items()}) == HEALTHY
+
+    @pytest.mark.parametrize("value, message", [
+        ("", "missing"),
+        ("abc", "not a number"),
+        ("1.2", "between 0 and 1"),
+        ("nan", "between 0 and 1"),
+    ])
+    def test_invalid_values(self, value, message):
+        with pytest.raises(ValueError, match=message):
+            validate_metrics({**HEALTHY, "doc_error_rate": value})
+
+
+class TestScoreFile:
+    """Tests for streaming scoring"""
+
+    def test_csv_scores_match_scoring_algorithm(self):
+        summary, output, errors = run(CSV_HEADER + "\n" + csv_row("biz_a", HEALTHY) + "\n")
+
+        expected = compute_offo_risk_score(HEALTHY)
+        lines = output.splitlines()
+        assert lines[0].startswith("business_id,overall_score,category")
+        assert lines[1].startswith(f"biz_a,{expected['overall_score']},{expected['category']}")
+        assert summary["rows"] == 1 and errors == []
+
+    def test_invalid_rows_reported_with_line_numbers(self):
+        text = "\n".join([
+            CSV_HEADER,
+            csv_row("ok_1", HEALTHY),
+            csv_row("bad", {**HEALTHY, "overdue_task_rate": 7}),
+            "short,row",
+            csv_row("ok_2", HEALTHY),
+        ])
+        summary, output, errors = run(text)
+
+        assert summary["rows"] == 2 and summary["invalid_rows"] == 2
+        assert [error["line"] for error in errors] == [3, 4]
+        assert [line.split(",")[0] for line in output.splitlines()[1:]] == ["ok_1", "ok_2"]
+
+    def test_jsonl_round_trip_keeps_order_across_chunks(self):
+        rows = [{"business_id": f"b{i}", **HEALTHY, "task_completion_rate": i / 100} for i in range(100)]
+        text = "".join(json.dumps(row) + "\n" for row in rows) + "\n"
+
+        summary, output, errors = run(text, "jsonl", "jsonl", chunk_size=7)
+
+        scored = [json.loads(line) for line in output.splitlines()]
+        assert [row["business_id"] for row in scored] == [f"b{i}" for i in range(100)]
+        assert scored[0]["components"]["task_adherence_score"] == compute_offo_risk_score(
+            {**HEALTHY, "task_completion_rate": 0.0})["components"]["task_adherence_score"]
+        assert summary["rows"] == 100 and errors == []
+
+    def test_process_pool_matches_inline(self):
+        rows = [csv_row(f"b{i}", {**HEALTHY, "training_completion_rate": (i % 10) / 10}) for i in range(500)]
+        text = CSV_HEADER + "\n" + "\n".join(rows) + "\n"
+
+        _, inline, _ = run(text, chunk_size=50)
+        _, pooled, _ = run(text, chunk_size=50, workers=2)
+        assert pooled == inline
+
+    def test_missing_metric_columns_rejected(self):
+        with pytest.raises(ValueError, match="missing columns"):
+            run("business_id,task_completion_rate\nb,0.5\n")
+
+
+class TestCli:
+    """Tests for the command-line entry point"""
+
+    def test_csv_to_jsonl(self, tmp_path, capsys):
+        source = tmp_path / "metrics.csv"
+        source.write_text(CSV_HEADER + "\n" + csv_row("biz_a", HEALTHY) + "\n")
+        destination = tmp_path / "scores.jsonl"
+
+        assert batch_main([str(source), str(destination), "--workers", "0"]) == 0
+        assert json.loads(destination.read_text())["business_id"] == "biz_a"
+        assert "Scored 1 rows" in capsys.readouterr().err
+
+    def test_unknown_extension_needs_format(self, tmp_path):
+        assert batch_main([str(tmp_path / "metrics.txt"), "-"]) == 2
@@ -0,0 +1,121 @@
+"""
+test_benchmarks.py
+
+Tests for the microbenchmark runner, baseline comparison and start-up budget.
+"""
+
+import json
+import random
+
+import pdf_generator
+from benchmarks import startup, suite
+from chart_cache import chart_cache
+from benchmarks.__main__ import main as bench_main
+
+
+def results_with(p50_by_name):
+    return {"benchmarks": {name: {"p50_us": p50} for name, p50 in p50_by_name.items()}}
+
+
+class TestRunner:
+    """Tests for timing and synthetic inputs"""
+
+    def test_run_benchmark_reports_percentiles(self):
+        result = suite.run_benchmark(lambda: sum(range(50)), seconds=0.01)
+        assert result["rounds"] >= suite.MIN_ROUNDS
+        assert result["ops_per_sec"] > 0
+        assert result["min_us"] <= result["p50_us"] <= result["p90_us"] <= result["p99_us"]
+
+    def test_synthetic_inputs_are_seeded(self):
+        first = [suite.synthetic_metrics(random.Random(1)) for _ in range(3)]
+        second = [suite.synthetic_metrics(random.Random(1)) for _ in range(3)]
+        assert first == second
+        assert all(0.0 <= value <= 1.0 for metrics in first for value in metrics.values())
+
+    def test_pdf_report_renders_its_chart_every_call(self, monkeypatch):
+        report = suite.synthetic_report(random.Random(1), 0)
+        monkeypatch.setattr(suite, "synthetic_report", lambda rng, i: report)
+        renders = []
+        render = pdf_generator.render_trend_chart_image
+        monkeypatch.setattr(
+            pdf_generator, "render_trend_chart_image",
+            lambda trend_data, options: renders.append(options) or render(trend_data, options)
+        )
+        entries = chart_cache.stats()["entries"]
+
+        call = suite.setup_pdf_report(random.Random(1))
+        call()
+        call()
+
+        assert len(renders) == 2
+        assert chart_cache.stats()["entries"] == entries
+
+    def test_unknown_benchmark_rejected(self):
+        try:
+            suite.run_suite(["no_such_benchmark"], seconds=0.01)
+        except ValueError as e:
+            assert "no_such_benchmark" in str(e)
+        else:
+            raise AssertionError("expected ValueError")
+
+
+class TestBaselineComparison:
+    """Tests for regression detection"""
+
+    def test_within_tolerance_passes(self):
+        rows = suite.compare_to_baseline(results_with({"a": 11.0}), results_with({"a": 10.0}), 0.25)
+        assert rows[0]["regression"] is False
+
+    def test_slowdown_beyond_tolerance_is_regression(self):
+        rows = suite.compare_to_baseline(results_with({"a": 20.0}), results_with({"a": 10.0}), 0.25)
+        assert rows[0]["regression"] is True
+        assert rows[0]["ratio"] == 2.0
+
+    def test_benchmarks_missing_from_baseline_skipped(self):
+        rows = suite.compare_to_baseline(results_with({"new": 5.0}), results_with({"a": 10.0}))
+        assert rows == []
+
+    def test_cli_fails_on_regression(self, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        output = tmp_path / "results.json"
+        baseline.write_text(json.dumps(results_with({"generate_recommended_actions": 1e-6})))
+
+        status = bench_main([
+            "--only", "generate_recommended_actions", "--seconds", "0.01",
+            "--baseline", str(baseline), "--output", str(output),
+        ])
+
+        assert status == 1
+        assert "generate_recommended_actions" in json.loads(output.read_text())["benchmarks"]
+
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     _json
+import time:       300 |        420 |   json
+import time:      5000 |       5420 | main
+"""
+
+
+class TestStartup:
+    """Tests for the cold-start report and budget"""
+
+    def test_parse_importtime(self):
+        modules = startup.parse_importtime(IMPORTTIME_OUTPUT)
+        assert modules == [
+            {"module": "_json", "self_us": 120, "cumulative_us": 120, "depth": 2},
+            {"module": "json", "self_us": 300, "cumulative_us": 420, "depth": 1},
+            {"module": "main", "self_us": 5000, "cumulative_us": 5420, "depth": 0},
+        ]
+
+    def test_budget_checks(self):
+        report = {"first_response_s": 0.5, "lazy_subsystems_loaded": []}
+        assert startup.check_budget(report, budget=1.0) == []
+        assert len(startup.check_budget(report, budget=0.1)) == 1
+        assert len(startup.check_budget({**report, "lazy_subsystems_loaded": ["matplotlib"]}, budget=1.0)) == 1
+
+    def test_first_response_without_heavy_subsystems(self):
+        report = startup.measure_startup(runs=1, top=5)
+        assert report["lazy_subsystems_loaded"] == []
+        assert report["main_import_s"] > 0
+        assert report["slowest_imports"][0]["module"] == "main"
@@ -0,0 +1,171 @@
+"""
+test_chart_cache.py
+
+Tests for the trend chart image cache and the trend image endpoint.
+"""
+
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import pdf_generator
+from chart_cache import ChartCache, chart_cache_key
+from chart_renderer import ChartRenderer
+from metrics import CHART_CACHE_EVENTS
+from security import create_access_token
+
+
+client = TestClient(main.app)
+
+TREND = [{"date": "2026-01-01", "score": 80.0}, {"date": "2026-01-02", "score": 81.5}]
+OPTIONS = {"width": 8, "height": 3, "dpi": 300, "image_format": "png"}
+
+
+def auth_headers():
+    token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores", "read:reports"]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def events():
+    return {event: CHART_CACHE_EVENTS.value(event) for event in ("hit", "disk_hit", "miss", "eviction", "spill")}
+
+
+def delta(before, after):
+    return {event: after[event] - before[event] for event in before if after[event] != before[event]}
+
+
+class TestChartCacheKey:
+    """Tests for cache key derivation"""
+
+    def test_same_points_and_options_same_key(self):
+        assert chart_cache_key(TREND, OPTIONS) == chart_cache_key([dict(p) for p in TREND], dict(reversed(OPTIONS.items())))
+
+    def test_points_change_key(self):
+        changed = [TREND[0], {"date": "2026-01-02", "score": 81.6}]
+        assert chart_cache_key(changed, OPTIONS) != chart_cache_key(TREND, OPTIONS)
+
+    def test_options_change_key(self):
+        assert chart_cache_key(TREND, {**OPTIONS, "dpi": 100}) != chart_cache_key(TREND, OPTIONS)
+
+
+class TestChartCache:
+    """Tests for the in-memory LRU and disk spill"""
+
+    def test_get_or_render_renders_once(self):
+        cache = ChartCache(max_bytes=1000)
+        renders = []
+
+        def render():
+            renders.append(1)
+            return b"image"
+
+        before = events()
+        assert cache.get_or_render("k", render) == b"image"
+        assert cache.get_or_render("k", render) == b"image"
+        assert len(renders) == 1
+        assert delta(before, events()) == {"miss": 1, "hit": 1}
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = ChartCache(max_bytes=10)
+        cache.put("a", b"1234")
+        cache.put("b", b"1234")
+        cache.get("a")
+        cache.put("c", b"1234")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"1234"
+        assert cache.stats()["bytes"] == 8
+
+    def test_spill_and_promote(self, tmp_path):
+        cache = ChartCache(max_bytes=10, directory=str(tmp_path), disk_max_bytes=1000)
+        cache.put("a", b"1234567")
+        before = events()
+        cache.put("b", b"1234567")
+
+        assert (tmp_path / "a.chart").read_bytes() == b"1234567"
+        assert cache.get("a") == b"1234567"
+        assert delta(before, events()) == {"eviction": 2, "spill": 2, "disk_hit": 1}
+        assert cache.stats()["disk_entries"] == 2
+
+    def test_disk_budget_drops_oldest(self, tmp_path):
+        cache = ChartCache(max_bytes=1, directory=str(tmp_path), disk_max_bytes=10)
+        for key in ("a", "b", "c"):
+            cache.put(key, b"12345")
+        assert sorted(os.listdir(tmp_path)) == ["b.chart", "c.chart"]
+        assert cache.stats()["disk_bytes"] == 10
+
+    def test_spilled_files_indexed_on_start(self, tmp_path):
+        (tmp_path / "old.chart").write_bytes(b"png")
+        cache = ChartCache(max_bytes=100, directory=str(tmp_path))
+        assert cache.get("old") == b"png"
+
+    def test_missing_spill_file_is_a_miss(self, tmp_path):
+        cache = ChartCache(max_bytes=1, directory=str(tmp_path))
+        cache.put("a", b"12345")
+        os.remove(tmp_path / "a.chart")
+        assert cache.get("a") is None
+        assert cache.stats()["disk_entries"] == 0
+
+
+    def test_finds_files_spilled_by_another_worker(self, tmp_path):
+        first = ChartCache(max_bytes=1, directory=str(tmp_path))
+        second = ChartCache(max_bytes=1, directory=str(tmp_path))
+        first.put("a", b"12345")
+
+        before = events()
+        assert second.get("a") == b"12345"
+        assert delta(before, events()) == {"disk_hit": 1}
+
+    def test_disk_budget_covers_every_worker(self, tmp_path):
+        workers = [ChartCache(max_bytes=1, directory=str(tmp_path), disk_max_bytes=10) for _ in range(2)]
+        for key in ("a", "b", "c", "d"):
+            workers[ord(key) % 2].put(key, b"12345")
+
+        assert sorted(os.listdir(tmp_path)) == ["c.chart", "d.chart"]
+        assert workers[1].stats()["disk_bytes"] == 10
+
+    def test_hits_keep_shared_files(self, tmp_path):
+        first = ChartCache(max_bytes=1, directory=str(tmp_path), disk_max_bytes=10)
+        second = ChartCache(max_bytes=1, directory=str(tmp_path), disk_max_bytes=10)
+        first.put("a", b"12345")
+        second.put("b", b"12345")
+        second.get("a")
+        first.put("c", b"12345")
+
+        assert sorted(os.listdir(tmp_path)) == ["a.chart", "c.chart"]
+
+
+class TestTrendChartEndpoint:
+    """Tests for GET /risk-score/{business_id}/trend.png"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, monkeypatch):
+        cache = ChartCache(max_bytes=10 * 1024 * 1024)
+        monkeypatch.setattr(pdf_generator, "chart_cache", cache)
+        monkeypatch.setattr(main, "chart_renderer", ChartRenderer(cache, workers=0))
+
+    def test_png_served_and_cached(self):
+        before = events()
+        first = client.get("/risk-score/biz_healthy/trend.png", headers=auth_headers())
+        second = client.get("/risk-score/biz_healthy/trend.png", headers=auth_headers())
+
+        assert first.status_code == 200
+        assert first.headers["content-type"] == "image/png"
+        assert first.content.startswith(b"\x89PNG")
+        assert second.content == first.content
+        assert delta(before, events()) == {"miss": 1, "hit": 1}
+
+    def test_shared_with_pdf_path(self):
+        trend = main.build_risk_score_data("biz_mixed", main.TREND_CHART_FIELDS)["trend_30d"]
+        image = pdf_generator.render_trend_chart(trend)
+        response = client.get("/risk-score/biz_mixed/trend.png?dpi=300", headers=auth_headers())
+        assert response.content == image
+
+    def test_not_found(self):
+        response = client.get("/risk-score/nonexistent/trend.png", headers=auth_headers())
+        assert response.status_code == 404
+
+    def test_requires_auth(self):
+        assert client.get("/risk-score/biz_healthy/trend.png").status_code in (401, 403)
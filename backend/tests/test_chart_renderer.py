@@ -0,0 +1,168 @@
+"""
+test_chart_renderer.py
+
+Tests for off-loop chart rendering and the PNG/SVG trend chart endpoints.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import chart_renderer
+import main
+from chart_cache import ChartCache, chart_cache_key
+from chart_renderer import ChartRenderer
+from metrics import STAGE_LATENCY
+from security import create_access_token
+
+
+client = TestClient(main.app)
+
+TREND = [{"date": "2026-01-01", "score": 80.0}, {"date": "2026-01-02", "score": 81.5}]
+OPTIONS = {"width": 4.0, "height": 2.0, "dpi": 50, "image_format": "png"}
+
+
+def auth_headers():
+    token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores", "read:reports"]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestChartRenderer:
+    """Tests for cache-first rendering"""
+
+    def test_concurrent_misses_share_one_render(self, monkeypatch):
+        calls = []
+        release = threading.Event()
+
+        def slow_render(trend_data, options):
+            calls.append(options)
+            release.wait(5)
+            return b"image"
+
+        monkeypatch.setattr(chart_renderer, "render_chart_image", slow_render)
+        cache = ChartCache(max_bytes=1024)
+        renderer = ChartRenderer(cache, workers=0)
+
+        async def scenario():
+            waiters = [asyncio.ensure_future(renderer.render(TREND, OPTIONS)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.gather(*waiters)
+
+        assert asyncio.run(scenario()) == [b"image"] * 3
+        assert len(calls) == 1
+        assert cache.get(chart_cache_key(TREND, OPTIONS)) == b"image"
+        assert renderer._inflight == {}
+
+    def test_cache_hit_skips_render(self, monkeypatch):
+        monkeypatch.setattr(chart_renderer, "render_chart_image", pytest.fail)
+        cache = ChartCache(max_bytes=1024)
+        cache.put(chart_cache_key(TREND, OPTIONS), b"cached")
+        assert asyncio.run(ChartRenderer(cache, workers=0).render(TREND, OPTIONS)) == b"cached"
+
+    def test_disk_tier_stays_off_the_event_loop(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(chart_renderer, "render_chart_image", lambda trend_data, options: bytes(600))
+        cache = ChartCache(max_bytes=1024, directory=str(tmp_path))
+        renderer = ChartRenderer(cache, workers=0)
+        io_threads = []
+        for name in ("get", "_spill"):
+            method = getattr(cache, name)
+
+            def traced(*args, method=method):
+                io_threads.append(threading.current_thread())
+                return method(*args)
+
+            monkeypatch.setattr(cache, name, traced)
+
+        other = [{"date": "2026-01-03", "score": 10.0}]
+
+        async def scenario():
+            await renderer.render(TREND, OPTIONS)
+            # Evicts and spills the first image
+            await renderer.render(other, OPTIONS)
+            cache.clear()
+            # Promoted back from disk
+            return await renderer.render(TREND, OPTIONS)
+
+        assert asyncio.run(scenario()) == bytes(600)
+        assert len(list(tmp_path.iterdir())) == 1
+        assert io_threads and threading.main_thread() not in io_threads
+
+    def test_failed_render_not_cached(self, monkeypatch):
+        def broken(trend_data, options):
+            raise RuntimeError("render failed")
+
+        monkeypatch.setattr(chart_renderer, "render_chart_image", broken)
+        cache = ChartCache(max_bytes=1024)
+        renderer = ChartRenderer(cache, workers=0)
+        with pytest.raises(RuntimeError):
+            asyncio.run(renderer.render(TREND, OPTIONS))
+        assert cache.stats()["entries"] == 0
+        assert renderer._inflight == {}
+
+    def test_process_pool_render(self):
+        renderer = ChartRenderer(ChartCache(max_bytes=1024 * 1024), workers=1)
+        before = STAGE_LATENCY.count("chart_render")
+        try:
+            image = asyncio.run(renderer.render(TREND, OPTIONS))
+        finally:
+            renderer.shutdown()
+        assert image.startswith(b"\x89PNG")
+        # Timed in this process, not in the pool worker
+        assert STAGE_LATENCY.count("chart_render") == before + 1
+
+
+class TestTrendChartFormats:
+    """Tests for GET /risk-score/{business_id}/trend.{png,svg} options and caching headers"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_renderer(self, monkeypatch):
+        monkeypatch.setattr(main, "chart_renderer", ChartRenderer(ChartCache(max_bytes=10 * 1024 * 1024), workers=0))
+
+    def test_svg(self):
+        response = client.get("/risk-score/biz_healthy/trend.svg", headers=auth_headers())
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/svg+xml"
+        assert b"<svg" in response.content
+
+    def test_svg_is_deterministic(self):
+        first = client.get("/risk-score/biz_healthy/trend.svg", headers=auth_headers())
+        main.chart_renderer.cache.clear()
+        second = client.get("/risk-score/biz_healthy/trend.svg", headers=auth_headers())
+        assert first.content == second.content
+
+    def test_size_and_dpi_change_image(self):
+        small = client.get("/risk-score/biz_healthy/trend.png?width=4&height=2&dpi=50", headers=auth_headers())
+        large = client.get("/risk-score/biz_healthy/trend.png?width=4&height=2&dpi=150", headers=auth_headers())
+        assert small.status_code == large.status_code == 200
+        assert small.headers["etag"] != large.headers["etag"]
+        assert len(small.content) < len(large.content)
+
+    @pytest.mark.parametrize("query", ["width=1", "width=20", "height=0.5", "dpi=10", "dpi=600"])
+    def test_out_of_range_options_400(self, query):
+        response = client.get(f"/risk-score/biz_healthy/trend.png?{query}", headers=auth_headers())
+        assert response.status_code == 400
+
+    def test_unknown_format_404(self):
+        assert client.get("/risk-score/biz_healthy/trend.gif", headers=auth_headers()).status_code == 404
+
+    def test_caching_headers_and_revalidation(self):
+        response = client.get("/risk-score/biz_healthy/trend.png", headers=auth_headers())
+        etag = response.headers["etag"]
+        assert response.headers["cache-control"].startswith("private, max-age=")
+        assert int(response.headers["cache-control"].split("=")[1]) <= main.CACHE_TTL_MINUTES * 60
+
+        revalidated = client.get(
+            "/risk-score/biz_healthy/trend.png",
+            headers={**auth_headers(), "If-None-Match": etag}
+        )
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+
+    def test_etag_covers_options(self):
+        png = client.get("/risk-score/biz_healthy/trend.png", headers=auth_headers())
+        svg = client.get("/risk-score/biz_healthy/trend.svg", headers={**auth_headers(), "If-None-Match": png.headers["etag"]})
+        assert svg.status_code == 200
@@ -0,0 +1,40 @@
+"""
+test_lazy_imports.py
+
+Tests for deferred subsystem imports and the background warm-up.
+"""
+
+import sys
+
+import pytest
+
+from lazy_imports import LazyModule, warm_up, _lazy_modules
+
+
+@pytest.fixture
+def unloaded_module(monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    module = LazyModule("colorsys")
+    yield module
+    _lazy_modules.remove(module)
+
+
+class TestLazyModule:
+    """Tests for import on first use"""
+
+    def test_imports_on_first_attribute_access(self, unloaded_module):
+        assert not unloaded_module.loaded
+        assert "colorsys" not in sys.modules
+
+        assert unloaded_module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+        assert unloaded_module.loaded
+        assert unloaded_module.load() is sys.modules["colorsys"]
+
+    def test_missing_attribute_raises(self, unloaded_module):
+        with pytest.raises(AttributeError):
+            unloaded_module.no_such_function
+
+    def test_warm_up_loads_registered_modules(self, unloaded_module):
+        warm_up().join(timeout=30)
+        assert unloaded_module.loaded
+
@@ -0,0 +1,52 @@
+"""
+test_loadtest.py
+
+Tests for the end-to-end load-testing harness.
+"""
+
+import asyncio
+
+import pytest
+
+from benchmarks.loadtest import parse_mix, run_load, run_server
+
+
+class TestMix:
+    """Tests for endpoint mix parsing"""
+
+    def test_weights_are_normalized(self):
+        mix = parse_mix("score=3,businesses=1")
+        assert mix == {"score": 0.75, "businesses": 0.25}
+
+    def test_zero_weight_endpoints_dropped(self):
+        assert parse_mix("score=1,pdf=0") == {"score": 1.0}
+
+    def test_unknown_endpoint_rejected(self):
+        with pytest.raises(ValueError):
+            parse_mix("score=1,delete=1")
+
+
+class TestLoadRun:
+    """Short load runs against a real uvicorn process"""
+
+    def test_closed_and_open_loop(self):
+        mix = parse_mix("token=1,score=8,businesses=1")
+        with run_server() as base_url:
+            closed = asyncio.run(run_load(base_url, mix, duration=0.5, concurrency=4, warm=True))
+            opened = asyncio.run(run_load(base_url, mix, duration=0.5, rps=40))
+
+        assert closed["overall"]["requests"] > 0
+        assert closed["overall"]["error_rate"] == 0.0
+        assert set(closed["endpoints"]) <= {"token", "score", "businesses"}
+
+        assert opened["overall"]["requests"] == 20
+        assert opened["overall"]["error_rate"] == 0.0
+        assert opened["overall"]["latency_ms"]["p50"] > 0
+
+    def test_warm_up_uses_a_working_set(self):
+        mix = parse_mix("score=1")
+        with run_server() as base_url:
+            summary = asyncio.run(run_load(base_url, mix, duration=0.3, concurrency=2, warm=True, working_set=2))
+
+        assert summary["businesses"] == 2
+        assert summary["overall"]["error_rate"] == 0.0
@@ -0,0 +1,69 @@
+"""
+test_loop_monitor.py
+
+Tests for the event loop lag monitor and its admin endpoint.
+"""
+
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from loop_monitor import LoopLagMonitor, percentile
+from security import create_access_token, ADMIN_SCOPE
+
+
+def blocking_call():
+    time.sleep(0.3)
+
+
+class TestLoopLagMonitor:
+    """Tests for lag measurement and blocking stack capture"""
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        assert percentile(values, 0.5) == 50.0
+        assert percentile(values, 0.99) == 99.0
+        assert percentile([], 0.5) == 0.0
+
+    def test_blocking_call_is_captured(self):
+        monitor = LoopLagMonitor(interval=0.02, threshold=0.05)
+
+        async def scenario():
+            monitor.start()
+            await asyncio.sleep(0.1)
+            blocking_call()
+            await asyncio.sleep(0.1)
+            monitor.stop()
+
+        asyncio.run(scenario())
+
+        summary = monitor.summary()
+        assert summary["samples"] > 0
+        assert summary["lag_seconds"]["max"] >= 0.2
+        assert summary["blocking_events"]
+        assert any("blocking_call" in line for line in summary["blocking_events"][0]["stack"])
+
+
+class TestEventLoopEndpoint:
+    """Tests for GET /admin/event-loop"""
+
+    def test_requires_admin_scope(self):
+        token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores"]})
+        response = TestClient(main.app).get(
+            "/admin/event-loop", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 403
+
+    def test_running_under_lifespan(self):
+        token = create_access_token(data={"sub": "test_client", "scopes": [ADMIN_SCOPE]})
+        with TestClient(main.app) as client:
+            time.sleep(0.3)
+            response = client.get("/admin/event-loop", headers={"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["running"] is True
+        assert data["samples"] > 0
+        assert set(data["lag_seconds"]) == {"p50", "p90", "p99", "max"}
@@ -0,0 +1,78 @@
+"""
+test_memory_diagnostics.py
+
+Tests for tracemalloc-based memory diagnostics and the admin endpoints.
+"""
+
+from fastapi.testclient import TestClient
+
+import main
+from memory_diagnostics import MemoryDiagnostics, approximate_size
+from security import create_access_token, ADMIN_SCOPE
+
+
+class TestMemoryDiagnostics:
+    """Tests for structure sizing and snapshot diffs"""
+
+    def test_approximate_size_grows_with_contents(self):
+        small = {"a": b"x" * 10}
+        large = {"a": b"x" * 10_000}
+        assert approximate_size(large) > approximate_size(small) + 9_000
+
+    def test_structure_sizes(self):
+        diagnostics = MemoryDiagnostics()
+        cache = {"biz": {"score": 1.0}}
+        diagnostics.register_structure("cache", lambda: cache)
+
+        sizes = diagnostics.structure_sizes()
+        assert sizes["cache"]["entries"] == 1
+        assert sizes["cache"]["approx_bytes"] > 0
+
+    def test_disabled_report_has_no_tracemalloc_data(self):
+        report = MemoryDiagnostics().report()
+        assert report["tracing"] is False
+        assert "top_allocations" not in report
+
+    def test_growth_since_baseline(self):
+        diagnostics = MemoryDiagnostics()
+        diagnostics.start()
+        try:
+            retained = [bytearray(1024) for _ in range(2000)]
+            report = diagnostics.report(top=5)
+        finally:
+            diagnostics.stop()
+
+        assert report["tracing"] is True
+        assert report["top_allocations"]
+        growth = report["growth_since_baseline"][0]
+        assert "test_memory_diagnostics.py:" in growth["location"]
+        assert growth["size_diff_bytes"] >= 2000 * 1024
+        assert len(retained) == 2000
+
+
+class TestMemoryEndpoints:
+    """Tests for /admin/memory endpoints"""
+
+    def setup_method(self):
+        token = create_access_token(data={"sub": "test_client", "scopes": [ADMIN_SCOPE]})
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.client = TestClient(main.app)
+
+    def test_report_lists_cache_structures(self):
+        response = self.client.get("/admin/memory", headers=self.headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["rss_bytes"] > 0
+        assert "score_cache" in data["structures"]
+        assert "score_change_log" in data["structures"]
+
+    def test_tracing_switch(self):
+        try:
+            started = self.client.post("/admin/memory/tracing?enabled=true", headers=self.headers)
+            assert started.json() == {"tracing": True}
+            report = self.client.get("/admin/memory?top=3", headers=self.headers).json()
+            assert len(report["top_allocations"]) <= 3
+            assert "growth_since_baseline" in report
+        finally:
+            stopped = self.client.post("/admin/memory/tracing?enabled=false", headers=self.headers)
+        assert stopped.json() == {"tracing": False}
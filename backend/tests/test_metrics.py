@@ -0,0 +1,91 @@
+"""
+test_metrics.py
+
+Tests for the Prometheus-style metrics registry and /metrics endpoint.
+"""
+
+from fastapi.testclient import TestClient
+
+import main
+from metrics import MetricsRegistry, time_stage, STAGE_LATENCY, CACHE_EVENTS
+from security import create_access_token
+
+client = TestClient(main.app)
+
+
+def auth_headers():
+    token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores"]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestRegistry:
+    """Tests for counter and histogram rendering"""
+
+    def test_counter_render(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("things_total", "Things.", ("kind",))
+        counter.inc("a")
+        counter.inc("a", amount=2)
+
+        assert 'things_total{kind="a"} 3' in registry.render()
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert "latency_seconds_count 4" in text
+
+    def test_time_stage_records_observation(self):
+        before = STAGE_LATENCY.count("unit_test_stage")
+        with time_stage("unit_test_stage"):
+            pass
+        assert STAGE_LATENCY.count("unit_test_stage") == before + 1
+
+
+class TestMetricsEndpoint:
+    """Tests for GET /metrics"""
+
+    def test_request_and_stage_metrics_exposed(self):
+        main.clear_score_cache()
+        client.get("/risk-score/biz_healthy", headers=auth_headers())
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+        text = response.text
+        assert (
+            'offo_http_requests_total{method="GET",route="/risk-score/{business_id}",status="200"}'
+            in text
+        )
+        for stage in ("metrics_fetch", "compute_score", "trend_30d", "drivers", "recommended_actions"):
+            assert f'offo_stage_duration_seconds_count{{stage="{stage}"}}' in text
+        assert "offo_process_resident_memory_bytes" in text
+        assert "offo_score_cache_entries" in text
+
+    def test_cache_hit_and_miss_counted(self):
+        main.clear_score_cache()
+        misses, hits = CACHE_EVENTS.value("miss"), CACHE_EVENTS.value("hit")
+
+        client.get("/risk-score/biz_mixed", headers=auth_headers())
+        client.get("/risk-score/biz_mixed", headers=auth_headers())
+
+        assert CACHE_EVENTS.value("miss") == misses + 1
+        assert CACHE_EVENTS.value("hit") == hits + 1
+
+    def test_eviction_counted(self, monkeypatch):
+        main.clear_score_cache()
+        monkeypatch.setattr(main, "CACHE_MAX_ENTRIES", 2)
+        evictions = CACHE_EVENTS.value("eviction")
+
+        for business_id in ("biz_healthy", "biz_mixed", "biz_risky"):
+            client.get(f"/risk-score/{business_id}", headers=auth_headers())
+
+        assert CACHE_EVENTS.value("eviction") == evictions + 1
+        assert list(main._score_cache) == ["biz_mixed", "biz_risky"]
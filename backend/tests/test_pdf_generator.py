@@ -0,0 +1,77 @@
+"""
+test_pdf_generator.py
+
+Tests for PDF report rendering and chunked streaming.
+"""
+
+import io
+import os
+import tempfile
+
+import pytest
+from PIL import Image as PILImage
+
+import pdf_generator
+from chart_cache import ChartCache
+from main import PDF_REPORT_FIELDS, build_risk_score_data
+from pdf_generator import generate_risk_report_pdf, get_logo_png, iter_file_chunks
+
+
+@pytest.fixture
+def report_data():
+    return build_risk_score_data("biz_mixed", PDF_REPORT_FIELDS)
+
+
+class TestGenerateRiskReportPdf:
+    """Tests for spooled PDF output"""
+
+    def test_returns_spooled_file_at_start(self, report_data):
+        with generate_risk_report_pdf(report_data) as pdf_file:
+            assert isinstance(pdf_file, tempfile.SpooledTemporaryFile)
+            assert not pdf_file._rolled
+            assert pdf_file.read(5) == b"%PDF-"
+
+    def test_rolls_to_disk_past_threshold(self, report_data, monkeypatch):
+        monkeypatch.setattr(pdf_generator, "SPOOL_MAX_BYTES", 1024)
+        with generate_risk_report_pdf(report_data) as pdf_file:
+            assert pdf_file._rolled
+            assert pdf_file.read(5) == b"%PDF-"
+
+    def test_chart_rendered_once_per_trend(self, report_data, monkeypatch):
+        renders = []
+        original = pdf_generator.create_trend_chart
+
+        def counting_create_trend_chart(*args, **kwargs):
+            renders.append(1)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(pdf_generator, "create_trend_chart", counting_create_trend_chart)
+        monkeypatch.setattr(pdf_generator, "chart_cache", ChartCache(max_bytes=10 * 1024 * 1024))
+        generate_risk_report_pdf(report_data).close()
+        generate_risk_report_pdf(report_data).close()
+        assert len(renders) == 1
+
+    def test_logo_resampled_to_print_size(self):
+        logo_png = get_logo_png()
+        if logo_png is None:
+            pytest.skip("logo file not present")
+        with PILImage.open(io.BytesIO(logo_png)) as logo:
+            assert logo.size == (750, 240)
+        assert get_logo_png() is logo_png
+
+
+class TestIterFileChunks:
+    """Tests for chunked streaming of spooled files"""
+
+    def test_chunks_and_closes(self):
+        source = io.BytesIO(os.urandom(10_000))
+        chunks = list(iter_file_chunks(source, chunk_size=4096))
+        assert [len(chunk) for chunk in chunks] == [4096, 4096, 1808]
+        assert source.closed
+
+    def test_closes_when_abandoned(self):
+        source = io.BytesIO(b"x" * 100)
+        stream = iter_file_chunks(source, chunk_size=10)
+        next(stream)
+        stream.close()
+        assert source.closed
@@ -0,0 +1,150 @@
+"""
+test_portfolio_report.py
+
+Tests for the consolidated portfolio PDF report.
+"""
+
+import math
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate
+
+import data_layer
+import main
+import portfolio_report
+from portfolio_report import (
+    _FlowableStream,
+    _table_rows_per_page,
+    generate_portfolio_report_pdf,
+    portfolio_rows,
+    summarize_portfolio,
+)
+from security import create_access_token
+from synthetic_portfolio import generate_portfolio
+
+
+client = TestClient(main.app)
+
+PAGE_PATTERN = re.compile(rb"/Type /Page\b(?!s)")
+
+
+def auth_headers():
+    token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores", "read:reports"]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def page_count(pdf: bytes) -> int:
+    return len(PAGE_PATTERN.findall(pdf))
+
+
+@pytest.fixture
+def registered_portfolio():
+    portfolio = generate_portfolio(300, seed=9)
+    data_layer.register_portfolio(portfolio)
+    yield portfolio
+    data_layer.register_portfolio(None)
+
+
+class TestRowsAndSummary:
+    """Tests for row production and aggregation"""
+
+    def test_rows_skip_unknown_businesses(self):
+        rows = list(portfolio_rows(["biz_excellent", "missing", "biz_critical"]))
+        assert [row[0] for row in rows] == ["biz_excellent", "biz_critical"]
+        assert rows[0][1:3] == ("Healthcare Services", "Seattle, WA")
+        assert rows[1][4] == "HIGH"
+
+    def test_summary(self):
+        summary = summarize_portfolio([
+            ("a", "Retail", "X", 90.0, "LOW"),
+            ("b", "Retail", "X", 60.0, "MODERATE"),
+            ("c", "Mining", "Y", 30.0, "HIGH"),
+            ("d", "Mining", "Y", 40.0, "HIGH"),
+        ])
+        assert summary["total"] == 4
+        assert summary["average_score"] == 55.0
+        assert summary["categories"]["HIGH"] == {
+            "count": 2, "share": 0.5, "average_score": 35.0, "min_score": 30.0, "max_score": 40.0,
+        }
+        assert summary["industries"] == {
+            "Mining": {"LOW": 0, "MODERATE": 0, "HIGH": 2},
+            "Retail": {"LOW": 1, "MODERATE": 1, "HIGH": 0},
+        }
+
+    def test_empty_summary(self):
+        summary = summarize_portfolio([])
+        assert summary["total"] == 0
+        assert summary["categories"]["LOW"]["average_score"] is None
+
+
+class TestFlowableStream:
+    """Tests for the lazily refilled story list"""
+
+    def test_pulls_only_when_empty(self):
+        pulled = []
+
+        def source():
+            for item in range(3):
+                pulled.append(item)
+                yield item
+
+        stream = _FlowableStream(source())
+        assert len(stream) == 1 and pulled == [0]
+        assert len(stream) == 1 and pulled == [0]
+        del stream[0]
+        assert len(stream) == 1 and stream[0] == 1 and pulled == [0, 1]
+        del stream[0]
+        assert len(stream) == 1 and stream[0] == 2
+        del stream[0]
+        assert len(stream) == 0
+
+
+class TestGeneratePortfolioReport:
+    """Tests for PDF generation"""
+
+    def test_one_page_per_table_chunk(self, registered_portfolio):
+        ids = registered_portfolio.business_ids()
+        with generate_portfolio_report_pdf(lambda: portfolio_rows(ids)) as pdf_file:
+            pdf = pdf_file.read()
+
+        rows_per_page = _table_rows_per_page(SimpleDocTemplate(None, pagesize=letter, topMargin=54, bottomMargin=54))
+        assert pdf.startswith(b"%PDF")
+        assert page_count(pdf) == 1 + math.ceil(len(ids) / rows_per_page)
+
+    def test_spools_to_disk_past_limit(self, registered_portfolio, monkeypatch):
+        monkeypatch.setattr(portfolio_report, "SPOOL_MAX_BYTES", 1024)
+        ids = registered_portfolio.business_ids()
+        with generate_portfolio_report_pdf(lambda: portfolio_rows(ids)) as pdf_file:
+            assert pdf_file._rolled
+            assert pdf_file.read(4) == b"%PDF"
+
+    def test_empty_portfolio_has_summary_only(self):
+        with generate_portfolio_report_pdf(lambda: iter(())) as pdf_file:
+            assert page_count(pdf_file.read()) == 1
+
+
+class TestPortfolioReportEndpoint:
+    """Tests for GET /reports/portfolio/pdf"""
+
+    def test_requires_auth(self):
+        assert client.get("/reports/portfolio/pdf").status_code in (401, 403)
+
+    def test_streams_pdf(self):
+        response = client.get("/reports/portfolio/pdf", headers=auth_headers())
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/pdf"
+        assert "attachment" in response.headers["content-disposition"]
+        assert int(response.headers["content-length"]) == len(response.content)
+        assert response.content.startswith(b"%PDF")
+
+    def test_no_match_404(self):
+        response = client.get("/reports/portfolio/pdf?industry=Nonexistent", headers=auth_headers())
+        assert response.status_code == 404
+
+    def test_too_many_businesses_400(self, monkeypatch):
+        monkeypatch.setattr(main, "MAX_PORTFOLIO_REPORT_BUSINESSES", 2)
+        response = client.get("/reports/portfolio/pdf", headers=auth_headers())
+        assert response.status_code == 400
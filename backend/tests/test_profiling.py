@@ -0,0 +1,126 @@
+"""
+test_profiling.py
+
+Tests for admin-only per-request profiling (?profile=1).
+"""
+
+import asyncio
+import json
+import marshal
+
+from fastapi.testclient import TestClient
+
+import main
+from profiling import ProfilingMiddleware
+from security import create_access_token, ADMIN_SCOPE
+
+client = TestClient(main.app)
+
+
+def headers_with_scopes(*scopes):
+    token = create_access_token(data={"sub": "test_client", "scopes": list(scopes)})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestProfiling:
+    """Tests for ProfilingMiddleware"""
+
+    def setup_method(self):
+        main.clear_score_cache()
+
+    def test_text_summary_for_admin(self):
+        response = client.get(
+            "/risk-score/biz_mixed?profile=1&profile_top=500",
+            headers=headers_with_scopes("read:scores", ADMIN_SCOPE)
+        )
+        assert response.status_code == 200
+        assert response.headers["x-profiled-status"] == "200"
+        assert "function calls" in response.text
+        assert "(compute_offo_risk_score)" in response.text
+
+    def test_pstats_download(self):
+        response = client.get(
+            "/risk-score/biz_mixed?profile=1&profile_format=pstats",
+            headers=headers_with_scopes("read:scores", ADMIN_SCOPE)
+        )
+        assert response.headers["content-disposition"].endswith(".pstats")
+        stats = marshal.loads(response.content)
+        assert any(name == "build_risk_score_data" for (_, _, name) in stats)
+
+    def test_collapsed_stacks(self):
+        response = client.get(
+            "/risk-score/biz_mixed?profile=1&profile_format=collapsed",
+            headers=headers_with_scopes("read:scores", ADMIN_SCOPE)
+        )
+        lines = response.text.strip().splitlines()
+        assert lines
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("build_risk_score_data" in line for line in lines)
+
+    def test_non_admin_forbidden(self):
+        response = client.get(
+            "/risk-score/biz_mixed?profile=1",
+            headers=headers_with_scopes("read:scores")
+        )
+        assert response.status_code == 403
+
+    def test_unauthenticated_rejected(self):
+        response = client.get("/businesses?profile=1")
+        assert response.status_code == 401
+
+    def test_profile_off_passes_through(self):
+        response = client.get(
+            "/risk-score/biz_mixed?profile=0",
+            headers=headers_with_scopes("read:scores")
+        )
+        assert response.status_code == 200
+        assert response.json()["business_id"] == "biz_mixed"
+
+    def test_options_ignored_without_profile(self):
+        response = client.get(
+            "/risk-score/biz_mixed?profile=0&profile_format=bogus&profile_sort=bogus",
+            headers=headers_with_scopes("read:scores")
+        )
+        assert response.status_code == 200
+
+    def test_invalid_option_is_a_json_error(self):
+        response = client.get(
+            "/risk-score/biz_mixed?profile=1&profile_format=bogus",
+            headers=headers_with_scopes("read:scores", ADMIN_SCOPE)
+        )
+        assert response.status_code == 400
+        assert "profile_format" in json.loads(response.content)["detail"]
+
+    def test_one_profile_at_a_time(self):
+        release = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        middleware = ProfilingMiddleware(slow_app)
+        authorization = headers_with_scopes(ADMIN_SCOPE)["Authorization"].encode()
+        scope = {
+            "type": "http", "path": "/", "query_string": b"profile=1",
+            "headers": [(b"authorization", authorization)],
+        }
+
+        async def request():
+            statuses = []
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            await middleware(scope, None, send)
+            return statuses[0]
+
+        async def scenario():
+            first = asyncio.create_task(request())
+            await asyncio.sleep(0)
+            second = await request()
+            release.set()
+            return await first, second
+
+        assert asyncio.run(scenario()) == (200, 409)
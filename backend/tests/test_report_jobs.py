@@ -0,0 +1,191 @@
+"""
+test_report_jobs.py
+
+Tests for bulk PDF export jobs.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from report_jobs import JOB_COMPLETED, JOB_FAILED, ReportJobManager, select_businesses
+from security import create_access_token
+
+
+client = TestClient(app)
+
+
+def auth_headers(client_id="test_client"):
+    token = create_access_token(data={"sub": client_id, "scopes": ["read:scores", "read:reports"]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def fake_render(business_id):
+    if business_id == "broken":
+        raise RuntimeError("render failed")
+    if business_id.startswith("biz_"):
+        return b"%PDF-" + business_id.encode()
+    return None
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def wait_for(job, timeout=30):
+    deadline = time.time() + timeout
+    while not job.done:
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ReportJobManager(fake_render, workers=2, directory=str(tmp_path))
+    manager._pool = ThreadPoolExecutor(2)
+    yield manager
+    manager.shutdown()
+
+
+class TestSelectBusinesses:
+    """Tests for filter-based job selection"""
+
+    def test_no_filters_selects_all(self):
+        assert len(select_businesses()) == 5
+
+    def test_location_matches_state_and_city(self):
+        assert select_businesses(location="WA") == ["biz_excellent"]
+        assert select_businesses(location="seattle") == ["biz_excellent"]
+
+    def test_category_filter(self):
+        assert select_businesses(category="high") == ["biz_critical"]
+
+    def test_limit_reports_overflow(self):
+        assert len(select_businesses(limit=2)) == 3
+
+
+class TestReportJobManager:
+    """Tests for job execution and lifecycle"""
+
+    def test_archive_contains_pdfs_and_failures(self, manager):
+        job = manager.create(["biz_healthy", "biz_mixed", "unknown", "broken"], "owner")
+        wait_for(job)
+
+        assert job.status == JOB_COMPLETED
+        assert job.to_dict()["progress"] == 1.0
+        with zipfile.ZipFile(job.path) as archive:
+            assert archive.namelist() == ["biz_healthy.pdf", "biz_mixed.pdf", "failures.json"]
+            assert archive.read("biz_mixed.pdf") == b"%PDF-biz_mixed"
+            failures = json.loads(archive.read("failures.json"))
+        assert failures == [
+            {"business_id": "unknown", "error": "Business ID not found"},
+            {"business_id": "broken", "error": "render failed"},
+        ]
+
+    def test_jobs_scoped_to_owner(self, manager):
+        job = manager.create(["biz_healthy"], "owner")
+        assert manager.get(job.job_id, "owner") is job
+        assert manager.get(job.job_id, "someone_else") is None
+
+    def test_expired_jobs_purged(self, manager, tmp_path):
+        job = manager.create(["biz_healthy"], "owner")
+        wait_for(job)
+        assert (tmp_path / f"{job.job_id}.zip").exists()
+
+        job.finished_at = datetime.now() - timedelta(days=1)
+        manager.purge_expired()
+
+        assert manager.get(job.job_id, "owner") is None
+        assert not (tmp_path / f"{job.job_id}.zip").exists()
+
+    def test_jobs_visible_to_workers_sharing_the_directory(self, manager, tmp_path):
+        other_worker = ReportJobManager(fake_render, directory=str(tmp_path))
+        job = manager.create(["biz_healthy", "unknown"], "owner")
+        wait_for(job)
+
+        seen = other_worker.get(job.job_id, "owner")
+        assert seen is not None and seen is not job
+        assert seen.to_dict() == job.to_dict()
+        assert seen.path == job.path
+        assert other_worker.get(job.job_id, "someone_else") is None
+        assert other_worker.get("../" + job.job_id, "owner") is None
+
+    def test_expired_jobs_purged_by_any_worker(self, manager, tmp_path):
+        other_worker = ReportJobManager(fake_render, directory=str(tmp_path))
+        job = manager.create(["biz_healthy"], "owner")
+        wait_for(job)
+        state = json.loads((tmp_path / f"{job.job_id}.json").read_text())
+        state["finished_at"] = (datetime.now() - timedelta(days=1)).isoformat()
+        (tmp_path / f"{job.job_id}.json").write_text(json.dumps(state))
+
+        other_worker.purge_expired()
+
+        assert os.listdir(tmp_path) == []
+
+    def test_job_of_a_dead_worker_failed(self, manager, tmp_path):
+        job = manager.create(["biz_healthy"], "owner")
+        wait_for(job)
+        state = json.loads((tmp_path / f"{job.job_id}.json").read_text())
+        state.update(status="running", finished_at=None, pid=dead_pid())
+        (tmp_path / f"{job.job_id}.json").write_text(json.dumps(state))
+
+        seen = ReportJobManager(fake_render, directory=str(tmp_path)).get(job.job_id, "owner")
+
+        assert seen.status == JOB_FAILED
+        assert "exited" in seen.error
+        assert seen.expires_at is not None
+
+
+class TestReportJobEndpoints:
+    """Tests for the /reports/jobs API"""
+
+    def test_requires_auth(self):
+        assert client.post("/reports/jobs", json={"business_ids": ["biz_healthy"]}).status_code in (401, 403)
+
+    def test_empty_selection_rejected(self):
+        response = client.post("/reports/jobs", json={"industry": "Nonexistent"}, headers=auth_headers())
+        assert response.status_code == 400
+
+    def test_job_round_trip(self):
+        headers = auth_headers()
+        response = client.post("/reports/jobs", json={"business_ids": ["biz_healthy", "missing_biz"]}, headers=headers)
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        other = auth_headers("other_client")
+        assert client.get(f"/reports/jobs/{job_id}", headers=other).status_code == 404
+
+        deadline = time.time() + 120
+        while True:
+            status = client.get(f"/reports/jobs/{job_id}", headers=headers).json()
+            if status["status"] in (JOB_COMPLETED, JOB_FAILED):
+                break
+            assert client.get(f"/reports/jobs/{job_id}/download", headers=headers).status_code == 409
+            assert time.time() < deadline
+            time.sleep(0.2)
+
+        assert status["status"] == JOB_COMPLETED
+        assert status["completed"] == 1
+        assert status["failures"] == [{"business_id": "missing_biz", "error": "Business ID not found"}]
+
+        download = client.get(status["download_url"], headers=headers)
+        assert download.status_code == 200
+        assert download.headers["content-type"] == "application/zip"
+        with zipfile.ZipFile(io.BytesIO(download.content)) as archive:
+            assert archive.namelist() == ["biz_healthy.pdf", "failures.json"]
+            assert archive.read("biz_healthy.pdf").startswith(b"%PDF")
+
+    def test_unknown_job_404(self):
+        assert client.get("/reports/jobs/nope", headers=auth_headers()).status_code == 404
@@ -0,0 +1,117 @@
+"""
+test_sampling_profiler.py
+
+Tests for the background sampling profiler and its admin endpoints.
+"""
+
+import threading
+import time
+from collections import Counter
+
+from fastapi.testclient import TestClient
+
+import main
+from sampling_profiler import SamplingProfiler
+from security import create_access_token, ADMIN_SCOPE
+
+
+def busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    """Tests for stack sampling and collapsed output"""
+
+    def test_busy_thread_is_sampled(self):
+        profiler = SamplingProfiler(rate_hz=200)
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_worker, args=(stop,), name="busy")
+        worker.start()
+        try:
+            profiler.start()
+            time.sleep(0.3)
+            profiler.stop()
+        finally:
+            stop.set()
+            worker.join()
+
+        collapsed = profiler.collapsed(minutes=1)
+        busy_lines = [line for line in collapsed.splitlines() if line.startswith("busy;")]
+        assert busy_lines
+        assert all("busy_worker" in line for line in busy_lines)
+        assert profiler.status()["samples"] > 0
+        assert 0 < profiler.overhead_ratio() < 0.5
+
+    def test_idle_threads_are_skipped(self):
+        profiler = SamplingProfiler()
+        parked = threading.Event()
+        waiter = threading.Thread(target=parked.wait, name="parked")
+        waiter.start()
+        try:
+            time.sleep(0.05)
+            profiler.sample()
+        finally:
+            parked.set()
+            waiter.join()
+
+        assert "parked;" not in profiler.collapsed(minutes=1)
+
+    def test_collapsed_while_sampling_new_stacks(self):
+        profiler = SamplingProfiler(rate_hz=2000)
+        # An older minute makes the merge iterate the current bucket in Python,
+        # and a large current bucket keeps it iterating across thread switches
+        minute = int(time.time() // 60)
+        profiler._buckets.append((minute - 1, Counter({"earlier": 1})))
+        profiler._buckets.append((minute, Counter({f"earlier;frame_{i}": 1 for i in range(100_000)})))
+        done = threading.Event()
+
+        def busy_worker():
+            renames = 0
+            while not done.is_set():
+                # A new thread name makes every sampled stack a new key
+                threading.current_thread().name = f"busy-{renames}"
+                renames += 1
+
+        workers = [threading.Thread(target=busy_worker) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        profiler.start()
+        try:
+            deadline = time.monotonic() + 2.0
+            while time.monotonic() < deadline:
+                profiler.collapsed(minutes=2)
+        finally:
+            done.set()
+            profiler.stop()
+            for worker in workers:
+                worker.join()
+
+        assert "busy-" in profiler.collapsed(minutes=1)
+
+
+class TestProfilerEndpoints:
+    """Tests for /admin/profiler endpoints"""
+
+    def setup_method(self):
+        token = create_access_token(data={"sub": "test_client", "scopes": [ADMIN_SCOPE]})
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.client = TestClient(main.app)
+
+    def test_start_download_stop(self):
+        started = self.client.post("/admin/profiler?enabled=true&rate_hz=200", headers=self.headers)
+        assert started.json()["running"] is True
+
+        time.sleep(0.2)
+        flamegraph = self.client.get("/admin/profiler/flamegraph?minutes=1", headers=self.headers)
+        assert flamegraph.status_code == 200
+        assert flamegraph.headers["content-disposition"].endswith(".collapsed")
+
+        stopped = self.client.post("/admin/profiler?enabled=false", headers=self.headers)
+        assert stopped.json()["running"] is False
+        assert stopped.json()["samples"] > 0
+
+    def test_requires_admin(self):
+        token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores"]})
+        response = self.client.get("/admin/profiler", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 403
@@ -0,0 +1,246 @@
+"""
+test_score_events.py
+
+Tests for score versioning, change fan-out, the /risk-score/stream SSE
+endpoint and /risk-score/changes delta polling.
+"""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from score_events import ScoreBroadcaster, ScoreChangeLog, format_event, MAX_STREAM_IDS
+from security import create_access_token
+from serialization import dumps
+
+
+def score_payload(score=72.5, category="MODERATE", driver_impact="neutral"):
+    return {
+        "business_id": "biz_mixed",
+        "overall_score": score,
+        "category": category,
+        "drivers": [{"label": "Training", "impact": driver_impact, "description": "..."}],
+    }
+
+
+class TestScoreChangeLog:
+    """Tests for change detection, versions and bounded retention"""
+
+    def record(self, log, business_id, data):
+        version, changed = log.record(business_id, data)
+        if changed:
+            log.attach_body(business_id, version, dumps(data))
+        return version, changed
+
+    def test_only_changes_get_new_versions(self):
+        log = ScoreChangeLog()
+        data = score_payload()
+
+        assert self.record(log, "biz_mixed", data) == (1, True)
+        assert self.record(log, "biz_mixed", data) == (1, False)
+        assert self.record(log, "biz_mixed", score_payload(driver_impact="negative")) == (2, True)
+        assert log.version_of("biz_mixed") == 2
+
+    def test_changes_since_returns_latest_per_business(self):
+        log = ScoreChangeLog()
+        self.record(log, "biz_a", score_payload(score=10.0))
+        self.record(log, "biz_b", score_payload(score=20.0))
+        self.record(log, "biz_a", score_payload(score=30.0))
+
+        changes = log.changes_since(0, limit=100)
+        assert [(version, business_id) for version, business_id, _ in changes] == [
+            (2, "biz_b"), (3, "biz_a")
+        ]
+        assert log.changes_since(2, limit=100)[0][:2] == (3, "biz_a")
+        assert log.changes_since(3, limit=100) == []
+
+    def test_versions_outside_retention_return_retained_changes(self):
+        log = ScoreChangeLog(retention=2)
+        for i in range(4):
+            self.record(log, f"biz_{i}", score_payload(score=float(i)))
+
+        assert not log.covers(1)
+        assert [c[0] for c in log.changes_since(1, limit=100)] == [3, 4]
+        assert log.covers(2)
+        assert [c[0] for c in log.changes_since(2, limit=100)] == [3, 4]
+        assert log.changes_since(99, limit=100) is None
+
+    def test_restore_seeds_the_log(self):
+        log = ScoreChangeLog()
+        log.restore(7, [])
+        assert log.changes_since(0, limit=10) == []
+
+        log.restore(9, [("biz_b", 6, score_payload(score=2.0), b"b"), ("biz_a", 4, score_payload(score=1.0), b"a")])
+        assert log.latest_version == 9
+        assert log.changes_since(0, limit=10) == [(4, "biz_a", b"a"), (6, "biz_b", b"b")]
+        assert log.covers(3) and not log.covers(0)
+
+    def test_full_resync_after_the_log_wraps(self):
+        log = ScoreChangeLog(retention=3)
+        for i in range(5):
+            self.record(log, f"biz_{i}", score_payload(score=float(i)))
+
+        assert not log.covers(0)
+        assert [c[:2] for c in log.changes_since(0, limit=10)] == [(3, "biz_2"), (4, "biz_3"), (5, "biz_4")]
+
+
+class TestScoreBroadcaster:
+    """Tests for fan-out and per-subscription coalescing"""
+
+    def test_events_reach_only_watchers(self):
+        async def scenario():
+            broadcaster = ScoreBroadcaster()
+            watcher = broadcaster.subscribe(["biz_mixed"])
+            other = broadcaster.subscribe(["biz_healthy"])
+
+            body = dumps(score_payload())
+            broadcaster.publish("biz_mixed", body, 7)
+
+            assert await watcher.next_events(timeout=0.1) == [format_event("score", body, "7")]
+            assert await other.next_events(timeout=0.01) == []
+
+        asyncio.run(scenario())
+
+    def test_slow_subscriber_keeps_latest_event_only(self):
+        async def scenario():
+            broadcaster = ScoreBroadcaster()
+            subscription = broadcaster.subscribe(["biz_mixed"])
+
+            for version, score in enumerate((60.0, 61.0, 62.0), 1):
+                broadcaster.publish("biz_mixed", dumps(score_payload(score=score)), version)
+
+            events = await subscription.next_events(timeout=0.1)
+            assert events == [format_event("score", dumps(score_payload(score=62.0)), "3")]
+            assert subscription.coalesced == 2
+
+        asyncio.run(scenario())
+
+    def test_unsubscribe_forgets_unwatched_ids(self):
+        broadcaster = ScoreBroadcaster()
+        subscription = broadcaster.subscribe(["biz_mixed", "biz_risky"])
+        assert sorted(broadcaster.watched_ids()) == ["biz_mixed", "biz_risky"]
+
+        broadcaster.unsubscribe(subscription)
+        assert broadcaster.watched_ids() == []
+
+
+class TestStreamEndpoint:
+    """Tests for GET /risk-score/stream"""
+
+    def setup_method(self):
+        token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores"]})
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.client = TestClient(main.app)
+
+    def test_unknown_business_rejected(self):
+        response = self.client.get("/risk-score/stream?ids=biz_mixed,nope", headers=self.headers)
+        assert response.status_code == 404
+
+    def test_too_many_ids_rejected(self):
+        ids = ",".join(f"biz_{i}" for i in range(MAX_STREAM_IDS + 1))
+        response = self.client.get(f"/risk-score/stream?ids={ids}", headers=self.headers)
+        assert response.status_code == 400
+
+    def test_stream_sends_snapshot_then_changes(self):
+        main.clear_score_cache()
+
+        async def scenario():
+            disconnect = asyncio.Event()
+            chunks = []
+            requested = []
+
+            async def receive():
+                if not requested:
+                    requested.append(True)
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    assert message["status"] == 200
+                elif message.get("body"):
+                    chunks.append(message["body"])
+                    if len(chunks) == 1:
+                        changed = {**main.get_cached_score("biz_mixed"), "overall_score": 1.0}
+                        main.score_broadcaster.publish("biz_mixed", dumps(changed), 99)
+                    else:
+                        disconnect.set()
+
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": "/risk-score/stream",
+                "raw_path": b"/risk-score/stream",
+                "query_string": b"ids=biz_mixed",
+                "root_path": "",
+                "headers": [(b"authorization", self.headers["Authorization"].encode())],
+                "client": ("127.0.0.1", 50000),
+                "server": ("testserver", 80),
+            }
+            await asyncio.wait_for(main.app(scope, receive, send), timeout=5)
+            return chunks
+
+        chunks = asyncio.run(scenario())
+
+        assert chunks[0].startswith(b"event: score\nid: ")
+        assert b'"overall_score":1.0' in chunks[1]
+        assert main.score_broadcaster.watched_ids() == []
+
+
+class TestChangesEndpoint:
+    """Tests for GET /risk-score/changes"""
+
+    def setup_method(self):
+        token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores"]})
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.client = TestClient(main.app)
+
+    def test_scores_carry_versions_and_appear_in_changes(self):
+        main.clear_score_cache()
+        before = self.client.get("/risk-score/changes", headers=self.headers).json()["latest_version"]
+        scored = self.client.get("/risk-score/biz_healthy", headers=self.headers).json()
+        assert scored["version"] >= 1
+
+        delta = self.client.get(
+            f"/risk-score/changes?since={min(before, scored['version'] - 1)}", headers=self.headers
+        ).json()
+        assert delta["latest_version"] >= scored["version"]
+        assert scored["business_id"] in [change["business_id"] for change in delta["changes"]]
+
+    def test_recomputing_unchanged_score_keeps_version(self):
+        main.clear_score_cache()
+        first = self.client.get("/risk-score/biz_excellent", headers=self.headers).json()
+        main.clear_score_cache()
+        second = self.client.get("/risk-score/biz_excellent", headers=self.headers).json()
+        assert first["version"] == second["version"]
+
+        latest = self.client.get("/risk-score/changes", headers=self.headers).json()["latest_version"]
+        delta = self.client.get(f"/risk-score/changes?since={latest}", headers=self.headers).json()
+        assert delta["changes"] == []
+        assert delta["has_more"] is False
+
+    def test_future_version_needs_resync(self):
+        response = self.client.get("/risk-score/changes?since=999999999", headers=self.headers)
+        assert response.status_code == 410
+
+    def test_resync_after_the_log_wraps(self, monkeypatch):
+        monkeypatch.setattr(main, "score_changes", ScoreChangeLog(retention=2))
+        main.clear_score_cache()
+        for business_id in ["biz_healthy", "biz_risky", "biz_mixed"]:
+            self.client.get(f"/risk-score/{business_id}", headers=self.headers)
+
+        response = self.client.get("/risk-score/changes?since=0", headers=self.headers)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["truncated"] is True
+        assert [change["business_id"] for change in body["changes"]] == ["biz_risky", "biz_mixed"]
+        assert self.client.get(
+            f"/risk-score/changes?since={body['next_since']}", headers=self.headers
+        ).json()["truncated"] is False
+        main.clear_score_cache()
@@ -0,0 +1,146 @@
+"""
+test_score_warmup.py
+
+Tests for score cache warm-up and snapshots.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from score_events import ScoreChangeLog
+from score_warmup import hot_business_ids, load_snapshot, run_bounded, save_snapshot
+from security import create_access_token
+
+
+def auth_headers():
+    token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores"]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    main.clear_score_cache()
+    monkeypatch.setattr(main, "score_changes", ScoreChangeLog())
+    yield
+    main.clear_score_cache()
+
+
+class TestHotBusinessIds:
+    """Tests for choosing which businesses to warm"""
+
+    def test_most_requested_first(self, tmp_path):
+        log = tmp_path / "traffic.jsonl"
+        records = [{"b": "biz_mixed"}] * 3 + [{"b": "biz_risky"}] * 5 + [{"b": "unknown_biz"}] * 9 + [{"r": "/"}]
+        log.write_text("".join(json.dumps(record) + "\n" for record in records) + '{"b": "biz_cri')
+        assert hot_business_ids(10, str(log)) == ["biz_risky", "biz_mixed"]
+        assert hot_business_ids(1, str(log)) == ["biz_risky"]
+
+    def test_falls_back_to_all_businesses(self, tmp_path):
+        assert hot_business_ids(3) == main.get_all_business_ids()[:3]
+        assert hot_business_ids(3, str(tmp_path / "missing.jsonl")) == main.get_all_business_ids()[:3]
+
+
+class TestRunBounded:
+    """Tests for bounded-concurrency warm-up"""
+
+    def test_concurrency_limit_and_count(self):
+        in_flight = []
+        peak = []
+
+        async def worker(item):
+            in_flight.append(item)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.001)
+            in_flight.remove(item)
+            return item % 2 == 0
+
+        assert asyncio.run(run_bounded(range(20), worker, concurrency=3)) == 10
+        assert max(peak) == 3
+
+
+class TestSnapshotFile:
+    """Tests for the snapshot format"""
+
+    def test_round_trip_skips_expired(self, tmp_path):
+        path = str(tmp_path / "snapshot.jsonl")
+        now = datetime.now()
+        entries = [
+            ("old", now - timedelta(minutes=10), b'{"n":1}'),
+            ("fresh", now - timedelta(seconds=5), b'{"n":2}'),
+        ]
+        assert save_snapshot(path, entries, latest_version=7) == 2
+
+        latest_version, loaded = load_snapshot(path, timedelta(minutes=5))
+        loaded = list(loaded)
+        assert latest_version == 7
+        assert [(key, data) for key, _, data in loaded] == [("fresh", {"n": 2})]
+        assert abs((loaded[0][1] - entries[1][1]).total_seconds()) < 1e-3
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "other.jsonl"
+        path.write_text('{"key": "x"}\n')
+        with pytest.raises(ValueError):
+            load_snapshot(str(path), timedelta(minutes=5))
+
+
+class TestScoreCacheSnapshot:
+    """Tests for saving and restoring the score cache"""
+
+    def test_restore_keeps_timestamps_etags_and_versions(self, fresh_cache, tmp_path):
+        path = str(tmp_path / "snapshot.jsonl")
+        main.compute_and_cache_score("biz_mixed")
+        main.compute_and_cache_score("biz_risky", frozenset({"overall_score"}))
+        computed_at = main._cache_timestamps["biz_mixed"]
+        etag = main._etag_cache["biz_mixed"]
+        version = main.score_changes.version_of("biz_mixed")
+        assert main.save_score_cache_snapshot(path) == 2
+
+        main.clear_score_cache()
+        main.score_changes = ScoreChangeLog()
+        assert main.restore_score_cache_snapshot(path) == 2
+
+        assert main._cache_timestamps["biz_mixed"] == computed_at
+        assert main._etag_cache["biz_mixed"] == etag
+        assert main.is_cache_valid("biz_risky?fields=overall_score")
+        assert main.score_changes.version_of("biz_mixed") == version
+        assert [change[:2] for change in main.score_changes.changes_since(0, limit=10)] == [(version, "biz_mixed")]
+        # An unchanged recomputation keeps the restored version
+        assert main.compute_and_cache_score("biz_mixed")["version"] == version
+
+    def test_missing_snapshot_ignored(self, fresh_cache, tmp_path):
+        assert main.restore_score_cache_snapshot(str(tmp_path / "missing.jsonl")) == 0
+
+    def test_snapshot_across_restart(self, fresh_cache, tmp_path, monkeypatch):
+        path = str(tmp_path / "snapshot.jsonl")
+        monkeypatch.setattr(main, "CACHE_SNAPSHOT_PATH", path)
+        monkeypatch.setattr(main, "WARMUP_LIMIT", 0)
+
+        with TestClient(main.app) as client:
+            first = client.get("/risk-score/biz_healthy", headers=auth_headers())
+        main.clear_score_cache()
+
+        with TestClient(main.app) as client:
+            assert main.is_cache_valid("biz_healthy")
+            second = client.get(
+                "/risk-score/biz_healthy",
+                headers={**auth_headers(), "If-None-Match": first.headers["etag"]}
+            )
+        assert second.status_code == 304
+
+
+class TestWarmScoreCache:
+    """Tests for the startup warm-up"""
+
+    def test_warms_uncached_businesses(self, fresh_cache):
+        main.compute_and_cache_score("biz_excellent")
+        warmed = asyncio.run(main.warm_score_cache(limit=10, concurrency=2))
+        assert warmed == len(main.get_all_business_ids()) - 1
+        assert all(main.is_cache_valid(business_id) for business_id in main.get_all_business_ids())
+
+    def test_limit(self, fresh_cache):
+        assert asyncio.run(main.warm_score_cache(limit=2)) == 2
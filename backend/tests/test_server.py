@@ -0,0 +1,101 @@
+"""
+test_server.py
+
+Tests for the preload-and-fork launcher.
+"""
+
+import os
+import signal
+import time
+
+import httpx
+import pytest
+
+from benchmarks.loadtest import start_server, stop_server
+from benchmarks.worker_memory import child_pids
+
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork") or not os.path.isdir("/proc"), reason="needs fork and /proc")
+
+
+def wait_for_workers(pid, count, timeout=60):
+    deadline = time.monotonic() + timeout
+    while len(child_pids(pid)) != count:
+        assert time.monotonic() < deadline, "workers did not start"
+        time.sleep(0.1)
+    return child_pids(pid)
+
+
+@pytest.fixture
+def preload_server():
+    process, base_url = start_server(workers=2, launcher="preload", env={"OFFO_WARMUP_LIMIT": "0"})
+    yield process, base_url
+    if process.poll() is None:
+        stop_server(process)
+
+
+class TestPreloadServer:
+    """Tests against a real server.py process"""
+
+    def test_workers_share_the_signing_key(self, preload_server):
+        process, base_url = preload_server
+        wait_for_workers(process.pid, 2)
+
+        limits = httpx.Limits(max_keepalive_connections=0)
+        with httpx.Client(base_url=base_url, limits=limits, timeout=30) as client:
+            token = client.post("/auth/token", params={"client_id": "fork"}).json()["access_token"]
+            statuses = {
+                client.get("/risk-score/biz_mixed", headers={"Authorization": f"Bearer {token}"}).status_code
+                for _ in range(10)
+            }
+        assert statuses == {200}
+
+    def test_dead_worker_is_replaced(self, preload_server):
+        process, base_url = preload_server
+        workers = wait_for_workers(process.pid, 2)
+
+        os.kill(workers[0], signal.SIGKILL)
+        deadline = time.monotonic() + 30
+        while True:
+            current = child_pids(process.pid)
+            if len(current) == 2 and workers[0] not in current:
+                break
+            assert time.monotonic() < deadline, "worker was not replaced"
+            time.sleep(0.1)
+        assert httpx.get(f"{base_url}/", timeout=30).status_code == 200
+
+    def test_export_jobs_served_by_every_worker(self, preload_server):
+        process, base_url = preload_server
+        wait_for_workers(process.pid, 2)
+
+        # A new connection per request, so requests land on both workers
+        limits = httpx.Limits(max_keepalive_connections=0)
+        with httpx.Client(base_url=base_url, limits=limits, timeout=60) as client:
+            token = client.post("/auth/token", params={"client_id": "exports"}).json()["access_token"]
+            client.headers["Authorization"] = f"Bearer {token}"
+            created = client.post("/reports/jobs", json={"business_ids": ["biz_healthy", "biz_mixed"]})
+            assert created.status_code == 202
+            job_id = created.json()["job_id"]
+
+            deadline = time.monotonic() + 120
+            while True:
+                statuses = [client.get(f"/reports/jobs/{job_id}") for _ in range(6)]
+                assert {response.status_code for response in statuses} == {200}
+                if statuses[-1].json()["status"] == "completed":
+                    break
+                assert statuses[-1].json()["status"] in ("queued", "running")
+                assert time.monotonic() < deadline, "job did not finish"
+                time.sleep(0.2)
+
+            downloads = [client.get(f"/reports/jobs/{job_id}/download") for _ in range(6)]
+        assert {response.status_code for response in downloads} == {200}
+        assert len({response.content for response in downloads}) == 1
+
+    def test_graceful_shutdown(self, preload_server):
+        process, _ = preload_server
+        workers = wait_for_workers(process.pid, 2)
+
+        stop_server(process)
+
+        assert process.returncode == 0
+        assert not any(os.path.exists(f"/proc/{pid}") for pid in workers)
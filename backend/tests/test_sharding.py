@@ -0,0 +1,303 @@
+"""
+test_sharding.py
+
+Tests for consistent-hash sharding across workers.
+"""
+
+import asyncio
+import json
+import os
+import signal
+import time
+from collections import Counter
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import sharding
+from benchmarks.loadtest import start_server, stop_server
+from security import create_access_token
+from sharding import (
+    HashRing, ShardingMiddleware, format_cursor, job_shard, parse_cursor, read_membership, shard_key,
+    write_membership
+)
+
+
+KEYS = [f"biz_{i:05d}" for i in range(10_000)]
+
+
+def auth_headers():
+    token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores"]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestHashRing:
+    """Tests for the consistent-hash ring"""
+
+    def test_empty_ring(self):
+        assert HashRing().node_for("biz_mixed") is None
+
+    def test_balanced(self):
+        ring = HashRing(["a", "b", "c", "d"])
+        counts = Counter(ring.node_for(key) for key in KEYS)
+        assert set(counts) == {"a", "b", "c", "d"}
+        assert all(0.7 < count / (len(KEYS) / 4) < 1.3 for count in counts.values())
+
+    def test_deterministic(self):
+        first, second = HashRing(["a", "b", "c"]), HashRing(["c", "a", "b"])
+        assert all(first.node_for(key) == second.node_for(key) for key in KEYS)
+
+    def test_adding_a_node_only_moves_keys_to_it(self):
+        ring = HashRing(["a", "b", "c", "d"])
+        before = {key: ring.node_for(key) for key in KEYS}
+        ring.add("e")
+        moved = [key for key in KEYS if ring.node_for(key) != before[key]]
+        assert all(ring.node_for(key) == "e" for key in moved)
+        assert 0.1 < len(moved) / len(KEYS) < 0.3
+
+    def test_removing_a_node_only_moves_its_keys(self):
+        ring = HashRing(["a", "b", "c", "d"])
+        before = {key: ring.node_for(key) for key in KEYS}
+        ring.remove("b")
+        assert ring.nodes == ["a", "c", "d"]
+        for key in KEYS:
+            if before[key] != "b":
+                assert ring.node_for(key) == before[key]
+            else:
+                assert ring.node_for(key) != "b"
+
+
+class TestShardKey:
+    """Tests for which requests are sharded"""
+
+    def test_business_routes(self):
+        assert shard_key("/risk-score/biz_mixed") == "biz_mixed"
+        assert shard_key("/risk-score/biz_mixed/raw") == "biz_mixed"
+        assert shard_key("/risk-score/biz_mixed/pdf") == "biz_mixed"
+        assert shard_key("/risk-score/biz_mixed/trend.png") == "biz_mixed"
+
+    def test_other_routes(self):
+        assert shard_key("/risk-score/stream") is None
+        assert shard_key("/risk-score/changes") is None
+        assert shard_key("/businesses") is None
+        assert shard_key("/risk-score/biz_mixed/unknown") is None
+
+    def test_job_routes(self):
+        job_id = "worker-1." + "0" * 32
+        assert job_shard(f"/reports/jobs/{job_id}") == "worker-1"
+        assert job_shard(f"/reports/jobs/{job_id}/download") == "worker-1"
+        assert job_shard("/reports/jobs/" + "0" * 32) is None
+        assert job_shard("/reports/jobs") is None
+
+
+class TestCursor:
+    """Tests for composite change-log cursors"""
+
+    def test_round_trip(self):
+        assert parse_cursor(format_cursor({"worker-1": 7, "worker-0": 12})) == {"worker-0": 12, "worker-1": 7}
+        assert format_cursor({"worker-1": 7, "worker-0": 12}) == "worker-0:12,worker-1:7"
+
+    def test_from_the_start(self):
+        assert parse_cursor("0") == {}
+        assert parse_cursor("") == {}
+
+    def test_rejects_malformed(self):
+        for value in ("12", "worker-0", "worker-0:x", ":3"):
+            with pytest.raises(ValueError):
+                parse_cursor(value)
+
+
+class TestMembership:
+    """Tests for the membership file"""
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "members.json")
+        write_membership(path, {"worker-0": "/tmp/w0.sock", "worker-1": "/tmp/w1.sock"})
+        assert read_membership(path) == {"worker-0": "/tmp/w0.sock", "worker-1": "/tmp/w1.sock"}
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "members.json"
+        path.write_text("[1, 2]")
+        with pytest.raises(ValueError):
+            read_membership(str(path))
+
+
+class TestShardingMiddleware:
+    """Tests for routing inside one worker"""
+
+    def test_owned_business_served_locally(self, tmp_path):
+        path = str(tmp_path / "members.json")
+        write_membership(path, {"worker-0": str(tmp_path / "worker-0.sock")})
+        client = TestClient(ShardingMiddleware(main.app, "worker-0", path))
+
+        response = client.get("/risk-score/biz_mixed", headers=auth_headers())
+
+        assert response.status_code == 200
+        assert response.headers[sharding.SHARD_HEADER] == "worker-0"
+        assert sharding.HOP_HEADER not in response.headers
+
+    def test_unreachable_owner_falls_back_to_local(self, tmp_path):
+        path = str(tmp_path / "members.json")
+        # worker-1 owns everything and its socket does not exist
+        write_membership(path, {"worker-1": str(tmp_path / "worker-1.sock")})
+        middleware = ShardingMiddleware(main.app, "worker-0", path)
+        assert not middleware.owns("biz_mixed")
+
+        response = TestClient(middleware).get("/risk-score/biz_mixed", headers=auth_headers())
+
+        assert response.status_code == 200
+        assert response.headers[sharding.SHARD_HEADER] == "worker-0"
+
+    def test_not_sharded_by_default(self):
+        assert sharding.owns_business("biz_mixed")
+
+    def test_warm_up_only_scores_owned_businesses(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "members.json")
+        write_membership(path, {"worker-0": "", "worker-1": ""})
+        middleware = ShardingMiddleware(main.app, "worker-0", path)
+        monkeypatch.setattr(sharding, "_local_shard", middleware)
+        owned = [business_id for business_id in main.get_all_business_ids() if middleware.owns(business_id)]
+        assert 0 < len(owned) < len(main.get_all_business_ids())
+
+        main.clear_score_cache()
+        try:
+            assert asyncio.run(main.warm_score_cache(limit=100)) == len(owned)
+            assert [business_id for business_id in main.get_all_business_ids() if main.is_cache_valid(business_id)] == owned
+        finally:
+            main.clear_score_cache()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+class TestShardedServer:
+    """Tests against server.py running several sharded workers"""
+
+    @pytest.fixture
+    def sharded_server(self, request, tmp_path):
+        workers = getattr(request, "param", 3)
+        env = {"OFFO_WARMUP_LIMIT": "0", "OFFO_SHARDING": "1", "OFFO_SHARD_DIR": str(tmp_path)}
+        process, base_url = start_server(workers=workers, launcher="preload", env=env)
+        limits = httpx.Limits(max_keepalive_connections=0)
+        client = httpx.Client(base_url=base_url, limits=limits, timeout=60)
+        token = client.post("/auth/token", params={"client_id": "shards"}).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield process, client, str(tmp_path / "members.json")
+        client.close()
+        if process.poll() is None:
+            stop_server(process)
+
+    @staticmethod
+    def owners(client, business_ids, repeat=6):
+        served = {}
+        for business_id in business_ids:
+            responses = [client.get(f"/risk-score/{business_id}") for _ in range(repeat)]
+            assert {response.status_code for response in responses} == {200}
+            served[business_id] = {response.headers[sharding.SHARD_HEADER] for response in responses}
+        return served
+
+    @staticmethod
+    def wait_for_members(path, count, timeout=30):
+        deadline = time.monotonic() + timeout
+        while len(read_membership(path)) != count:
+            assert time.monotonic() < deadline, "membership did not change"
+            time.sleep(0.1)
+        # Workers re-read the membership at most every MEMBERSHIP_CHECK_SECONDS
+        time.sleep(2 * sharding.MEMBERSHIP_CHECK_SECONDS)
+        return read_membership(path)
+
+    def test_each_business_is_served_by_its_owner(self, sharded_server):
+        process, client, membership_path = sharded_server
+        business_ids = client.get("/businesses").json()["businesses"]
+        ring = HashRing(self.wait_for_members(membership_path, 3))
+
+        served = self.owners(client, business_ids)
+
+        assert served == {business_id: {ring.node_for(business_id)} for business_id in business_ids}
+
+    def test_adding_and_removing_a_worker_rebalances(self, sharded_server):
+        process, client, membership_path = sharded_server
+        business_ids = client.get("/businesses").json()["businesses"]
+        ring = HashRing(self.wait_for_members(membership_path, 3))
+
+        os.kill(process.pid, signal.SIGTTIN)
+        members = self.wait_for_members(membership_path, 4)
+        assert sorted(members) == ["worker-0", "worker-1", "worker-2", "worker-3"]
+        ring.add("worker-3")
+        assert self.owners(client, business_ids) == {
+            business_id: {ring.node_for(business_id)} for business_id in business_ids
+        }
+
+        os.kill(process.pid, signal.SIGTTOU)
+        self.wait_for_members(membership_path, 3)
+        ring.remove("worker-3")
+        assert self.owners(client, business_ids) == {
+            business_id: {ring.node_for(business_id)} for business_id in business_ids
+        }
+
+    @pytest.mark.parametrize("sharded_server", [2], indirect=True)
+    def test_changes_are_merged_across_shards(self, sharded_server):
+        process, client, membership_path = sharded_server
+        business_ids = client.get("/businesses").json()["businesses"]
+        ring = HashRing(self.wait_for_members(membership_path, 2))
+        assert {ring.node_for(business_id) for business_id in business_ids} == {"worker-0", "worker-1"}
+        self.owners(client, business_ids, repeat=1)
+
+        body = client.get("/risk-score/changes", params={"since": 0}).json()
+
+        assert sorted(change["business_id"] for change in body["changes"]) == sorted(business_ids)
+        assert sorted(parse_cursor(body["next_since"])) == ["worker-0", "worker-1"]
+        assert body["next_since"] == body["latest_version"]
+        assert not body["truncated"]
+        # Whichever worker accepts the poll, the cursor picks up where it left off
+        for _ in range(6):
+            polled = client.get("/risk-score/changes", params={"since": body["next_since"]}).json()
+            assert polled["changes"] == []
+            assert polled["next_since"] == body["next_since"]
+
+        assert client.get("/risk-score/changes", params={"since": "12"}).status_code == 400
+
+    @pytest.mark.parametrize("sharded_server", [2], indirect=True)
+    def test_stream_covers_every_shard(self, sharded_server):
+        process, client, membership_path = sharded_server
+        business_ids = client.get("/businesses").json()["businesses"]
+        self.wait_for_members(membership_path, 2)
+
+        streamed = set()
+        with client.stream("GET", "/risk-score/stream", params={"ids": ",".join(business_ids)}) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            for line in response.iter_lines():
+                if line.startswith("data:"):
+                    streamed.add(json.loads(line[len("data:"):])["business_id"])
+                if streamed == set(business_ids):
+                    break
+
+        assert streamed == set(business_ids)
+        unknown = client.get("/risk-score/stream", params={"ids": f"{business_ids[0]},biz_unknown"})
+        assert unknown.status_code == 404
+
+    @pytest.mark.parametrize("sharded_server", [2], indirect=True)
+    def test_export_jobs_routed_to_their_worker(self, sharded_server):
+        process, client, membership_path = sharded_server
+        self.wait_for_members(membership_path, 2)
+
+        created = client.post("/reports/jobs", json={"business_ids": ["biz_healthy", "biz_mixed"]})
+        assert created.status_code == 202
+        job_id = created.json()["job_id"]
+        creator = created.headers[sharding.SHARD_HEADER]
+        assert job_id.startswith(f"{creator}.")
+
+        deadline = time.monotonic() + 120
+        while True:
+            statuses = [client.get(f"/reports/jobs/{job_id}") for _ in range(6)]
+            assert {response.status_code for response in statuses} == {200}
+            assert {response.headers[sharding.SHARD_HEADER] for response in statuses} == {creator}
+            if statuses[-1].json()["status"] == "completed":
+                break
+            assert time.monotonic() < deadline, "job did not finish"
+            time.sleep(0.2)
+
+        downloads = [client.get(f"/reports/jobs/{job_id}/download") for _ in range(6)]
+        assert {response.status_code for response in downloads} == {200}
+        assert {response.headers[sharding.SHARD_HEADER] for response in downloads} == {creator}
@@ -0,0 +1,100 @@
+"""
+test_synthetic_portfolio.py
+
+Tests for the synthetic portfolio generator and its data layer registration.
+"""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import data_layer
+import main
+from security import create_access_token
+from synthetic_portfolio import METRIC_NAMES, generate_portfolio, load_portfolio
+
+
+@pytest.fixture
+def registered_portfolio():
+    portfolio = generate_portfolio(1000, seed=3)
+    data_layer.register_portfolio(portfolio)
+    main.clear_score_cache()
+    main._business_list_cache.clear()
+    yield portfolio
+    data_layer.register_portfolio(None)
+    main.clear_score_cache()
+    main._business_list_cache.clear()
+
+
+class TestGenerator:
+    """Tests for determinism and distributions"""
+
+    def test_same_seed_same_portfolio(self):
+        first, second = generate_portfolio(500, seed=11), generate_portfolio(500, seed=11)
+        assert np.array_equal(first.metrics, second.metrics)
+        assert np.array_equal(first.industry, second.industry)
+
+    def test_smaller_portfolio_is_prefix_of_larger(self):
+        small, large = generate_portfolio(100, seed=5), generate_portfolio(70_000, seed=5)
+        assert np.array_equal(small.metrics, large.metrics[:100])
+
+    def test_metrics_in_range_and_correlated(self):
+        portfolio = generate_portfolio(20_000, seed=1)
+        assert portfolio.metrics.min() >= 0.0 and portfolio.metrics.max() <= 1.0
+
+        correlation = np.corrcoef(portfolio.metrics.T)
+        task, overdue, training = (METRIC_NAMES.index(name) for name in (
+            "task_completion_rate", "overdue_task_rate", "training_completion_rate"))
+        assert correlation[task, training] > 0.3
+        assert correlation[task, overdue] < -0.3
+
+    def test_business_id_round_trip(self):
+        portfolio = generate_portfolio(100)
+        assert portfolio.index_of(portfolio.business_id(42)) == 42
+        assert portfolio.index_of("syn_42") is None
+        assert portfolio.index_of(portfolio.business_id(100)) is None
+        assert portfolio.index_of("biz_healthy") is None
+
+    def test_history_is_deterministic_and_ends_at_current_score(self):
+        portfolio = generate_portfolio(10)
+        history = portfolio.history(3, 72.5)
+        assert len(history) == 3 * 365
+        assert history[-1]["score"] == 72.5
+        assert history == portfolio.history(3, 72.5)
+        assert portfolio.history(3, 72.5, days=30) == history[-30:]
+
+    def test_save_and_load(self, tmp_path):
+        portfolio = generate_portfolio(200, seed=9)
+        path = str(tmp_path / "portfolio.npz")
+        portfolio.save(path)
+
+        loaded = load_portfolio(path)
+        assert loaded.seed == 9
+        assert np.array_equal(loaded.metrics, portfolio.metrics)
+        assert loaded.details_at(17) == portfolio.details_at(17)
+
+
+class TestDataLayerRegistration:
+    """Tests for serving a registered portfolio through the API"""
+
+    def test_demo_businesses_still_served(self, registered_portfolio):
+        assert data_layer.get_business_metrics("biz_healthy")["task_completion_rate"] == 0.95
+
+    def test_synthetic_business_scored(self, registered_portfolio):
+        token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores"]})
+        business_id = registered_portfolio.business_id(123)
+
+        response = TestClient(main.app).get(
+            f"/risk-score/{business_id}", headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["business_details"] == registered_portfolio.details_at(123)
+        assert len(data["trend_30d"]) == 30
+        assert data["trend_30d"][-1]["score"] == data["overall_score"]
+
+    def test_business_list_includes_portfolio(self, registered_portfolio):
+        business_ids = data_layer.get_all_business_ids()
+        assert len(business_ids) == 5 + 1000
+        assert business_ids[-1] == registered_portfolio.business_id(999)
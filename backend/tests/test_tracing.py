@@ -0,0 +1,122 @@
+"""
+test_tracing.py
+
+Tests for request tracing, trace context propagation and span export.
+"""
+
+from fastapi.testclient import TestClient
+
+import main
+from chart_cache import chart_cache
+from metrics import time_stage
+from serialization import JsonLinesLog
+from security import create_access_token
+from tracing import TracingMiddleware, format_trace, load_traces, parse_traceparent, start_span
+
+
+def auth_headers():
+    token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores", "read:reports"]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def traced_client(tmp_path, **kwargs):
+    exporter = JsonLinesLog(str(tmp_path / "traces.jsonl"), max_bytes=10 * 1024 * 1024, flush_every=1)
+    return exporter, TestClient(TracingMiddleware(main.app, exporter, **kwargs))
+
+
+def exported(exporter):
+    exporter.flush()
+    return load_traces(exporter.path)
+
+
+def span_names(trace):
+    return [span["name"] for span in trace["spans"]]
+
+
+class TestTraceContext:
+    """Tests for traceparent parsing and span activation"""
+
+    def test_parse_traceparent(self):
+        trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+        assert parse_traceparent(f"00-{trace_id}-{parent_id}-01") == (trace_id, parent_id, True)
+        assert parse_traceparent(f"00-{trace_id}-{parent_id}-00")[2] is False
+        assert parse_traceparent("00-" + "0" * 32 + f"-{parent_id}-01") is None
+        assert parse_traceparent("garbage") is None
+
+    def test_no_span_outside_a_trace(self):
+        assert start_span("orphan") is None
+        with time_stage("untraced_stage"):
+            pass
+
+
+class TestTracingMiddleware:
+    """Tests for TracingMiddleware"""
+
+    def setup_method(self):
+        main.clear_score_cache()
+
+    def test_response_headers(self, tmp_path):
+        _, client = traced_client(tmp_path, sample_rate=1.0)
+        response = client.get("/risk-score/biz_mixed", headers=auth_headers())
+
+        trace_id = response.headers["x-trace-id"]
+        assert len(trace_id) == 32
+        assert parse_traceparent(response.headers["traceparent"])[:1] == (trace_id,)
+
+    def test_incoming_traceparent_continued(self, tmp_path):
+        exporter, client = traced_client(tmp_path, sample_rate=0.0)
+        trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+        headers = {**auth_headers(), "traceparent": f"00-{trace_id}-{parent_id}-01"}
+
+        response = client.get("/risk-score/biz_mixed", headers=headers)
+
+        assert response.headers["x-trace-id"] == trace_id
+        trace = exported(exporter)[0]
+        assert trace["trace_id"] == trace_id
+        assert trace["spans"][0]["parent_id"] == parent_id
+
+    def test_stage_spans_exported(self, tmp_path):
+        exporter, client = traced_client(tmp_path, sample_rate=1.0)
+        client.get("/risk-score/biz_mixed", headers=auth_headers())
+
+        trace = exported(exporter)[0]
+        assert trace["name"] == "GET /risk-score/{business_id}"
+        assert trace["reason"] == "sampled"
+        assert trace["attributes"]["business_id"] == "biz_mixed"
+        assert trace["attributes"]["http.status_code"] == 200
+        for stage in ("cache_lookup", "metrics_fetch", "compute_score", "trend_30d", "drivers"):
+            assert stage in span_names(trace)
+
+        root_id = trace["spans"][0]["span_id"]
+        compute = next(span for span in trace["spans"] if span["name"] == "compute_score")
+        assert compute["parent_id"] == root_id
+
+    def test_pdf_spans_follow_threadpool(self, tmp_path):
+        exporter, client = traced_client(tmp_path, sample_rate=1.0)
+        chart_cache.clear()
+        client.get("/risk-score/biz_healthy/pdf", headers=auth_headers())
+
+        names = span_names(exported(exporter)[0])
+        assert "chart_render" in names
+        assert "pdf_build" in names
+
+    def test_unsampled_fast_traces_not_exported(self, tmp_path):
+        exporter, client = traced_client(tmp_path, sample_rate=0.0, slow_ms=60_000)
+        response = client.get("/risk-score/biz_mixed", headers=auth_headers())
+
+        assert "x-trace-id" in response.headers
+        assert exporter.recorded == 0
+
+    def test_slow_traces_always_exported(self, tmp_path):
+        exporter, client = traced_client(tmp_path, sample_rate=0.0, slow_ms=0)
+        client.get("/risk-score/biz_mixed", headers=auth_headers())
+
+        assert exported(exporter)[0]["reason"] == "slow"
+
+    def test_format_trace_tree(self, tmp_path):
+        exporter, client = traced_client(tmp_path, sample_rate=1.0)
+        client.get("/risk-score/biz_mixed", headers=auth_headers())
+
+        text = format_trace(exported(exporter)[0])
+        assert "GET /risk-score/{business_id}" in text
+        assert "  compute_score" in text
@@ -0,0 +1,117 @@
+"""
+test_traffic_recorder.py
+
+Tests for request trace recording and replay.
+"""
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.loadtest import run_server
+from benchmarks.replay import load_trace, replay
+from security import create_access_token
+from serialization import JsonLinesLog
+from traffic_recorder import TrafficRecorder, TrafficRecorderMiddleware
+
+
+def auth_headers():
+    token = create_access_token(data={"sub": "test_client", "scopes": ["read:scores"]})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def recorded_client(tmp_path, **kwargs):
+    recorder = TrafficRecorder(str(tmp_path / "traffic.jsonl"), **kwargs)
+    return recorder, TestClient(TrafficRecorderMiddleware(main.app, recorder))
+
+
+class TestRecorder:
+    """Tests for TrafficRecorderMiddleware"""
+
+    def test_records_route_business_and_client(self, tmp_path):
+        recorder, client = recorded_client(tmp_path)
+        headers = auth_headers()
+        client.get("/risk-score/biz_mixed?fields=overall_score", headers=headers)
+        client.get("/risk-score/biz_mixed", headers=headers)
+        client.get("/")
+        recorder.flush()
+
+        records = [json.loads(line) for line in open(recorder.path)]
+        assert len(records) == 3
+        first = records[0]
+        assert first["r"] == "/risk-score/{business_id}"
+        assert first["b"] == "biz_mixed"
+        assert first["q"] == "fields=overall_score"
+        assert first["s"] == 200 and first["d"] > 0 and first["n"] > 0
+        # Same token, same client key; the raw token is never stored
+        assert records[1]["c"] == first["c"]
+        assert headers["Authorization"].split()[1] not in open(recorder.path).read()
+        assert "c" not in records[2] and "b" not in records[2]
+
+    def test_flushes_in_batches(self, tmp_path):
+        recorder, client = recorded_client(tmp_path, flush_every=2)
+        client.get("/")
+        assert recorder._buffer
+        client.get("/")
+        assert not recorder._buffer
+        recorder.flush()
+        assert len(open(recorder.path).readlines()) == 2
+
+    def test_stops_at_size_cap(self, tmp_path):
+        recorder, client = recorded_client(tmp_path, max_bytes=1, flush_every=1)
+        client.get("/")
+        client.get("/")
+        assert recorder.recorded == 1
+        assert recorder.dropped == 1
+
+    def test_cap_counts_other_writers(self, tmp_path):
+        path = str(tmp_path / "traffic.jsonl")
+        first = JsonLinesLog(path, max_bytes=10, flush_every=1)
+        second = JsonLinesLog(path, max_bytes=10, flush_every=1)
+        first.record({"worker": "first"})
+        first.flush()
+
+        # second's own count is below the cap, but the file is already full
+        second.record({"worker": "second"})
+        second.flush()
+
+        assert [json.loads(line) for line in open(path)] == [{"worker": "first"}]
+        assert second.dropped == 1
+        assert second.full
+
+
+class TestReplay:
+    """Tests for loading and replaying traces"""
+
+    def test_load_trace_orders_and_skips(self, tmp_path):
+        path = tmp_path / "traffic.jsonl"
+        lines = [
+            {"t": 2.0, "m": "GET", "r": "/businesses", "p": "/businesses", "s": 200, "d": 1.0},
+            {"t": 1.0, "m": "GET", "r": "/", "p": "/", "s": 200, "d": 1.0},
+            {"t": 1.5, "m": "GET", "r": "/admin/memory", "p": "/admin/memory", "s": 200, "d": 1.0},
+            {"t": 1.7, "m": "GET", "r": "/", "p": "/", "q": "profile=1", "s": 200, "d": 1.0},
+        ]
+        path.write_text("\n".join(json.dumps(line) for line in lines) + "\n{truncated")
+
+        records = load_trace(str(path))
+        assert [record["r"] for record in records] == ["/", "/businesses"]
+
+    def test_replay_recorded_traffic(self, tmp_path):
+        recorder, client = recorded_client(tmp_path)
+        headers = auth_headers()
+        for business_id in ("biz_mixed", "biz_mixed", "biz_healthy"):
+            client.get(f"/risk-score/{business_id}", headers=headers)
+        client.get("/businesses", headers=headers)
+        recorder.flush()
+
+        records = load_trace(recorder.path)
+        with run_server() as base_url:
+            summary = asyncio.run(replay(base_url, records, speed=0))
+
+        assert summary["requests"] == 4
+        route = summary["routes"]["/risk-score/{business_id}"]
+        assert route["requests"] == 3
+        assert route["status_mismatches"] == 0 and route["errors"] == 0
+        assert route["replayed_ms"]["p50"] > 0
@@ -0,0 +1,273 @@
+"""
+tracing.py
+
+Lightweight request tracing with span export to a local file.
+
+With OFFO_TRACE_LOG=<path> set, TracingMiddleware opens a root span per
+HTTP request and every time_stage() block inside it (cache lookup, metrics
+fetch, scoring, trend, drivers, serialization, chart render, PDF build)
+becomes a child span. The active span lives in a ContextVar, so spans follow
+the request into threadpool work.
+
+IDs follow W3C Trace Context: an incoming ``traceparent`` header continues
+the caller's trace, and every response carries ``traceparent`` (this
+request's root span) and ``X-Trace-Id``.
+
+A finished trace is exported as one JSON line when it was sampled at the
+start (OFFO_TRACE_SAMPLE_RATE, or the caller's sampled flag) or when it
+was slower than OFFO_TRACE_SLOW_MS, so tail-latency outliers are always
+kept. The file stops growing at OFFO_TRACE_LOG_MAX_MB.
+
+Summarize the slowest traces with:
+    python tracing.py traces.jsonl --top 10
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from serialization import JsonLinesLog
+
+
+TRACE_LOG_PATH = os.environ.get("OFFO_TRACE_LOG", "")
+TRACE_SAMPLE_RATE = float(os.environ.get("OFFO_TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_MS = float(os.environ.get("OFFO_TRACE_SLOW_MS", "250"))
+TRACE_LOG_MAX_BYTES = int(float(os.environ.get("OFFO_TRACE_LOG_MAX_MB", "256")) * 1024 * 1024)
+
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start", "duration", "_token")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str]):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes: Dict[str, Any] = {}
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self._token = None
+
+    def end(self):
+        self.duration = time.perf_counter() - self.start
+        self.trace.spans.append(self)
+
+
+class Trace:
+    """Spans collected for one request."""
+
+    __slots__ = ("trace_id", "sampled", "started_at", "spans")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_span(name: str) -> Optional[Span]:
+    """
+    Start a child of the current span and make it current.
+
+    Returns:
+        The span, or None (at the cost of one ContextVar lookup) when no
+        trace is active
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    span = Span(parent.trace, name, parent.span_id)
+    span._token = _current_span.set(span)
+    return span
+
+
+def end_span(span: Span):
+    """Finish a span started with start_span() and restore its parent."""
+    _current_span.reset(span._token)
+    span.end()
+
+
+def parse_traceparent(value: str) -> Optional[Tuple[str, str, bool]]:
+    """Parse a W3C traceparent header into (trace_id, parent_id, sampled)."""
+    match = TRACEPARENT_PATTERN.match(value.strip().lower())
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def format_traceparent(span: Span) -> str:
+    return f"00-{span.trace.trace_id}-{span.span_id}-{'01' if span.trace.sampled else '00'}"
+
+
+def trace_record(trace: Trace, root: Span, reason: str) -> Dict[str, Any]:
+    """Exported form of a finished trace: root summary plus a flat span list."""
+    def span_entry(span: Span) -> Dict[str, Any]:
+        entry = {
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "offset_ms": round((span.start - root.start) * 1000, 3),
+            "duration_ms": round(span.duration * 1000, 3),
+        }
+        if span.attributes:
+            entry["attributes"] = span.attributes
+        return entry
+
+    spans = sorted(trace.spans, key=lambda span: span.start)
+    return {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "started_at": round(trace.started_at, 6),
+        "duration_ms": round(root.duration * 1000, 3),
+        "reason": reason,
+        "attributes": root.attributes,
+        "spans": [span_entry(span) for span in spans],
+    }
+
+
+class TracingMiddleware:
+    """ASGI middleware running each HTTP request inside a root span."""
+
+    def __init__(
+        self,
+        app,
+        exporter: JsonLinesLog,
+        sample_rate: float = TRACE_SAMPLE_RATE,
+        slow_ms: float = TRACE_SLOW_MS
+    ):
+        self.app = app
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope.get("headers", []):
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+            sampled = sampled or random.random() < self.sample_rate
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = random.random() < self.sample_rate
+
+        trace = Trace(trace_id, sampled)
+        root = Span(trace, f"{scope['method']} {scope['path']}", parent_id)
+        token = _current_span.set(root)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"traceparent", format_traceparent(root).encode()),
+                    (b"x-trace-id", trace_id.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_span.reset(token)
+            root.end()
+
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+            root.attributes["http.status_code"] = status[0]
+            root.attributes["http.target"] = scope["path"]
+            business_id = scope.get("path_params", {}).get("business_id")
+            if business_id is not None:
+                root.attributes["business_id"] = business_id
+
+            if sampled or root.duration >= self.slow_seconds:
+                self.exporter.record(trace_record(trace, root, "sampled" if sampled else "slow"))
+
+
+trace_exporter = JsonLinesLog(TRACE_LOG_PATH, TRACE_LOG_MAX_BYTES) if TRACE_LOG_PATH else None
+
+
+def load_traces(path: str) -> List[Dict[str, Any]]:
+    traces = []
+    with open(path) as f:
+        for line in f:
+            try:
+                traces.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return traces
+
+
+def format_trace(trace: Dict[str, Any]) -> str:
+    """Indented span tree with durations and share of the request time."""
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for span in trace["spans"]:
+        children.setdefault(span["parent_id"], []).append(span)
+
+    total = trace["duration_ms"] or 1.0
+    lines = [
+        f"{trace['duration_ms']:>10.2f} ms  {trace['name']}  trace={trace['trace_id']} "
+        f"status={trace['attributes'].get('http.status_code')} ({trace['reason']})"
+    ]
+
+    span_ids = {span["span_id"] for span in trace["spans"]}
+    roots = [span for span in trace["spans"] if span["parent_id"] not in span_ids]
+
+    def walk(span, depth):
+        lines.append(
+            f"{span['duration_ms']:>10.2f} ms  {'  ' * depth}{span['name']} "
+            f"(+{span['offset_ms']:.2f} ms, {span['duration_ms'] / total:.0%})"
+        )
+        for child in children.get(span["span_id"], []):
+            walk(child, depth + 1)
+
+    for root in roots:
+        for child in children.get(root["span_id"], []):
+            walk(child, 1)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the slowest exported traces")
+    parser.add_argument("trace_log", help="file written with OFFO_TRACE_LOG")
+    parser.add_argument("--top", type=int, default=10, help="number of traces to show")
+    parser.add_argument("--route", help="only traces whose name contains this text")
+    args = parser.parse_args(argv)
+
+    traces = load_traces(args.trace_log)
+    if args.route:
+        traces = [trace for trace in traces if args.route in trace["name"]]
+    traces.sort(key=lambda trace: trace["duration_ms"], reverse=True)
+
+    print(f"{len(traces)} traces; slowest {min(args.top, len(traces))}:\n")
+    for trace in traces[:args.top]:
+        print(format_trace(trace))
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+traffic_recorder.py
+
+Optional request trace recording for replay.
+
+With OFFO_TRAFFIC_LOG=<path> set, TrafficRecorderMiddleware appends one
+compact JSON line per HTTP request:
+    t  wall-clock start (epoch seconds, ms precision)
+    m  method
+    r  matched route template (e.g. /risk-score/{business_id})
+    p  path, q  query string (omitted when empty)
+    b  business_id path parameter (omitted when absent)
+    s  status, d  server-side duration in ms, n  response bytes
+    c  client key: short hash of the Authorization header, so token reuse
+       is visible without storing credentials (omitted when absent)
+    z  1 when the client accepted gzip (omitted otherwise)
+
+Records are buffered and written in batches; recording stops once the file
+reaches OFFO_TRAFFIC_LOG_MAX_MB. Each worker appends whole batches to the
+same file, and replay orders records by timestamp. Replay the log with
+``python -m benchmarks.replay``.
+"""
+
+import hashlib
+import os
+import time
+from typing import Any, Dict, Optional
+
+from serialization import JsonLinesLog, accepts_gzip
+
+
+TRAFFIC_LOG_PATH = os.environ.get("OFFO_TRAFFIC_LOG", "")
+TRAFFIC_LOG_MAX_BYTES = int(float(os.environ.get("OFFO_TRAFFIC_LOG_MAX_MB", "512")) * 1024 * 1024)
+FLUSH_EVERY = 256
+
+
+def client_key(authorization: bytes) -> str:
+    """Short, non-reversible key for an Authorization header value."""
+    return hashlib.blake2b(authorization, digest_size=6).hexdigest()
+
+
+class TrafficRecorder(JsonLinesLog):
+    """Buffers request records and appends them to the traffic log."""
+
+    def __init__(self, path: str, max_bytes: int = TRAFFIC_LOG_MAX_BYTES, flush_every: int = FLUSH_EVERY):
+        super().__init__(path, max_bytes, flush_every)
+
+
+class TrafficRecorderMiddleware:
+    """ASGI middleware recording one trace record per HTTP request."""
+
+    def __init__(self, app, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.time()
+        start = time.perf_counter()
+        status = [500]
+        sent = [0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                sent[0] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.recorder.record(self._entry(scope, started_at, time.perf_counter() - start, status[0], sent[0]))
+
+    @staticmethod
+    def _entry(scope, started_at: float, duration: float, status: int, sent: int) -> Dict[str, Any]:
+        route = scope.get("route")
+        entry: Dict[str, Any] = {
+            "t": round(started_at, 3),
+            "m": scope["method"],
+            "r": getattr(route, "path", "unmatched"),
+            "p": scope["path"],
+            "s": status,
+            "d": round(duration * 1000, 3),
+            "n": sent,
+        }
+        if scope.get("query_string"):
+            entry["q"] = scope["query_string"].decode("latin-1")
+        business_id = scope.get("path_params", {}).get("business_id")
+        if business_id is not None:
+            entry["b"] = business_id
+
+        authorization: Optional[bytes] = None
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                authorization = value
+            elif name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        if authorization:
+            entry["c"] = client_key(authorization)
+        if accepts_gzip(accept_encoding):
+            entry["z"] = 1
+        return entry
+
+
+traffic_recorder = TrafficRecorder(TRAFFIC_LOG_PATH) if TRAFFIC_LOG_PATH else None